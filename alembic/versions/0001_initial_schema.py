@@ -0,0 +1,138 @@
+"""Initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-10-25 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("email", sa.String(255), nullable=False),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("notion_user_id", sa.String(255), nullable=True),
+        sa.Column("google_user_id", sa.String(255), nullable=True),
+        sa.Column("preferences", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "stocks",
+        sa.Column("symbol", sa.String(20), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=True),
+        sa.Column("exchange", sa.String(50), nullable=True),
+        sa.Column("sector", sa.String(100), nullable=True),
+        sa.Column("industry", sa.String(100), nullable=True),
+        sa.Column("market_cap", sa.BigInteger(), nullable=True),
+        sa.Column("stock_metadata", sa.JSON(), nullable=True),
+        sa.Column("last_updated", sa.DateTime(), nullable=True),
+    )
+
+    op.create_table(
+        "portfolios",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "user_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("type", sa.String(50), nullable=False),
+        sa.Column("currency", sa.String(3), nullable=True),
+        sa.Column("initial_capital", sa.Numeric(15, 2), nullable=True),
+        sa.Column("notion_database_id", sa.String(255), nullable=True),
+        sa.Column("gsheet_id", sa.String(255), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+
+    op.create_table(
+        "positions",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "portfolio_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("portfolios.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("symbol", sa.String(20), nullable=False),
+        sa.Column("quantity", sa.Numeric(15, 4), nullable=False),
+        sa.Column("average_cost", sa.Numeric(15, 4), nullable=True),
+        sa.Column("current_price", sa.Numeric(15, 4), nullable=True),
+        sa.Column("market_value", sa.Numeric(15, 2), nullable=True),
+        sa.Column("unrealized_pnl", sa.Numeric(15, 2), nullable=True),
+        sa.Column("unrealized_pnl_percent", sa.Numeric(10, 4), nullable=True),
+        sa.Column("last_updated", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_positions_symbol", "positions", ["symbol"])
+
+    op.create_table(
+        "orders",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "portfolio_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("portfolios.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("symbol", sa.String(20), nullable=False),
+        sa.Column("side", sa.String(10), nullable=False),
+        sa.Column("quantity", sa.Numeric(15, 4), nullable=False),
+        sa.Column("price", sa.Numeric(15, 4), nullable=False),
+        sa.Column("total_value", sa.Numeric(15, 2), nullable=True),
+        sa.Column("fees", sa.Numeric(15, 2), nullable=True),
+        sa.Column("order_date", sa.DateTime(), nullable=False),
+        sa.Column("notes", sa.Text(), nullable=True),
+        sa.Column("notion_page_id", sa.String(255), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_orders_symbol", "orders", ["symbol"])
+
+    op.create_table(
+        "recommendations",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "portfolio_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("portfolios.id"),
+            nullable=True,
+        ),
+        sa.Column("symbol", sa.String(20), nullable=False),
+        sa.Column("action", sa.String(20), nullable=False),
+        sa.Column("confidence_score", sa.Numeric(5, 4), nullable=True),
+        sa.Column("reasoning", sa.Text(), nullable=False),
+        sa.Column("target_price", sa.Numeric(15, 4), nullable=True),
+        sa.Column("stop_loss", sa.Numeric(15, 4), nullable=True),
+        sa.Column("time_horizon", sa.String(50), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=True),
+        sa.Column("status", sa.String(20), nullable=True),
+    )
+    op.create_index("ix_recommendations_symbol", "recommendations", ["symbol"])
+
+
+def downgrade() -> None:
+    op.drop_table("recommendations")
+    op.drop_table("orders")
+    op.drop_table("positions")
+    op.drop_table("portfolios")
+    op.drop_table("stocks")
+    op.drop_table("users")
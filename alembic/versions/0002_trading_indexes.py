@@ -0,0 +1,91 @@
+"""Composite indexes for trading tables
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-11-20 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Portfolios of a user, newest first
+    op.create_index(
+        "ix_portfolios_user_id_created_at",
+        "portfolios",
+        ["user_id", "created_at", "id"],
+    )
+    # Merge positions held twice for one symbol into the oldest row, so that
+    # the unique index can be built; no orders reference positions yet
+    op.execute(
+        """
+        WITH duplicates AS (
+            SELECT
+                portfolio_id,
+                symbol,
+                (array_agg(id ORDER BY created_at, id))[1] AS keep_id,
+                SUM(quantity) AS quantity,
+                SUM(quantity * average_cost) / NULLIF(SUM(quantity), 0) AS average_cost,
+                SUM(market_value) AS market_value,
+                SUM(unrealized_pnl) AS unrealized_pnl
+            FROM positions
+            GROUP BY portfolio_id, symbol
+            HAVING COUNT(*) > 1
+        ),
+        merged AS (
+            UPDATE positions AS p
+            SET quantity = d.quantity,
+                average_cost = d.average_cost,
+                market_value = d.market_value,
+                unrealized_pnl = d.unrealized_pnl,
+                unrealized_pnl_percent = d.unrealized_pnl
+                    / NULLIF(d.quantity * d.average_cost, 0) * 100,
+                last_updated = now() AT TIME ZONE 'utc'
+            FROM duplicates AS d
+            WHERE p.id = d.keep_id
+        )
+        DELETE FROM positions AS p
+        USING duplicates AS d
+        WHERE p.portfolio_id = d.portfolio_id
+            AND p.symbol = d.symbol
+            AND p.id <> d.keep_id
+        """
+    )
+    op.create_index(
+        "uq_positions_portfolio_id_symbol",
+        "positions",
+        ["portfolio_id", "symbol"],
+        unique=True,
+    )
+    op.create_index("ix_orders_portfolio_id_symbol", "orders", ["portfolio_id", "symbol"])
+    op.create_index(
+        "ix_orders_portfolio_id_order_date", "orders", ["portfolio_id", "order_date"]
+    )
+    op.create_index(
+        "ix_recommendations_symbol_status_created_at",
+        "recommendations",
+        ["symbol", "status", "created_at"],
+    )
+    op.create_index(
+        "ix_recommendations_portfolio_id_created_at",
+        "recommendations",
+        ["portfolio_id", "created_at"],
+        postgresql_where=sa.text("portfolio_id IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_recommendations_portfolio_id_created_at", table_name="recommendations")
+    op.drop_index("ix_recommendations_symbol_status_created_at", table_name="recommendations")
+    op.drop_index("ix_orders_portfolio_id_order_date", table_name="orders")
+    op.drop_index("ix_orders_portfolio_id_symbol", table_name="orders")
+    op.drop_index("uq_positions_portfolio_id_symbol", table_name="positions")
+    op.drop_index("ix_portfolios_user_id_created_at", table_name="portfolios")
@@ -0,0 +1,51 @@
+"""Link orders to positions and track realized P&L
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-11-24 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "positions",
+        sa.Column("realized_pnl", sa.Numeric(15, 2), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "orders",
+        sa.Column(
+            "position_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("positions.id", ondelete="SET NULL"),
+            nullable=True,
+        ),
+    )
+    op.create_index("ix_orders_position_id", "orders", ["position_id"])
+    # Link existing orders to their positions. Realized P&L needs a replay
+    # of the order history: run ``python -m app.jobs.rebuild_positions``
+    # once after upgrading
+    op.execute(
+        """
+        UPDATE orders AS o
+        SET position_id = p.id
+        FROM positions AS p
+        WHERE p.portfolio_id = o.portfolio_id AND p.symbol = o.symbol
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_orders_position_id", table_name="orders")
+    op.drop_column("orders", "position_id")
+    op.drop_column("positions", "realized_pnl")
@@ -0,0 +1,32 @@
+"""Idempotency key for imported orders
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-11-27 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("orders", sa.Column("external_id", sa.String(255), nullable=True))
+    op.create_index(
+        "uq_orders_portfolio_id_external_id",
+        "orders",
+        ["portfolio_id", "external_id"],
+        unique=True,
+        postgresql_where=sa.text("external_id IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_orders_portfolio_id_external_id", table_name="orders")
+    op.drop_column("orders", "external_id")
@@ -0,0 +1,41 @@
+"""Daily portfolio snapshots
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-12-01 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "portfolio_snapshots",
+        sa.Column(
+            "portfolio_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("portfolios.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("date", sa.Date(), primary_key=True),
+        sa.Column("total_value", sa.Numeric(15, 2), nullable=False),
+        sa.Column("cash", sa.Numeric(15, 2), nullable=False),
+        sa.Column("invested", sa.Numeric(15, 2), nullable=False),
+        sa.Column("market_value", sa.Numeric(15, 2), nullable=False),
+        sa.Column("total_return", sa.Numeric(15, 2), nullable=False),
+        sa.Column("total_return_percent", sa.Numeric(10, 4), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("portfolio_snapshots")
@@ -3,14 +3,16 @@
 from fastapi import APIRouter
 
 from app.api.v1.endpoints import (
-    portfolios,
-    orders,
-    stocks,
     analysis,
+    backtests,
+    orders,
+    portfolios,
     recommendations,
+    stocks,
     sync,
 )
 
+
 api_router = APIRouter()
 
 api_router.include_router(
@@ -37,6 +39,12 @@ api_router.include_router(
     tags=["analysis"],
 )
 
+api_router.include_router(
+    backtests.router,
+    prefix="/backtests",
+    tags=["backtests"],
+)
+
 api_router.include_router(
     recommendations.router,
     prefix="/recommendations",
@@ -1,16 +1,44 @@
 """Analysis endpoints."""
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.schemas.analysis import TechnicalAnalysisRequest
+from app.services.technical_analysis_service import (
+    TechnicalAnalysisService,
+    get_technical_analysis_service,
+)
 
 
 router = APIRouter()
 
 
 @router.post("/technical")
-async def technical_analysis(symbol: str):
+async def technical_analysis(
+    symbol: str,
+    period: str = "2y",
+    interval: str = "1d",
+    service: TechnicalAnalysisService = Depends(get_technical_analysis_service),
+):
     """Perform technical analysis."""
-    # TODO: Implement
-    return {"symbol": symbol, "status": "pending"}
+    analysis = await service.analyze([symbol], period, interval)
+    result = analysis["results"].get(symbol.upper())
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=analysis["errors"].get(symbol.upper(), f"No data for {symbol}"),
+        )
+    return result
+
+
+@router.post("/technical/batch")
+async def technical_analysis_batch(
+    request: TechnicalAnalysisRequest,
+    service: TechnicalAnalysisService = Depends(get_technical_analysis_service),
+):
+    """Perform technical analysis for many symbols in one call."""
+    return await service.analyze(
+        request.symbols, request.period, request.interval, config=request
+    )
 
 
 @router.post("/fundamental")
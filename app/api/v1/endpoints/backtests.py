@@ -0,0 +1,65 @@
+"""Backtest endpoints."""
+
+import asyncio
+import json
+from typing import AsyncIterator, Dict
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from app.schemas.backtest import BacktestRequest, BacktestSweepRequest
+from app.services.backtest_service import (
+    BacktestService,
+    expand_grid,
+    get_backtest_service,
+)
+
+
+router = APIRouter()
+
+
+@router.post("/")
+async def run_backtest(
+    request: BacktestRequest,
+    service: BacktestService = Depends(get_backtest_service),
+):
+    """Backtest a strategy, sweeping every combination of its parameters."""
+    try:
+        combos = expand_grid(request.strategy, request.params)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    try:
+        return await service.run(request, combos)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Market data provider timed out for {request.symbol}",
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+async def _ndjson(messages: AsyncIterator[Dict]) -> AsyncIterator[str]:
+    async for message in messages:
+        yield json.dumps(message) + "\n"
+
+
+@router.post("/sweep")
+async def run_sweep(
+    request: BacktestSweepRequest,
+    service: BacktestService = Depends(get_backtest_service),
+):
+    """Sweep a strategy's parameters over many symbols on all CPU cores.
+
+    Results are streamed as newline-delimited JSON while jobs finish.
+    """
+    try:
+        combos = expand_grid(request.strategy, request.params)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return StreamingResponse(
+        _ndjson(service.sweep(request, combos)),
+        media_type="application/x-ndjson",
+    )
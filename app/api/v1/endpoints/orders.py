@@ -1,39 +1,121 @@
 """Order management endpoints."""
 
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Response,
+    UploadFile,
+    status,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
 from app.schemas.order import Order, OrderCreate
+from app.services.order_import import OrderImporter, read_csv, read_ndjson
+from app.services.order_service import OrderService
+from app.services.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    page_response,
+    parse_fields,
+)
 
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[Order])
-async def list_orders(db: Session = Depends(get_db)):
-    """List all orders."""
-    # TODO: Implement
-    return []
+async def list_orders(
+    response: Response,
+    portfolio_id: Optional[UUID] = None,
+    user_id: Optional[UUID] = None,
+    symbol: Optional[str] = None,
+    side: Optional[str] = Query(None, pattern="^(buy|sell)$"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """List orders, newest first, one page at a time."""
+    service = OrderService(db)
+    try:
+        page = await service.list_orders_page(
+            portfolio_id=portfolio_id,
+            user_id=user_id,
+            symbol=symbol,
+            side=side,
+            start_date=start_date,
+            end_date=end_date,
+            limit=limit,
+            cursor=cursor,
+            fields=parse_fields(fields, Order),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return page_response(page, response)
 
 
 @router.post("/", response_model=Order, status_code=status.HTTP_201_CREATED)
 async def create_order(
     order: OrderCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+):
+    """Record a new order and update the position it fills."""
+    service = OrderService(db)
+    try:
+        return await service.create_order(order)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Order {order.external_id} already recorded",
+        )
+
+
+@router.post("/import")
+async def import_orders(
+    file: UploadFile = File(...),
+    portfolio_id: Optional[UUID] = None,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_db),
 ):
-    """Record a new order."""
-    # TODO: Implement
-    pass
+    """Import orders from a CSV or NDJSON broker statement.
+
+    The format defaults to the file extension. Rows already imported, by
+    ``external_id`` or by content, are skipped.
+    """
+    if format is None:
+        name = (file.filename or "").lower()
+        format = "ndjson" if name.endswith((".ndjson", ".jsonl")) else "csv"
+    rows = read_ndjson(file.file) if format == "ndjson" else read_csv(file.file)
+    try:
+        return await OrderImporter(db).import_orders(rows, portfolio_id=portfolio_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.get("/{order_id}", response_model=Order)
 async def get_order(
     order_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Get order by ID."""
-    # TODO: Implement
-    pass
+    service = OrderService(db)
+    order = await service.get_order(order_id)
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Order not found",
+        )
+    return order
@@ -1,39 +1,111 @@
 """Portfolio management endpoints."""
 
-from typing import List
+from datetime import date, datetime
+from typing import List, Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
-from app.schemas.portfolio import Portfolio, PortfolioCreate, PortfolioUpdate
+from app.schemas.portfolio import (
+    Portfolio,
+    PortfolioCreate,
+    PortfolioSnapshot,
+    PortfolioUpdate,
+)
+from app.services.optimizer import OptimizerService
+from app.services.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    page_response,
+    parse_fields,
+)
 from app.services.portfolio_service import PortfolioService
+from app.services.risk_service import RiskService
+from app.services.snapshot_service import SnapshotService
 
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[Portfolio])
-async def list_portfolios(db: Session = Depends(get_db)):
-    """List all portfolios."""
+async def list_portfolios(
+    response: Response,
+    user_id: Optional[UUID] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """List portfolios, newest first, one page at a time."""
     service = PortfolioService(db)
-    return await service.list_portfolios()
+    try:
+        page = await service.list_portfolios_page(
+            user_id=user_id,
+            start_date=start_date,
+            end_date=end_date,
+            limit=limit,
+            cursor=cursor,
+            fields=parse_fields(fields, Portfolio),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return page_response(page, response)
 
 
 @router.post("/", response_model=Portfolio, status_code=status.HTTP_201_CREATED)
 async def create_portfolio(
     portfolio: PortfolioCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Create a new portfolio."""
     service = PortfolioService(db)
     return await service.create_portfolio(portfolio)
 
 
+@router.get("/performance")
+async def get_portfolios_performance(
+    ids: Optional[str] = None,
+    user_id: Optional[UUID] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Get performance metrics for a comma-separated list of portfolio IDs,
+    or for every portfolio of a user."""
+    service = PortfolioService(db)
+    if ids:
+        try:
+            portfolio_ids = list(
+                dict.fromkeys(UUID(i.strip()) for i in ids.split(",") if i.strip())
+            )
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid portfolio ID",
+            )
+    elif user_id:
+        portfolio_ids = await service.list_portfolio_ids(user_id)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Either ids or user_id is required",
+        )
+
+    performance = await service.calculate_performance_many(portfolio_ids)
+    return {
+        "performance": {
+            str(i): performance[i] for i in portfolio_ids if i in performance
+        },
+        "missing": [str(i) for i in portfolio_ids if i not in performance],
+    }
+
+
 @router.get("/{portfolio_id}", response_model=Portfolio)
 async def get_portfolio(
     portfolio_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Get portfolio by ID."""
     service = PortfolioService(db)
@@ -50,7 +122,7 @@ async def get_portfolio(
 async def update_portfolio(
     portfolio_id: UUID,
     portfolio: PortfolioUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Update portfolio."""
     service = PortfolioService(db)
@@ -66,7 +138,7 @@ async def update_portfolio(
 @router.delete("/{portfolio_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_portfolio(
     portfolio_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Delete portfolio."""
     service = PortfolioService(db)
@@ -82,8 +154,83 @@ async def delete_portfolio(
 @router.get("/{portfolio_id}/performance")
 async def get_portfolio_performance(
     portfolio_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Get portfolio performance metrics."""
     service = PortfolioService(db)
     return await service.calculate_performance(portfolio_id)
+
+
+@router.get("/{portfolio_id}/equity-curve", response_model=List[PortfolioSnapshot])
+async def get_portfolio_equity_curve(
+    portfolio_id: UUID,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Get daily portfolio values between two dates (inclusive), oldest first."""
+    service = SnapshotService(db)
+    return await service.get_equity_curve(portfolio_id, start_date, end_date)
+
+
+@router.get("/{portfolio_id}/risk")
+async def get_portfolio_risk(
+    portfolio_id: UUID,
+    period: Optional[str] = None,
+    confidence: float = Query(0.95, gt=0.5, lt=1),
+    correlation: bool = False,
+    db: AsyncSession = Depends(get_db),
+):
+    """Get volatility, beta, VaR/CVaR and optionally the position correlation matrix."""
+    service = RiskService(db)
+    try:
+        risk = await service.portfolio_risk(
+            portfolio_id, period, confidence, correlation
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if risk is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found",
+        )
+    return risk
+
+
+@router.get("/{portfolio_id}/optimize")
+async def optimize_portfolio(
+    portfolio_id: UUID,
+    method: str = Query(
+        "min_variance", pattern="^(mean_variance|min_variance|risk_parity)$"
+    ),
+    max_weight: Optional[float] = Query(None, gt=0, le=1),
+    turnover: Optional[float] = Query(None, ge=0, le=2),
+    risk_aversion: Optional[float] = Query(None, gt=0),
+    period: Optional[str] = None,
+    symbols: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Propose target weights and trades for a portfolio.
+
+    ``symbols`` is a comma-separated list of candidates to consider buying.
+    """
+    service = OptimizerService(db)
+    candidates = [s.strip() for s in symbols.split(",") if s.strip()] if symbols else []
+    try:
+        proposal = await service.propose(
+            portfolio_id,
+            method=method,
+            max_weight=max_weight,
+            turnover=turnover,
+            risk_aversion=risk_aversion,
+            period=period,
+            symbols=candidates,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if proposal is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found",
+        )
+    return proposal
@@ -1,28 +1,118 @@
 """Recommendation endpoints."""
 
-from typing import List
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
+from app.schemas.recommendation import GeneratedRecommendations, Recommendation
+from app.services.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    page_response,
+    parse_fields,
+)
+from app.services.recommendation_service import RecommendationService
 
 
 router = APIRouter()
 
 
-@router.get("/")
-async def list_recommendations(db: Session = Depends(get_db)):
-    """List all recommendations."""
-    # TODO: Implement
-    return []
+@router.get("/", response_model=List[Recommendation])
+async def list_recommendations(
+    response: Response,
+    portfolio_id: Optional[UUID] = None,
+    user_id: Optional[UUID] = None,
+    symbol: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """List recommendations, newest first, one page at a time."""
+    service = RecommendationService(db)
+    try:
+        page = await service.list_recommendations_page(
+            portfolio_id=portfolio_id,
+            user_id=user_id,
+            symbol=symbol,
+            status=status_filter,
+            start_date=start_date,
+            end_date=end_date,
+            limit=limit,
+            cursor=cursor,
+            fields=parse_fields(fields, Recommendation),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return page_response(page, response)
 
 
-@router.post("/generate")
+@router.post("/generate", response_model=GeneratedRecommendations)
 async def generate_recommendations(
     portfolio_id: UUID,
-    db: Session = Depends(get_db),
+    provider: str = Query("openai", pattern="^(openai|anthropic)$"),
+    reuse: bool = False,
+    db: AsyncSession = Depends(get_db),
 ):
-    """Generate AI recommendations for a portfolio."""
-    # TODO: Implement
-    return {"portfolio_id": str(portfolio_id), "status": "generating"}
+    """Generate AI recommendations for every open position of a portfolio.
+
+    With ``reuse``, still-active recommendations are reused instead of
+    asking the model again.
+    """
+    service = RecommendationService(db)
+    try:
+        generated = await service.generate_for_portfolio(portfolio_id, provider, reuse)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if generated is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found",
+        )
+    return generated
+
+
+async def _sse(events: AsyncIterator[Dict]) -> AsyncIterator[str]:
+    async for event in events:
+        data = event["data"]
+        if event["event"] == "recommendation":
+            data = Recommendation.model_validate(data).model_dump(mode="json")
+        yield f"event: {event['event']}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/stream")
+async def stream_recommendation(
+    symbol: str,
+    portfolio_id: Optional[UUID] = None,
+    provider: str = Query("openai", pattern="^(openai|anthropic)$"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Generate one AI recommendation, streamed as Server-Sent Events.
+
+    The model's answer is streamed as it is written; the last event is the
+    stored recommendation.
+    """
+    service = RecommendationService(db)
+    try:
+        events = await service.stream_recommendation(symbol, portfolio_id, provider)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if events is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found",
+        )
+    return StreamingResponse(
+        _sse(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,19 +1,61 @@
 """Stock data endpoints."""
 
-from fastapi import APIRouter, HTTPException, status
-from app.services.market_data_service import MarketDataService
+import asyncio
+import io
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+
+from app.services.market_data_service import (
+    MarketDataService,
+    get_market_data_service,
+)
 
 
 router = APIRouter()
 
 
+def _provider_timeout(symbol: str) -> HTTPException:
+    """Build the error raised when the market data provider times out."""
+    return HTTPException(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        detail=f"Market data provider timed out for {symbol}",
+    )
+
+
+@router.get("/quotes")
+async def get_stock_quotes(
+    symbols: str,
+    service: MarketDataService = Depends(get_market_data_service),
+):
+    """Get current prices for a comma-separated list of symbols."""
+    symbol_list = [s for s in symbols.split(",") if s.strip()]
+    if not symbol_list:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one symbol is required",
+        )
+    return await service.get_batch_quotes(symbol_list)
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(
+    service: MarketDataService = Depends(get_market_data_service),
+):
+    """Get market data cache hit/miss counters."""
+    return service.cache.get_stats()
+
+
 @router.get("/{symbol}")
-async def get_stock(symbol: str):
+async def get_stock(
+    symbol: str,
+    service: MarketDataService = Depends(get_market_data_service),
+):
     """Get stock information."""
-    service = MarketDataService()
     try:
         return await service.get_stock_info(symbol)
-    except Exception as e:
+    except asyncio.TimeoutError:
+        raise _provider_timeout(symbol)
+    except Exception:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Stock {symbol} not found",
@@ -21,10 +63,15 @@ async def get_stock(symbol: str):
 
 
 @router.get("/{symbol}/price")
-async def get_stock_price(symbol: str):
+async def get_stock_price(
+    symbol: str,
+    service: MarketDataService = Depends(get_market_data_service),
+):
     """Get current stock price."""
-    service = MarketDataService()
-    return await service.get_current_price(symbol)
+    try:
+        return await service.get_current_price(symbol)
+    except asyncio.TimeoutError:
+        raise _provider_timeout(symbol)
 
 
 @router.get("/{symbol}/history")
@@ -32,7 +79,30 @@ async def get_stock_history(
     symbol: str,
     period: str = "1mo",
     interval: str = "1d",
+    format: str = Query("rows", pattern="^(rows|columnar|arrow|parquet)$"),
+    service: MarketDataService = Depends(get_market_data_service),
 ):
-    """Get historical stock data."""
-    service = MarketDataService()
-    return await service.get_historical_data(symbol, period, interval)
+    """Get historical stock data.
+
+    ``rows`` (default) and ``columnar`` return JSON; ``arrow`` returns an
+    Arrow IPC stream and ``parquet`` a Parquet file.
+    """
+    try:
+        if format in ("rows", "columnar"):
+            return await service.get_historical_data(symbol, period, interval, format)
+        table = await service.get_historical_table(symbol, period, interval)
+    except asyncio.TimeoutError:
+        raise _provider_timeout(symbol)
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = io.BytesIO()
+    if format == "arrow":
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        media_type = "application/vnd.apache.arrow.stream"
+    else:
+        pq.write_table(table, sink)
+        media_type = "application/vnd.apache.parquet"
+    return Response(content=sink.getvalue(), media_type=media_type)
@@ -1,8 +1,9 @@
 """Application configuration."""
 
 from typing import List
-from pydantic_settings import BaseSettings
+
 from pydantic import Field
+from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
@@ -31,32 +32,68 @@ class Settings(BaseSettings):
     NOTION_API_KEY: str = ""
     NOTION_VERSION: str = "2023-12-01"
     GOOGLE_SHEETS_CREDENTIALS_PATH: str = "./credentials.json"
-    
+
     # AI Services
     OPENAI_API_KEY: str = ""
     OPENAI_MODEL: str = "gpt-4-turbo-preview"
     ANTHROPIC_API_KEY: str = ""
     ANTHROPIC_MODEL: str = "claude-3-opus-20240229"
-    
+    AI_MAX_CONCURRENCY: int = 64
+    AI_REQUEST_TIMEOUT: float = 60.0
+    RECOMMENDATION_EXPIRY_HOURS: int = 24
+    AI_CACHE_ENABLED: bool = True
+    AI_BATCH_SIZE: int = 10  # symbols per request; 1 = one request per symbol
+    AI_BATCH_RETRIES: int = 1
+    AI_BATCH_POLL_INTERVAL: float = 60.0
+    AI_BATCH_TIMEOUT: float = 86400.0
+
     # Data Providers
     YAHOO_FINANCE_RATE_LIMIT: int = 2000
     ALPHA_VANTAGE_API_KEY: str = ""
-    
+
+    # Market Data
+    MARKET_DATA_MAX_WORKERS: int = 8
+    MARKET_DATA_TIMEOUT: float = 10.0
+    MARKET_DATA_BATCH_SIZE: int = 25
+    MARKET_DATA_CACHE_SIZE: int = 1024
+    MARKET_DATA_QUOTE_TTL: int = 15
+    MARKET_DATA_INTRADAY_TTL: int = 300
+    MARKET_DATA_DISTRIBUTED_LOCK: bool = False
+    MARKET_DATA_LOCK_TIMEOUT: float = 15.0
+    MARKET_DATA_STORE_ENABLED: bool = True
+    MARKET_DATA_STORE_PATH: str = "./data/bars"
+
+    # Backtesting
+    BACKTEST_MAX_WORKERS: int = 0  # 0 = one process per CPU core
+
+    # Risk Analytics
+    RISK_BENCHMARK_SYMBOL: str = "SPY"
+    RISK_LOOKBACK_PERIOD: str = "1y"
+    RISK_CACHE_TTL: int = 3600
+
+    # Portfolio Optimization
+    OPTIMIZER_LOOKBACK_PERIOD: str = "1y"
+    OPTIMIZER_RISK_AVERSION: float = 3.0
+    OPTIMIZER_MAX_WEIGHT: float = 1.0
+    OPTIMIZER_CACHE_TTL: int = 86400
+
     # Slack
     SLACK_BOT_TOKEN: str = ""
     SLACK_SIGNING_SECRET: str = ""
-    
+
     # Security
     ALLOWED_HOSTS: List[str] = ["localhost", "127.0.0.1"]
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8000"]
-    
+
     # Rate Limiting
     RATE_LIMIT_ENABLED: bool = True
     RATE_LIMIT_REQUESTS_PER_MINUTE: int = 60
-    
+
     # Background Jobs
     CELERY_BROKER_URL: str = "redis://localhost:6379/1"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/2"
+    # Positions written per bulk UPDATE statement
+    REVALUATION_BATCH_SIZE: int = 5000
 
     class Config:
         env_file = ".env"
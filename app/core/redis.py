@@ -1,6 +1,8 @@
 """Redis client configuration."""
 
 import redis
+import redis.asyncio as aioredis
+
 from app.core.config import settings
 
 
@@ -10,7 +12,18 @@ redis_client = redis.from_url(
     decode_responses=True,
 )
 
+async_redis_client = aioredis.from_url(
+    settings.REDIS_URL,
+    encoding="utf-8",
+    decode_responses=True,
+)
+
 
 def get_redis():
     """Get Redis client."""
     return redis_client
+
+
+def get_async_redis():
+    """Get asyncio Redis client."""
+    return async_redis_client
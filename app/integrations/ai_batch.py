@@ -0,0 +1,224 @@
+"""Asynchronous batch APIs of AI services (OpenAI and Anthropic)."""
+
+import json
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
+
+from app.core.config import settings
+from app.integrations.ai_client import SYSTEM_PROMPT, AIClient
+
+
+@dataclass
+class BatchRequest:
+    """One prompt of a batch; ``custom_id`` identifies its result."""
+
+    custom_id: str
+    prompt: str
+    max_tokens: int = 1000
+
+
+# Batch states, normalized across providers
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class BatchProvider(ABC):
+    """Submits prompts to a provider's batch API and collects the answers.
+
+    Batches are processed by the provider within a day, at a discount and
+    outside the online rate limits.
+    """
+
+    name = ""
+    model = ""
+
+    @abstractmethod
+    async def submit(self, requests: List[BatchRequest]) -> str:
+        """Submit prompts as one batch and get its ID."""
+
+    @abstractmethod
+    async def status(self, batch_id: str) -> str:
+        """Get whether a batch is in progress, completed or failed."""
+
+    @abstractmethod
+    async def results(self, batch_id: str) -> Dict[str, Union[str, Exception]]:
+        """Get the answer text, or the error, of each finished request of a batch.
+
+        Failed batches, e.g. expired or cancelled ones, still return the
+        requests they finished.
+        """
+
+
+class OpenAIBatchProvider(BatchProvider):
+    """OpenAI Batch API over chat completions."""
+
+    name = "openai"
+
+    def __init__(self, client):
+        self.client = client
+        self.model = settings.OPENAI_MODEL
+
+    async def submit(self, requests: List[BatchRequest]) -> str:
+        lines = (
+            json.dumps(
+                {
+                    "custom_id": request.custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": self.model,
+                        "messages": [
+                            {"role": "system", "content": SYSTEM_PROMPT},
+                            {"role": "user", "content": request.prompt},
+                        ],
+                        "temperature": 0.7,
+                        "max_tokens": request.max_tokens,
+                    },
+                }
+            )
+            for request in requests
+        )
+        upload = await self.client.files.create(
+            file=("recommendations.jsonl", "\n".join(lines).encode()),
+            purpose="batch",
+        )
+        batch = await self.client.batches.create(
+            input_file_id=upload.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    async def status(self, batch_id: str) -> str:
+        batch = await self.client.batches.retrieve(batch_id)
+        if batch.status == "completed":
+            return COMPLETED
+        if batch.status in ("failed", "expired", "cancelled"):
+            return FAILED
+        return IN_PROGRESS
+
+    async def results(self, batch_id: str) -> Dict[str, Union[str, Exception]]:
+        batch = await self.client.batches.retrieve(batch_id)
+        results: Dict[str, Union[str, Exception]] = {}
+        for file_id in (batch.error_file_id, batch.output_file_id):
+            if not file_id:
+                continue
+            content = await self.client.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                response = entry.get("response") or {}
+                if entry.get("error") or response.get("status_code") != 200:
+                    error = (
+                        entry.get("error")
+                        or response.get("body", {}).get("error")
+                        or {}
+                    )
+                    results[entry["custom_id"]] = ValueError(
+                        error.get("message")
+                        or f"Request failed with status {response.get('status_code')}"
+                    )
+                else:
+                    results[entry["custom_id"]] = response["body"]["choices"][0][
+                        "message"
+                    ]["content"]
+        return results
+
+
+class AnthropicBatchProvider(BatchProvider):
+    """Anthropic Message Batches API."""
+
+    name = "anthropic"
+
+    def __init__(self, client):
+        self.client = client
+        self.model = settings.ANTHROPIC_MODEL
+
+    async def submit(self, requests: List[BatchRequest]) -> str:
+        batch = await self.client.messages.batches.create(
+            requests=[
+                {
+                    "custom_id": request.custom_id,
+                    "params": {
+                        "model": self.model,
+                        "max_tokens": request.max_tokens,
+                        "messages": [{"role": "user", "content": request.prompt}],
+                    },
+                }
+                for request in requests
+            ]
+        )
+        return batch.id
+
+    async def status(self, batch_id: str) -> str:
+        batch = await self.client.messages.batches.retrieve(batch_id)
+        return COMPLETED if batch.processing_status == "ended" else IN_PROGRESS
+
+    async def results(self, batch_id: str) -> Dict[str, Union[str, Exception]]:
+        results: Dict[str, Union[str, Exception]] = {}
+        async for entry in await self.client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                results[entry.custom_id] = entry.result.message.content[0].text
+            else:
+                results[entry.custom_id] = ValueError(f"Request {entry.result.type}")
+        return results
+
+
+class FakeBatchProvider(BatchProvider):
+    """Local stand-in for a batch API, for tests and development.
+
+    Batches complete after ``polls`` status checks and answer every prompt
+    with ``answer(prompt)``, a fixed hold recommendation by default.
+    """
+
+    name = "fake"
+    model = "fake"
+
+    def __init__(self, answer=None, polls: int = 1):
+        self.answer = answer or (
+            lambda prompt: json.dumps(
+                {
+                    "action": "hold",
+                    "confidence_score": 0.5,
+                    "reasoning": "Fake batch answer",
+                }
+            )
+        )
+        self.polls = polls
+        self.batches: Dict[str, Dict] = {}
+
+    async def submit(self, requests: List[BatchRequest]) -> str:
+        batch_id = f"fake-{uuid.uuid4().hex}"
+        self.batches[batch_id] = {"requests": list(requests), "polls": 0}
+        return batch_id
+
+    async def status(self, batch_id: str) -> str:
+        batch = self.batches[batch_id]
+        batch["polls"] += 1
+        return COMPLETED if batch["polls"] >= self.polls else IN_PROGRESS
+
+    async def results(self, batch_id: str) -> Dict[str, Union[str, Exception]]:
+        results: Dict[str, Union[str, Exception]] = {}
+        for request in self.batches[batch_id]["requests"]:
+            try:
+                results[request.custom_id] = self.answer(request.prompt)
+            except Exception as e:
+                results[request.custom_id] = e
+        return results
+
+
+def get_batch_provider(
+    name: str, ai_client: Optional[AIClient] = None
+) -> BatchProvider:
+    """Get the batch provider ``openai``, ``anthropic`` or ``fake``."""
+    if name == "fake":
+        return FakeBatchProvider()
+    if not ai_client or not ai_client.is_available(name):
+        raise ValueError(f"AI provider {name} not available or not configured")
+    if name == "openai":
+        return OpenAIBatchProvider(ai_client.openai_client)
+    return AnthropicBatchProvider(ai_client.anthropic_client)
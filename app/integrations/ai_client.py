@@ -1,97 +1,402 @@
 """AI service clients (OpenAI and Anthropic)."""
 
-from typing import Dict, List, Optional
-import openai
+import hashlib
+import json
+import math
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
 import anthropic
+import openai
 
 from app.core.config import settings
 from app.core.logging import logger
+from app.services.market_data_cache import MarketDataCache
+
+
+SYSTEM_PROMPT = "You are an expert financial advisor providing trading recommendations."
+
+# Significant digits prompt inputs are rounded to, so that quotes moving
+# by a fraction of a cent still produce the same prompt
+FEATURE_DIGITS = 4
+
+
+def normalize_features(analysis_data: Dict) -> Dict:
+    """Round numeric prompt inputs to ``FEATURE_DIGITS`` significant digits."""
+    normalized: Dict[str, Any] = {}
+    for key, value in analysis_data.items():
+        if isinstance(value, float) and math.isfinite(value) and value != 0:
+            digits = FEATURE_DIGITS - 1 - math.floor(math.log10(abs(value)))
+            value = round(value, digits)
+            if digits <= 0:
+                value = int(value)
+        normalized[key] = value
+    return normalized
+
+
+# Output tokens allowed for one recommendation, and for a whole batch
+MAX_TOKENS = 1000
+MAX_BATCH_TOKENS = 4096
+BATCH_TOKENS_PER_SYMBOL = 400
+
+
+def _json_objects(content: str) -> List[Dict]:
+    """Get the recommendation objects in a model response.
+
+    The response is read as one JSON document first: an array of objects,
+    an object wrapping such an array, or a single object. If that fails,
+    e.g. because the output was cut short, every complete object in the
+    text is decoded on its own.
+    """
+    start = min(
+        (i for i in (content.find("["), content.find("{")) if i != -1), default=-1
+    )
+    end = max(content.rfind("]"), content.rfind("}")) + 1
+    if start == -1 or end <= start:
+        return []
+    try:
+        document = json.loads(content[start:end])
+    except json.JSONDecodeError:
+        document = None
+    if isinstance(document, dict):
+        nested = [v for v in document.values() if isinstance(v, list)]
+        document = nested[0] if "action" not in document and nested else [document]
+    if isinstance(document, list):
+        return [item for item in document if isinstance(item, dict)]
+
+    decoder = json.JSONDecoder()
+    objects = []
+    position = content.find("{")
+    while position != -1:
+        try:
+            item, position = decoder.raw_decode(content, position)
+        except json.JSONDecodeError:
+            position += 1
+        else:
+            if isinstance(item, dict):
+                objects.append(item)
+        position = content.find("{", position)
+    return objects
+
+
+def prompt_key(provider: str, model: str, prompt: str) -> str:
+    """Get the cache key of a prompt: a hash of the provider, model and text."""
+    content = "\0".join([provider, model, SYSTEM_PROMPT, " ".join(prompt.split())])
+    return "recommendation:" + hashlib.sha256(content.encode()).hexdigest()
+
+
+class _Unparsed(Exception):
+    """Raised by a cache loader to return a fallback answer without caching it."""
+
+    def __init__(self, response: Dict):
+        super().__init__("AI response has no JSON recommendation")
+        self.response = response
 
 
 class AIClient:
-    """Client for AI services."""
+    """Client for AI services.
+
+    Uses the asynchronous SDK clients, so requests wait on the event loop
+    instead of blocking it, and many can be in flight at once over the
+    clients' shared connection pools.
+
+    Responses are cached by prompt content for the lifetime of a
+    recommendation, and concurrent identical prompts share one request,
+    so a symbol held in many portfolios is paid for once per window.
+    """
+
+    def __init__(self, cache: Optional[MarketDataCache] = None):
+        self.cache = cache if cache is not None else MarketDataCache(prefix="ai")
+
+        self.openai_client: Optional[openai.AsyncOpenAI] = None
+        self.anthropic_client: Optional[anthropic.AsyncAnthropic] = None
 
-    def __init__(self):
         # Initialize OpenAI
         if settings.OPENAI_API_KEY:
-            openai.api_key = settings.OPENAI_API_KEY
-            self.openai_client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-        else:
-            self.openai_client = None
+            self.openai_client = openai.AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                timeout=settings.AI_REQUEST_TIMEOUT,
+            )
 
         # Initialize Anthropic
         if settings.ANTHROPIC_API_KEY:
-            self.anthropic_client = anthropic.Anthropic(
-                api_key=settings.ANTHROPIC_API_KEY
+            self.anthropic_client = anthropic.AsyncAnthropic(
+                api_key=settings.ANTHROPIC_API_KEY,
+                timeout=settings.AI_REQUEST_TIMEOUT,
             )
-        else:
-            self.anthropic_client = None
+
+    def is_available(self, provider: str) -> bool:
+        """Check whether a provider is configured."""
+        if provider == "openai":
+            return self.openai_client is not None
+        if provider == "anthropic":
+            return self.anthropic_client is not None
+        return False
 
     async def generate_recommendation(
         self,
         symbol: str,
         analysis_data: Dict,
         provider: str = "openai",
+        use_cache: bool = True,
     ) -> Dict:
-        """Generate trading recommendation using AI."""
-        prompt = self._build_recommendation_prompt(symbol, analysis_data)
+        """Generate trading recommendation using AI.
+
+        The result carries ``generated_at``, the time the model answered,
+        which is earlier than now when it comes from the cache. Answers
+        without JSON fall back to ``hold`` and are not cached.
+        """
+        prompt = self.prepare_prompt(symbol, analysis_data)
+        model, complete = self._provider(provider)
+
+        async def _load() -> Dict:
+            content = await complete(prompt, MAX_TOKENS)
+            generated_at = datetime.utcnow().isoformat()
+            response = self.extract_recommendation(content)
+            if response is None:
+                raise _Unparsed(
+                    {**self.parse_recommendation(content), "generated_at": generated_at}
+                )
+            return {**response, "generated_at": generated_at}
+
+        try:
+            if not (use_cache and settings.AI_CACHE_ENABLED):
+                return await _load()
+            return await self.cache.get_or_load(
+                prompt_key(provider, model, prompt),
+                settings.RECOMMENDATION_EXPIRY_HOURS * 3600,
+                _load,
+            )
+        except _Unparsed as e:
+            return e.response
 
+    async def generate_recommendations(
+        self,
+        analysis: Dict[str, Dict],
+        provider: str = "openai",
+        use_cache: bool = True,
+    ) -> Dict[str, Any]:
+        """Generate recommendations for several symbols in one request.
+
+        ``analysis`` maps symbols to their prompt inputs. The instructions
+        and JSON format are sent once for all symbols, and the model
+        answers with a JSON array. Symbols missing from the answer or
+        unparseable are asked again, alone in a smaller batch, up to
+        ``AI_BATCH_RETRIES`` times; the ones still missing map to a
+        ``ValueError``. Answers are cached per symbol under the key of the
+        symbol's single prompt, so both modes share the cache.
+        """
+        model, complete = self._provider(provider)
+        inputs = {symbol: normalize_features(data) for symbol, data in analysis.items()}
+        keys = {
+            symbol: prompt_key(
+                provider, model, self._build_recommendation_prompt(symbol, data)
+            )
+            for symbol, data in inputs.items()
+        }
+        caching = use_cache and settings.AI_CACHE_ENABLED
+
+        results: Dict[str, Any] = {}
+        if caching:
+            cached = await self.cache.get_many(list(keys.values()))
+            results = {
+                symbol: cached[key] for symbol, key in keys.items() if key in cached
+            }
+        pending = [symbol for symbol in inputs if symbol not in results]
+
+        for attempt in range(settings.AI_BATCH_RETRIES + 1):
+            if not pending:
+                break
+            if attempt:
+                logger.warning(
+                    "Retrying unparsed recommendations",
+                    symbols=pending,
+                    attempt=attempt,
+                )
+            content = await complete(
+                self._build_batch_prompt(
+                    {symbol: inputs[symbol] for symbol in pending}
+                ),
+                min(
+                    MAX_BATCH_TOKENS,
+                    max(MAX_TOKENS, BATCH_TOKENS_PER_SYMBOL * len(pending)),
+                ),
+            )
+            generated_at = datetime.utcnow().isoformat()
+            parsed = {
+                symbol: {**response, "generated_at": generated_at}
+                for symbol, response in self._parse_recommendations(
+                    content, pending
+                ).items()
+            }
+            results.update(parsed)
+            if caching and parsed:
+                await self.cache.set_many(
+                    {keys[symbol]: response for symbol, response in parsed.items()},
+                    settings.RECOMMENDATION_EXPIRY_HOURS * 3600,
+                )
+            pending = [symbol for symbol in pending if symbol not in parsed]
+
+        for symbol in pending:
+            results[symbol] = ValueError(
+                f"No recommendation for {symbol} in AI response"
+            )
+        return results
+
+    async def stream_recommendation(
+        self,
+        symbol: str,
+        analysis_data: Dict,
+        provider: str = "openai",
+        use_cache: bool = True,
+    ) -> AsyncIterator[Dict]:
+        """Stream a trading recommendation while the model writes it.
+
+        Yields ``{"token": text}`` for every piece of the answer as it
+        arrives, then ``{"recommendation": response}`` with the parsed
+        result, cached like ``generate_recommendation``'s. A cached answer
+        is yielded at once, without tokens.
+        """
+        prompt = self.prepare_prompt(symbol, analysis_data)
+        model, _ = self._provider(provider)
+        key = prompt_key(provider, model, prompt)
+        use_cache = use_cache and settings.AI_CACHE_ENABLED
+        if use_cache:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                yield {"recommendation": cached}
+                return
+
+        stream = (
+            self._stream_with_openai
+            if provider == "openai"
+            else self._stream_with_anthropic
+        )
+        chunks: List[str] = []
+        async for text in stream(prompt, MAX_TOKENS):
+            chunks.append(text)
+            yield {"token": text}
+
+        content = "".join(chunks)
+        parsed = self.extract_recommendation(content)
+        response = {
+            **(self.parse_recommendation(content) if parsed is None else parsed),
+            "generated_at": datetime.utcnow().isoformat(),
+        }
+        if use_cache and parsed is not None:
+            await self.cache.set(
+                key, response, settings.RECOMMENDATION_EXPIRY_HOURS * 3600
+            )
+        yield {"recommendation": response}
+
+    def prepare_prompt(self, symbol: str, analysis_data: Dict) -> str:
+        """Build the single-symbol prompt from normalized inputs."""
+        return self._build_recommendation_prompt(
+            symbol, normalize_features(analysis_data)
+        )
+
+    def _provider(
+        self, provider: str
+    ) -> Tuple[str, Callable[[str, int], Awaitable[str]]]:
+        """Get the model and completion function of a configured provider."""
         if provider == "openai" and self.openai_client:
-            return await self._generate_with_openai(prompt)
-        elif provider == "anthropic" and self.anthropic_client:
-            return await self._generate_with_anthropic(prompt)
-        else:
-            raise ValueError(f"AI provider {provider} not available or not configured")
+            return settings.OPENAI_MODEL, self._complete_with_openai
+        if provider == "anthropic" and self.anthropic_client:
+            return settings.ANTHROPIC_MODEL, self._complete_with_anthropic
+        raise ValueError(f"AI provider {provider} not available or not configured")
 
-    async def _generate_with_openai(self, prompt: str) -> Dict:
-        """Generate recommendation using OpenAI."""
+    async def _complete_with_openai(self, prompt: str, max_tokens: int) -> str:
+        """Get the text of an OpenAI chat completion."""
+        assert self.openai_client is not None
         try:
-            response = self.openai_client.chat.completions.create(
+            response = await self.openai_client.chat.completions.create(
                 model=settings.OPENAI_MODEL,
                 messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert financial advisor providing trading recommendations.",
-                    },
+                    {"role": "system", "content": SYSTEM_PROMPT},
                     {"role": "user", "content": prompt},
                 ],
                 temperature=0.7,
+                max_tokens=max_tokens,
             )
-
-            content = response.choices[0].message.content
-            return self._parse_recommendation(content)
+            return response.choices[0].message.content or ""
         except Exception as e:
             logger.error("OpenAI API error", error=str(e))
             raise
 
-    async def _generate_with_anthropic(self, prompt: str) -> Dict:
-        """Generate recommendation using Anthropic Claude."""
+    async def _complete_with_anthropic(self, prompt: str, max_tokens: int) -> str:
+        """Get the text of an Anthropic Claude message."""
+        assert self.anthropic_client is not None
         try:
-            response = self.anthropic_client.messages.create(
+            response = await self.anthropic_client.messages.create(
                 model=settings.ANTHROPIC_MODEL,
-                max_tokens=1000,
+                max_tokens=max_tokens,
                 messages=[{"role": "user", "content": prompt}],
             )
-
-            content = response.content[0].text
-            return self._parse_recommendation(content)
+            return "".join(
+                block.text for block in response.content if block.type == "text"
+            )
         except Exception as e:
             logger.error("Anthropic API error", error=str(e))
             raise
 
-    def _build_recommendation_prompt(self, symbol: str, analysis_data: Dict) -> str:
-        """Build prompt for AI recommendation."""
-        return f"""
-Analyze the following stock and provide a trading recommendation:
+    async def _stream_with_openai(
+        self, prompt: str, max_tokens: int
+    ) -> AsyncIterator[str]:
+        """Stream the text of an OpenAI chat completion."""
+        assert self.openai_client is not None
+        try:
+            stream = await self.openai_client.chat.completions.create(
+                model=settings.OPENAI_MODEL,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=0.7,
+                max_tokens=max_tokens,
+                stream=True,
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            logger.error("OpenAI API error", error=str(e))
+            raise
+
+    async def _stream_with_anthropic(
+        self, prompt: str, max_tokens: int
+    ) -> AsyncIterator[str]:
+        """Stream the text of an Anthropic Claude message."""
+        assert self.anthropic_client is not None
+        try:
+            async with self.anthropic_client.messages.stream(
+                model=settings.ANTHROPIC_MODEL,
+                max_tokens=max_tokens,
+                messages=[{"role": "user", "content": prompt}],
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield text
+        except Exception as e:
+            logger.error("Anthropic API error", error=str(e))
+            raise
 
-Symbol: {symbol}
+    @staticmethod
+    def _format_inputs(symbol: str, analysis_data: Dict) -> str:
+        """Format the prompt inputs of one symbol."""
+        return f"""Symbol: {symbol}
 Current Price: ${analysis_data.get('current_price', 'N/A')}
 Market Cap: ${analysis_data.get('market_cap', 'N/A')}
 P/E Ratio: {analysis_data.get('pe_ratio', 'N/A')}
 RSI: {analysis_data.get('rsi', 'N/A')}
 MACD: {analysis_data.get('macd', 'N/A')}
 50-day MA: ${analysis_data.get('ma_50', 'N/A')}
-200-day MA: ${analysis_data.get('ma_200', 'N/A')}
+200-day MA: ${analysis_data.get('ma_200', 'N/A')}"""
+
+    def _build_recommendation_prompt(self, symbol: str, analysis_data: Dict) -> str:
+        """Build prompt for AI recommendation."""
+        return f"""
+Analyze the following stock and provide a trading recommendation:
+
+{self._format_inputs(symbol, analysis_data)}
 
 Provide your recommendation in the following JSON format:
 {{
@@ -104,28 +409,113 @@ Provide your recommendation in the following JSON format:
 }}
 """
 
-    def _parse_recommendation(self, content: str) -> Dict:
-        """Parse AI response into structured recommendation."""
-        import json
+    def _build_batch_prompt(self, analysis: Dict[str, Dict]) -> str:
+        """Build one prompt asking for recommendations on several stocks."""
+        stocks = "\n\n".join(
+            self._format_inputs(symbol, data) for symbol, data in analysis.items()
+        )
+        return f"""
+Analyze each of the following {len(analysis)} stocks and provide a trading recommendation for each:
 
-        try:
-            # Try to extract JSON from response
-            start = content.find("{")
-            end = content.rfind("}") + 1
-            if start != -1 and end > start:
-                json_str = content[start:end]
-                return json.loads(json_str)
-            else:
-                # Fallback if no JSON found
-                return {
-                    "action": "hold",
-                    "confidence_score": 0.5,
-                    "reasoning": content,
-                }
-        except json.JSONDecodeError:
-            logger.warning("Failed to parse AI response as JSON")
+{stocks}
+
+Provide your recommendations as a JSON array with one object per stock, in the same order, in the following format:
+[
+  {{
+    "symbol": "AAPL",
+    "action": "buy|sell|hold",
+    "confidence_score": 0.0-1.0,
+    "target_price": 0.00,
+    "stop_loss": 0.00,
+    "time_horizon": "short-term|medium-term|long-term",
+    "reasoning": "Detailed explanation of your recommendation"
+  }}
+]
+"""
+
+    def parse_recommendation(self, content: str) -> Dict:
+        """Parse AI response into structured recommendation."""
+        response = self.extract_recommendation(content)
+        if response is None:
+            # Fallback if no JSON found
             return {
                 "action": "hold",
                 "confidence_score": 0.5,
                 "reasoning": content,
             }
+        return response
+
+    def extract_recommendation(self, content: str) -> Optional[Dict]:
+        """Get the JSON recommendation of an AI response, or None if it has none.
+
+        Responses without one get a fallback from ``parse_recommendation``,
+        which is never cached, so the next request asks again.
+        """
+        start = content.find("{")
+        end = content.rfind("}") + 1
+        if start == -1 or end <= start:
+            return None
+        try:
+            return json.loads(content[start:end])
+        except json.JSONDecodeError:
+            logger.warning("Failed to parse AI response as JSON")
+            return None
+
+    def _parse_recommendations(
+        self, content: str, symbols: List[str]
+    ) -> Dict[str, Dict]:
+        """Map the entries of a batched AI response back to their symbols.
+
+        Entries are matched by their ``symbol`` field, ignoring case, or by
+        position when none has one and their count matches the request.
+        Entries without an ``action`` and symbols without an entry are
+        left out, for the caller to retry.
+        """
+        objects = _json_objects(content)
+        if not any("symbol" in item for item in objects):
+            if len(objects) != len(symbols):
+                objects = []
+            objects = [
+                {**item, "symbol": symbol} for item, symbol in zip(objects, symbols)
+            ]
+
+        requested = {symbol.upper(): symbol for symbol in symbols}
+        parsed: Dict[str, Dict] = {}
+        for item in objects:
+            symbol = requested.get(str(item.get("symbol", "")).strip().upper())
+            if symbol and symbol not in parsed and item.get("action"):
+                parsed[symbol] = {
+                    key: value for key, value in item.items() if key != "symbol"
+                }
+        if len(parsed) < len(symbols):
+            logger.warning(
+                "Incomplete batched AI response",
+                requested=len(symbols),
+                parsed=len(parsed),
+            )
+        return parsed
+
+    async def close(self) -> None:
+        """Close the HTTP connection pools of the configured clients."""
+        for client in (self.openai_client, self.anthropic_client):
+            if client is not None:
+                await client.close()
+
+
+_client: Optional[AIClient] = None
+
+
+def get_ai_client() -> AIClient:
+    """Dependency for getting the shared AI client."""
+    global _client
+    if _client is None:
+        _client = AIClient()
+    return _client
+
+
+async def close_ai_client() -> None:
+    """Close the shared AI client, if one was created."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
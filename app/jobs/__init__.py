@@ -0,0 +1 @@
+"""Scheduled background jobs, runnable with ``python -m app.jobs.<name>``."""
@@ -0,0 +1,76 @@
+"""Generate recommendations for every stock through a provider batch API.
+
+Run nightly, e.g. from cron::
+
+    python -m app.jobs.generate_recommendations
+    python -m app.jobs.generate_recommendations --provider anthropic --symbols AAPL,MSFT
+
+Batches can take hours; if the job is interrupted, collect the submitted
+batch with ``--resume BATCH_ID`` instead of paying for it again.
+"""
+
+import argparse
+import asyncio
+from typing import Dict, List, Optional
+
+from app.core.database import AsyncSessionLocal, engine
+from app.integrations.ai_batch import get_batch_provider
+from app.integrations.ai_client import close_ai_client, get_ai_client
+from app.services.batch_recommendation_service import BatchRecommendationService
+from app.services.market_data_service import shutdown_executor
+
+
+async def generate_recommendations(
+    provider: str = "openai",
+    symbols: Optional[List[str]] = None,
+    resume: Optional[str] = None,
+) -> Dict:
+    """Generate recommendations in one batch, or collect a submitted one."""
+    batch_provider = get_batch_provider(provider, get_ai_client())
+    async with AsyncSessionLocal() as db:
+        service = BatchRecommendationService(db, batch_provider)
+        if resume:
+            return await service.resume(resume)
+        return await service.run(symbols)
+
+
+async def run(
+    provider: str = "openai",
+    symbols: Optional[List[str]] = None,
+    resume: Optional[str] = None,
+) -> None:
+    try:
+        await generate_recommendations(provider, symbols, resume)
+    finally:
+        shutdown_executor()
+        await close_ai_client()
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--provider", choices=("openai", "anthropic", "fake"), default="openai"
+    )
+    parser.add_argument(
+        "--symbols",
+        default=None,
+        help="comma-separated symbols (default: every stock)",
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="BATCH_ID",
+        default=None,
+        help="collect a batch submitted by an earlier run",
+    )
+    args = parser.parse_args()
+    symbols = (
+        [s.strip() for s in args.symbols.split(",") if s.strip()]
+        if args.symbols
+        else None
+    )
+    asyncio.run(run(args.provider, symbols, args.resume))
+
+
+if __name__ == "__main__":
+    main()
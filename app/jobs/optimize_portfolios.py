@@ -0,0 +1,62 @@
+"""Propose rebalancing trades for every active portfolio.
+
+Run after the daily bars are in, e.g. from cron::
+
+    python -m app.jobs.optimize_portfolios
+    python -m app.jobs.optimize_portfolios --method risk_parity --max-weight 0.2
+"""
+
+import argparse
+import asyncio
+from typing import Dict, Optional
+
+from app.core.database import AsyncSessionLocal, engine
+from app.services.market_data_service import shutdown_executor
+from app.services.optimizer import METHODS, OptimizerService
+
+
+async def optimize_portfolios(
+    method: str = "min_variance",
+    max_weight: Optional[float] = None,
+    turnover: Optional[float] = None,
+) -> Dict:
+    """Propose target weights for every active portfolio."""
+    async with AsyncSessionLocal() as db:
+        return await OptimizerService(db).propose_all(
+            method, max_weight=max_weight, turnover=turnover
+        )
+
+
+async def run(
+    method: str = "min_variance",
+    max_weight: Optional[float] = None,
+    turnover: Optional[float] = None,
+) -> None:
+    try:
+        await optimize_portfolios(method, max_weight, turnover)
+    finally:
+        shutdown_executor()
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--method", choices=METHODS, default="min_variance")
+    parser.add_argument(
+        "--max-weight",
+        type=float,
+        default=None,
+        help="largest target weight of one position (default: OPTIMIZER_MAX_WEIGHT)",
+    )
+    parser.add_argument(
+        "--turnover",
+        type=float,
+        default=None,
+        help="cap on the sum of absolute weight changes (default: none)",
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args.method, args.max_weight, args.turnover))
+
+
+if __name__ == "__main__":
+    main()
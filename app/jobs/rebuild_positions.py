@@ -0,0 +1,45 @@
+"""Rebuild positions from the full order history.
+
+Use after bulk corrections to past orders, or to verify the incrementally
+maintained positions::
+
+    python -m app.jobs.rebuild_positions
+    python -m app.jobs.rebuild_positions --portfolio-id <uuid>
+"""
+
+import argparse
+import asyncio
+from typing import Optional
+from uuid import UUID
+
+from app.core.database import AsyncSessionLocal, engine
+from app.services.position_ledger import PositionLedger
+
+
+async def rebuild_positions(portfolio_id: Optional[UUID] = None) -> int:
+    """Rebuild every position, or those of one portfolio."""
+    async with AsyncSessionLocal() as db:
+        return await PositionLedger(db).rebuild(portfolio_id=portfolio_id, commit=True)
+
+
+async def run(portfolio_id: Optional[UUID] = None) -> None:
+    try:
+        await rebuild_positions(portfolio_id)
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--portfolio-id",
+        type=UUID,
+        default=None,
+        help="only rebuild the positions of this portfolio",
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args.portfolio_id))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Mark every position of the active portfolios to market.
+
+Run once, e.g. from cron, or keep running on a fixed interval::
+
+    python -m app.jobs.revalue_positions
+    python -m app.jobs.revalue_positions --every 300
+"""
+
+import argparse
+import asyncio
+from typing import Dict, Optional
+
+from app.core.database import AsyncSessionLocal, engine
+from app.core.logging import logger
+from app.services.market_data_service import shutdown_executor
+from app.services.revaluation_service import RevaluationService
+
+
+async def revalue_positions() -> Dict:
+    """Run one revaluation pass."""
+    async with AsyncSessionLocal() as db:
+        return await RevaluationService(db).revalue()
+
+
+async def run(every: Optional[float] = None) -> None:
+    """Revalue once, or every ``every`` seconds until cancelled."""
+    try:
+        while True:
+            try:
+                await revalue_positions()
+            except Exception as e:
+                if not every:
+                    raise
+                logger.error("Position revaluation failed", error=str(e))
+            if not every:
+                break
+            await asyncio.sleep(every)
+    finally:
+        shutdown_executor()
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--every",
+        type=float,
+        default=None,
+        help="repeat every N seconds instead of running once",
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args.every))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Record the end-of-day value of every active portfolio.
+
+Run once a day after the market close, e.g. from cron::
+
+    python -m app.jobs.snapshot_portfolios
+    python -m app.jobs.snapshot_portfolios --date 2025-01-31
+
+Past dates are valued from the orders placed up to that day and its
+closing prices, which backfills days the job missed.
+"""
+
+import argparse
+import asyncio
+from datetime import date
+from typing import Dict, Optional
+
+from app.core.database import AsyncSessionLocal, engine
+from app.services.market_data_service import shutdown_executor
+from app.services.snapshot_service import SnapshotService
+
+
+async def snapshot_portfolios(as_of: Optional[date] = None) -> Dict:
+    """Take one snapshot of every active portfolio."""
+    async with AsyncSessionLocal() as db:
+        return await SnapshotService(db).take_snapshots(as_of)
+
+
+async def run(as_of: Optional[date] = None) -> None:
+    try:
+        await snapshot_portfolios(as_of)
+    finally:
+        shutdown_executor()
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--date",
+        type=date.fromisoformat,
+        default=None,
+        help="snapshot date (default: today, UTC)",
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args.date))
+
+
+if __name__ == "__main__":
+    main()
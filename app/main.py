@@ -1,11 +1,27 @@
 """FastAPI application entry point."""
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-from app.core.config import settings
 from app.api.v1 import api_router
+from app.core.config import settings
+from app.core.database import engine
+from app.integrations.ai_client import close_ai_client
+from app.services.backtest_service import shutdown_process_pool
+from app.services.market_data_service import shutdown_executor
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown hooks."""
+    yield
+    shutdown_executor()
+    shutdown_process_pool()
+    await close_ai_client()
+    await engine.dispose()
 
 
 app = FastAPI(
@@ -14,6 +30,7 @@ app = FastAPI(
     version="0.1.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # CORS Configuration
@@ -1,15 +1,18 @@
 """Database models."""
 
-from app.models.user import User
+from app.models.order import Order
 from app.models.portfolio import Portfolio
+from app.models.portfolio_snapshot import PortfolioSnapshot
 from app.models.position import Position
-from app.models.order import Order
-from app.models.stock import Stock
 from app.models.recommendation import Recommendation
+from app.models.stock import Stock
+from app.models.user import User
+
 
 __all__ = [
     "User",
     "Portfolio",
+    "PortfolioSnapshot",
     "Position",
     "Order",
     "Stock",
@@ -2,7 +2,8 @@
 
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Numeric, Text, ForeignKey
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Numeric, String, Text, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -13,9 +14,31 @@ class Order(Base):
     """Order model."""
 
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_portfolio_id_symbol", "portfolio_id", "symbol"),
+        Index("ix_orders_portfolio_id_order_date", "portfolio_id", "order_date"),
+        # Idempotency key of imported orders
+        Index(
+            "uq_orders_portfolio_id_external_id",
+            "portfolio_id",
+            "external_id",
+            unique=True,
+            postgresql_where=text("external_id IS NOT NULL"),
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    portfolio_id = Column(UUID(as_uuid=True), ForeignKey("portfolios.id", ondelete="CASCADE"), nullable=False)
+    portfolio_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("portfolios.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    position_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("positions.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True,
+    )
     symbol = Column(String(20), nullable=False, index=True)
     side = Column(String(10), nullable=False)  # 'buy' or 'sell'
     quantity = Column(Numeric(15, 4), nullable=False)
@@ -25,7 +48,9 @@ class Order(Base):
     order_date = Column(DateTime, nullable=False)
     notes = Column(Text, nullable=True)
     notion_page_id = Column(String(255), nullable=True)
+    external_id = Column(String(255), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
     portfolio = relationship("Portfolio", back_populates="orders")
+    position = relationship("Position", back_populates="orders")
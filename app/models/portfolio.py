@@ -2,7 +2,8 @@
 
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Boolean, Numeric, ForeignKey
+
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Numeric, String
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -13,9 +14,15 @@ class Portfolio(Base):
     """Portfolio model."""
 
     __tablename__ = "portfolios"
+    __table_args__ = (
+        # A user's portfolios, newest first (keyset pagination)
+        Index("ix_portfolios_user_id_created_at", "user_id", "created_at", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
     name = Column(String(255), nullable=False)
     type = Column(String(50), nullable=False)  # 'real' or 'virtual'
     currency = Column(String(3), default="USD")
@@ -28,6 +35,13 @@ class Portfolio(Base):
 
     # Relationships
     user = relationship("User", back_populates="portfolios")
-    positions = relationship("Position", back_populates="portfolio", cascade="all, delete-orphan")
-    orders = relationship("Order", back_populates="portfolio", cascade="all, delete-orphan")
+    positions = relationship(
+        "Position", back_populates="portfolio", cascade="all, delete-orphan"
+    )
+    orders = relationship(
+        "Order", back_populates="portfolio", cascade="all, delete-orphan"
+    )
     recommendations = relationship("Recommendation", back_populates="portfolio")
+    snapshots = relationship(
+        "PortfolioSnapshot", back_populates="portfolio", cascade="all, delete-orphan"
+    )
@@ -0,0 +1,33 @@
+"""Portfolio snapshot model."""
+
+from datetime import datetime
+
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Numeric
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+
+from app.core.database import Base
+
+
+class PortfolioSnapshot(Base):
+    """End-of-day value of a portfolio."""
+
+    __tablename__ = "portfolio_snapshots"
+
+    # The primary key orders a portfolio's snapshots by date for range scans
+    portfolio_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("portfolios.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    date = Column(Date, primary_key=True)
+    total_value = Column(Numeric(15, 2), nullable=False)
+    cash = Column(Numeric(15, 2), nullable=False)
+    invested = Column(Numeric(15, 2), nullable=False)
+    market_value = Column(Numeric(15, 2), nullable=False)
+    total_return = Column(Numeric(15, 2), nullable=False)
+    total_return_percent = Column(Numeric(10, 4), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # Relationships
+    portfolio = relationship("Portfolio", back_populates="snapshots")
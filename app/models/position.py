@@ -2,7 +2,8 @@
 
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Numeric, ForeignKey
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Numeric, String
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -13,9 +14,19 @@ class Position(Base):
     """Position model."""
 
     __tablename__ = "positions"
+    __table_args__ = (
+        # One position per symbol and portfolio; also serves portfolio lookups
+        Index(
+            "uq_positions_portfolio_id_symbol", "portfolio_id", "symbol", unique=True
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    portfolio_id = Column(UUID(as_uuid=True), ForeignKey("portfolios.id", ondelete="CASCADE"), nullable=False)
+    portfolio_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("portfolios.id", ondelete="CASCADE"),
+        nullable=False,
+    )
     symbol = Column(String(20), nullable=False, index=True)
     quantity = Column(Numeric(15, 4), nullable=False)
     average_cost = Column(Numeric(15, 4), nullable=True)
@@ -23,8 +34,10 @@ class Position(Base):
     market_value = Column(Numeric(15, 2), nullable=True)
     unrealized_pnl = Column(Numeric(15, 2), nullable=True)
     unrealized_pnl_percent = Column(Numeric(10, 4), nullable=True)
+    realized_pnl = Column(Numeric(15, 2), default=0, nullable=False)
     last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
     portfolio = relationship("Portfolio", back_populates="positions")
+    orders = relationship("Order", back_populates="position")
@@ -0,0 +1,36 @@
+"""Analysis schemas."""
+
+from typing import Annotated, List, Literal
+
+from pydantic import BaseModel, Field
+
+
+Indicator = Literal["sma", "ema", "rsi", "macd", "bollinger", "atr", "vwap"]
+
+Window = Annotated[int, Field(ge=1)]
+
+
+class IndicatorSettings(BaseModel):
+    """Schema for selecting and parameterizing technical indicators."""
+
+    indicators: List[Indicator] = Field(
+        default=["sma", "ema", "rsi", "macd", "bollinger", "atr", "vwap"]
+    )
+    sma_windows: List[Window] = Field(default=[50, 200])
+    ema_windows: List[Window] = Field(default=[12, 26])
+    rsi_window: int = Field(default=14, ge=2)
+    macd_fast: int = Field(default=12, ge=1)
+    macd_slow: int = Field(default=26, ge=2)
+    macd_signal: int = Field(default=9, ge=1)
+    bollinger_window: int = Field(default=20, ge=2)
+    bollinger_std: float = Field(default=2.0, gt=0)
+    atr_window: int = Field(default=14, ge=1)
+    vwap_window: int = Field(default=14, ge=1)
+
+
+class TechnicalAnalysisRequest(IndicatorSettings):
+    """Schema for a multi-symbol technical analysis request."""
+
+    symbols: List[str] = Field(..., min_length=1)
+    period: str = "2y"
+    interval: str = "1d"
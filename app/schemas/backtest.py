@@ -0,0 +1,37 @@
+"""Backtest schemas."""
+
+from typing import Dict, List, Literal
+
+from pydantic import BaseModel, Field
+
+
+Strategy = Literal["buy_and_hold", "sma_crossover", "rsi"]
+
+SortMetric = Literal["sharpe", "total_return", "cagr", "max_drawdown"]
+
+
+class BacktestSettings(BaseModel):
+    """Schema for a strategy, its parameter grid and trading costs."""
+
+    strategy: Strategy = "sma_crossover"
+    period: str = "5y"
+    interval: str = "1d"
+    # Every combination of the listed values is backtested
+    params: Dict[str, List[float]] = Field(default_factory=dict)
+    initial_capital: float = Field(default=10000.0, gt=0)
+    fee_rate: float = Field(default=0.0, ge=0, lt=1)
+    fee_per_trade: float = Field(default=0.0, ge=0)
+    sort_by: SortMetric = "sharpe"
+    limit: int = Field(default=50, ge=1, le=1000)
+
+
+class BacktestRequest(BacktestSettings):
+    """Schema for running a strategy, or a grid of its parameters, on one symbol."""
+
+    symbol: str
+
+
+class BacktestSweepRequest(BacktestSettings):
+    """Schema for sweeping a parameter grid over many symbols in parallel."""
+
+    symbols: List[str] = Field(..., min_length=1)
@@ -3,6 +3,7 @@
 from datetime import datetime
 from typing import Optional
 from uuid import UUID
+
 from pydantic import BaseModel, Field
 
 
@@ -16,6 +17,8 @@ class OrderBase(BaseModel):
     fees: float = Field(default=0, ge=0)
     order_date: datetime
     notes: Optional[str] = None
+    # Broker order or fill ID; an order is recorded once per portfolio and key
+    external_id: Optional[str] = Field(None, max_length=255)
 
 
 class OrderCreate(OrderBase):
@@ -29,6 +32,7 @@ class Order(OrderBase):
 
     id: UUID
     portfolio_id: UUID
+    position_id: Optional[UUID] = None
     total_value: Optional[float] = None
     notion_page_id: Optional[str] = None
     created_at: datetime
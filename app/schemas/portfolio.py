@@ -1,8 +1,9 @@
 """Portfolio schemas."""
 
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 from uuid import UUID
+
 from pydantic import BaseModel, Field
 
 
@@ -43,3 +44,18 @@ class Portfolio(PortfolioBase):
 
     class Config:
         from_attributes = True
+
+
+class PortfolioSnapshot(BaseModel):
+    """Schema for one point of a portfolio's equity curve."""
+
+    date: date
+    total_value: float
+    cash: float
+    invested: float
+    market_value: float
+    total_return: float
+    total_return_percent: Optional[float] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,48 @@
+"""Recommendation schemas."""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+
+class RecommendationDraft(BaseModel):
+    """Schema for a recommendation parsed from an AI response."""
+
+    action: str = Field(..., pattern="^(buy|sell|hold)$")
+    confidence_score: Optional[float] = Field(None, ge=0, le=1)
+    reasoning: str = Field(..., min_length=1)
+    target_price: Optional[float] = Field(None, ge=0)
+    stop_loss: Optional[float] = Field(None, ge=0)
+    time_horizon: Optional[str] = Field(
+        None, pattern="^(short-term|medium-term|long-term)$"
+    )
+
+
+class Recommendation(BaseModel):
+    """Schema for recommendation response."""
+
+    id: UUID
+    portfolio_id: Optional[UUID] = None
+    symbol: str
+    action: str
+    confidence_score: Optional[float] = None
+    reasoning: str
+    target_price: Optional[float] = None
+    stop_loss: Optional[float] = None
+    time_horizon: Optional[str] = None
+    created_at: datetime
+    expires_at: Optional[datetime] = None
+    status: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class GeneratedRecommendations(BaseModel):
+    """Schema for the result of generating a portfolio's recommendations."""
+
+    portfolio_id: UUID
+    recommendations: List[Recommendation]
+    failed: Dict[str, str]
@@ -0,0 +1,593 @@
+"""Backtesting service."""
+
+import asyncio
+import itertools
+import math
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.schemas.backtest import BacktestRequest, BacktestSweepRequest
+from app.services.market_data_service import (
+    MarketDataService,
+    get_market_data_service,
+)
+from app.services.technical_analysis_service import rsi, sma
+
+
+# Parameters of each strategy, with the values used when a request omits them
+STRATEGY_PARAMS: Dict[str, Dict[str, List[float]]] = {
+    "buy_and_hold": {},
+    "sma_crossover": {"fast": [50.0], "slow": [200.0]},
+    "rsi": {"window": [14.0], "lower": [30.0], "upper": [70.0]},
+}
+
+# Bars per year, used to annualize returns, Sharpe ratio and turnover
+PERIODS_PER_YEAR = {
+    "1m": 252 * 390,
+    "2m": 252 * 195,
+    "5m": 252 * 78,
+    "15m": 252 * 26,
+    "30m": 252 * 13,
+    "60m": 252 * 7,
+    "90m": 252 * 5,
+    "1h": 252 * 7,
+    "1d": 252,
+    "5d": 52,
+    "1wk": 52,
+    "1mo": 12,
+    "3mo": 4,
+}
+
+MAX_COMBINATIONS = 20_000
+
+# Parameter combinations simulated per vectorized block, bounding memory use
+CHUNK_SIZE = 1024
+
+METRICS = [
+    "total_return",
+    "cagr",
+    "sharpe",
+    "max_drawdown",
+    "turnover",
+    "trades",
+    "fees",
+]
+
+# Sweep jobs per worker to aim for, so uneven jobs still balance out
+JOBS_PER_WORKER = 4
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _sweep_workers() -> int:
+    return settings.BACKTEST_MAX_WORKERS or os.cpu_count() or 1
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Get the shared process pool for parameter sweeps."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=_sweep_workers(),
+            # Forking a process that runs threads and an event loop is unsafe
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    """Shut down the sweep process pool, dropping queued jobs."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def _is_window(value: float) -> bool:
+    return value >= 1 and float(value).is_integer()
+
+
+def _valid_params(strategy: str, params: Dict[str, float]) -> bool:
+    if strategy == "sma_crossover":
+        return (
+            _is_window(params["fast"])
+            and _is_window(params["slow"])
+            and params["fast"] < params["slow"]
+        )
+    if strategy == "rsi":
+        return (
+            _is_window(params["window"])
+            and params["window"] >= 2
+            and 0 <= params["lower"] < params["upper"] <= 100
+        )
+    return True
+
+
+def expand_grid(
+    strategy: str, params: Dict[str, List[float]]
+) -> List[Dict[str, float]]:
+    """Expand a parameter grid into every valid combination.
+
+    Omitted parameters take the strategy defaults; combinations that make no
+    sense (e.g. a fast average slower than the slow one) are skipped.
+    """
+    defaults = STRATEGY_PARAMS[strategy]
+    unknown = set(params) - set(defaults)
+    if unknown:
+        raise ValueError(
+            f"Unknown parameters for {strategy}: {', '.join(sorted(unknown))}"
+        )
+
+    grid = {**defaults, **params}
+    if math.prod(len(values) for values in grid.values()) > MAX_COMBINATIONS:
+        raise ValueError(f"Parameter grid exceeds {MAX_COMBINATIONS} combinations")
+
+    names = list(grid)
+    combos = [
+        dict(zip(names, map(float, values)))
+        for values in itertools.product(*(grid[name] for name in names))
+    ]
+    combos = [combo for combo in combos if _valid_params(strategy, combo)]
+    if not combos:
+        raise ValueError(f"No valid parameter combinations for {strategy}")
+    return combos
+
+
+def _hold(raw: np.ndarray) -> np.ndarray:
+    """Forward-fill entry/exit signals along the bars, starting flat."""
+    rows = np.where(np.isnan(raw), 0, np.arange(len(raw))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    held = np.take_along_axis(raw, rows, axis=0)
+    return np.nan_to_num(held, nan=0.0)
+
+
+def _by_window(
+    close: np.ndarray, windows: List[float], indicator, cache: Dict
+) -> Dict[float, np.ndarray]:
+    """Compute an indicator once per distinct window, reusing ``cache``."""
+    name = indicator.__name__
+    missing = sorted({w for w in windows if (name, w) not in cache})
+    if missing:
+        if indicator is rsi:
+            # Wilder smoothing takes per-column windows, so run them in one pass
+            series = rsi(
+                np.repeat(close[:, None], len(missing), axis=1), np.array(missing)
+            )
+        else:
+            series = np.column_stack(
+                [indicator(close[:, None], int(w))[:, 0] for w in missing]
+            )
+        for i, window in enumerate(missing):
+            cache[(name, window)] = series[:, i]
+    return {w: cache[(name, w)] for w in windows}
+
+
+def strategy_signals(
+    strategy: str,
+    close: np.ndarray,
+    combos: List[Dict[str, float]],
+    cache: Optional[Dict] = None,
+) -> np.ndarray:
+    """Target exposure (0 = flat, 1 = long) at each bar close, per combination.
+
+    Returns a (bars, combinations) array. Indicator series are computed once
+    per distinct window; pass the same ``cache`` to share them across calls.
+    """
+    cache = {} if cache is None else cache
+    if strategy == "buy_and_hold":
+        return np.ones((len(close), len(combos)))
+
+    if strategy == "sma_crossover":
+        averages = _by_window(
+            close, [c["fast"] for c in combos] + [c["slow"] for c in combos], sma, cache
+        )
+        fast = np.column_stack([averages[c["fast"]] for c in combos])
+        slow = np.column_stack([averages[c["slow"]] for c in combos])
+        # Flat during warm-up, where the averages are NaN
+        return (fast > slow).astype(float)
+
+    if strategy == "rsi":
+        values = _by_window(close, [c["window"] for c in combos], rsi, cache)
+        strength = np.column_stack([values[c["window"]] for c in combos])
+        lower = np.array([c["lower"] for c in combos])
+        upper = np.array([c["upper"] for c in combos])
+        # Enter when oversold, exit when overbought, otherwise keep the position
+        raw = np.where(strength < lower, 1.0, np.where(strength > upper, 0.0, np.nan))
+        return _hold(raw)
+
+    raise ValueError(f"Unknown strategy: {strategy}")
+
+
+def simulate(
+    close: np.ndarray,
+    signals: np.ndarray,
+    initial_capital: float,
+    fee_rate: float = 0.0,
+    fee_per_trade: float = 0.0,
+) -> Dict[str, np.ndarray]:
+    """Simulate trading the signals on a close price series.
+
+    Positions change at the close of the bar that produced the signal and
+    earn the following bars' returns. Each trade pays ``fee_rate`` of the
+    traded value plus a flat ``fee_per_trade``, like ``Order.fees``.
+
+    Equity follows ``E[t] = a[t] * E[t-1] - b[t]``, which is solved in closed
+    form with cumulative products and sums instead of a per-bar loop.
+    """
+    bars, width = signals.shape
+    returns = np.zeros(bars)
+    returns[1:] = close[1:] / close[:-1] - 1
+    returns = returns[:, None]
+
+    position = np.zeros((bars, width))
+    position[1:] = signals[:-1]
+    turnover = np.zeros((bars, width))
+    turnover[1:] = np.abs(np.diff(position, axis=0))
+    flat_fees = np.where(turnover > 0, fee_per_trade, 0.0)
+
+    growth = 1 + position * returns
+    a = (1 - fee_rate * turnover) * growth
+    b = flat_fees * growth
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        compounded = np.cumprod(a, axis=0)
+        equity = compounded * (initial_capital - np.cumsum(b / compounded, axis=0))
+
+    previous = np.vstack([np.full((1, width), float(initial_capital)), equity[:-1]])
+    return {
+        "equity": equity,
+        "turnover": turnover,
+        "fees": fee_rate * turnover * previous + flat_fees,
+    }
+
+
+def performance(
+    equity: np.ndarray,
+    turnover: np.ndarray,
+    fees: np.ndarray,
+    initial_capital: float,
+    periods_per_year: int,
+) -> Dict[str, np.ndarray]:
+    """Summary metrics for every column of a simulation."""
+    previous = np.vstack([np.full((1, equity.shape[1]), initial_capital), equity[:-1]])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = (equity / previous - 1)[1:]
+        years = len(returns) / periods_per_year
+        growth = equity[-1] / initial_capital
+        cagr = (
+            np.where(growth > 0, np.abs(growth) ** (1 / years) - 1, -1.0)
+            if years
+            else np.full(equity.shape[1], np.nan)
+        )
+        std = (
+            returns.std(axis=0, ddof=1)
+            if len(returns) > 1
+            else np.zeros(equity.shape[1])
+        )
+        sharpe = np.where(
+            std > 0, returns.mean(axis=0) / std * np.sqrt(periods_per_year), np.nan
+        )
+        drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1
+
+    return {
+        "total_return": growth - 1,
+        "cagr": cagr,
+        "sharpe": sharpe,
+        "max_drawdown": drawdown.min(axis=0),
+        "turnover": turnover.sum(axis=0) / years if years else turnover.sum(axis=0),
+        "trades": (turnover > 0).sum(axis=0),
+        "fees": fees.sum(axis=0),
+    }
+
+
+def run_backtest(
+    close: np.ndarray,
+    strategy: str,
+    combos: List[Dict[str, float]],
+    initial_capital: float,
+    fee_rate: float = 0.0,
+    fee_per_trade: float = 0.0,
+    periods_per_year: int = 252,
+) -> Dict[str, np.ndarray]:
+    """Backtest every parameter combination, returning one metric array each."""
+    blocks = []
+    cache: Dict = {}
+    for start in range(0, len(combos), CHUNK_SIZE):
+        chunk = combos[start : start + CHUNK_SIZE]
+        result = simulate(
+            close,
+            strategy_signals(strategy, close, chunk, cache),
+            initial_capital,
+            fee_rate,
+            fee_per_trade,
+        )
+        blocks.append(
+            performance(
+                result["equity"],
+                result["turnover"],
+                result["fees"],
+                initial_capital,
+                periods_per_year,
+            )
+        )
+    return {name: np.concatenate([b[name] for b in blocks]) for name in METRICS}
+
+
+def _none_if_nan(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+def rank_results(
+    metrics: Dict[str, np.ndarray],
+    combos: List[Dict[str, float]],
+    sort_by: str,
+    limit: int,
+) -> List[Dict]:
+    """Get the ``limit`` best combinations by ``sort_by``, best first."""
+    key = np.nan_to_num(metrics[sort_by], nan=-np.inf)
+    order = np.argsort(-key, kind="stable")
+    return [
+        {
+            "params": combos[i],
+            **{name: _none_if_nan(metrics[name][i]) for name in METRICS},
+            "trades": int(metrics["trades"][i]),
+        }
+        for i in order[:limit]
+    ]
+
+
+@dataclass(frozen=True)
+class SweepJob:
+    """A block of parameter combinations to backtest on one symbol.
+
+    Jobs do not carry bars: workers memory-map the closes of every symbol
+    from ``path`` and slice ``start:stop``, so prices are shared through the
+    page cache instead of being pickled into each job.
+    """
+
+    path: str
+    symbol: str
+    start: int
+    stop: int
+    strategy: str
+    combos: List[Dict[str, float]]
+    costs: Tuple[float, float, float]
+    periods_per_year: int
+    sort_by: str
+    limit: int
+
+
+def run_sweep_job(job: SweepJob) -> Dict:
+    """Backtest one sweep job; runs in a worker process."""
+    close = np.load(job.path, mmap_mode="r")[job.start : job.stop]
+    metrics = run_backtest(
+        close,
+        job.strategy,
+        job.combos,
+        *job.costs,
+        periods_per_year=job.periods_per_year,
+    )
+    return {
+        "symbol": job.symbol,
+        "runs": len(job.combos),
+        "results": rank_results(metrics, job.combos, job.sort_by, job.limit),
+    }
+
+
+def _sort_key(result: Dict, sort_by: str) -> float:
+    value = result[sort_by]
+    return -np.inf if value is None else value
+
+
+class BacktestService:
+    """Service for backtesting trading strategies on stored bar data."""
+
+    def __init__(self, market_data: Optional[MarketDataService] = None):
+        self.market_data = market_data or get_market_data_service()
+
+    async def run(
+        self,
+        request: BacktestRequest,
+        combos: Optional[List[Dict[str, float]]] = None,
+    ) -> Dict:
+        """Backtest a strategy over every combination of its parameter grid."""
+        if combos is None:
+            combos = expand_grid(request.strategy, request.params)
+        bars = await self.market_data.get_bars(
+            request.symbol, request.period, request.interval
+        )
+        return await asyncio.to_thread(self.evaluate, bars, request, combos)
+
+    def evaluate(
+        self,
+        bars: pd.DataFrame,
+        request: BacktestRequest,
+        combos: List[Dict[str, float]],
+    ) -> Dict:
+        """Rank parameter combinations and build the best one's equity curve."""
+        closes = bars["Close"].dropna()
+        if len(closes) < 2:
+            raise ValueError(f"Not enough historical data for {request.symbol}")
+        close = closes.to_numpy(dtype="float64")
+        periods_per_year = PERIODS_PER_YEAR.get(request.interval, 252)
+        costs = (request.initial_capital, request.fee_rate, request.fee_per_trade)
+
+        metrics = run_backtest(
+            close, request.strategy, combos, *costs, periods_per_year=periods_per_year
+        )
+        results = rank_results(metrics, combos, request.sort_by, request.limit)
+
+        best = results[0]["params"]
+        curve = simulate(
+            close, strategy_signals(request.strategy, close, [best]), *costs
+        )
+        equity = curve["equity"][:, 0]
+        drawdown = equity / np.maximum.accumulate(equity) - 1
+
+        return {
+            "symbol": request.symbol.upper(),
+            "strategy": request.strategy,
+            "period": request.period,
+            "interval": request.interval,
+            "total_runs": len(combos),
+            "results": results,
+            "best": {
+                "params": best,
+                "timestamps": [ts.isoformat() for ts in closes.index],
+                "equity": equity.tolist(),
+                "drawdown": drawdown.tolist(),
+            },
+        }
+
+    async def sweep(
+        self,
+        request: BacktestSweepRequest,
+        combos: Optional[List[Dict[str, float]]] = None,
+        executor: Optional[Executor] = None,
+    ) -> AsyncIterator[Dict]:
+        """Backtest a parameter grid over many symbols on the process pool.
+
+        Each symbol's grid is split into jobs that run in parallel. Messages
+        are yielded as soon as they are available: one per symbol that could
+        not be loaded, one per finished job with its best combinations, and
+        finally the best combination found for each symbol.
+        """
+        if combos is None:
+            combos = expand_grid(request.strategy, request.params)
+        executor = executor or get_process_pool()
+        symbols = list(
+            dict.fromkeys(s.strip().upper() for s in request.symbols if s.strip())
+        )
+
+        loaded = await asyncio.gather(
+            *(
+                self.market_data.get_bars(s, request.period, request.interval)
+                for s in symbols
+            ),
+            return_exceptions=True,
+        )
+        closes: Dict[str, np.ndarray] = {}
+        for symbol, result in zip(symbols, loaded):
+            if isinstance(result, BaseException):
+                logger.warning(
+                    "Failed to load bars for backtest", symbol=symbol, error=str(result)
+                )
+                yield {"symbol": symbol, "error": str(result) or type(result).__name__}
+                continue
+            close = result["Close"].dropna().to_numpy(dtype="float64")
+            if len(close) < 2:
+                yield {
+                    "symbol": symbol,
+                    "error": f"Not enough historical data for {symbol}",
+                }
+                continue
+            closes[symbol] = close
+
+        best: Dict[str, Dict] = {}
+        if closes:
+            async for message in self._run_jobs(request, combos, closes, executor):
+                if message.get("results"):
+                    top = message["results"][0]
+                    current = best.get(message["symbol"])
+                    if current is None or _sort_key(top, request.sort_by) > _sort_key(
+                        current, request.sort_by
+                    ):
+                        best[message["symbol"]] = top
+                yield message
+
+        yield {
+            "done": True,
+            "symbols": len(closes),
+            "total_runs": len(closes) * len(combos),
+            "best": best,
+        }
+
+    async def _run_jobs(
+        self,
+        request: BacktestSweepRequest,
+        combos: List[Dict[str, float]],
+        closes: Dict[str, np.ndarray],
+        executor: Executor,
+    ) -> AsyncIterator[Dict]:
+        """Run sweep jobs on ``executor``, yielding results as they finish."""
+        total = len(combos) * len(closes)
+        job_size = min(
+            CHUNK_SIZE, max(1, math.ceil(total / (_sweep_workers() * JOBS_PER_WORKER)))
+        )
+        loop = asyncio.get_running_loop()
+
+        async def attempt(job: SweepJob) -> Dict:
+            try:
+                return await loop.run_in_executor(executor, run_sweep_job, job)
+            except BrokenProcessPool as e:
+                # A crashed worker breaks the whole pool; replace it for later sweeps
+                if executor is _process_pool:
+                    shutdown_process_pool()
+                logger.error(
+                    "Backtest sweep job failed", symbol=job.symbol, error=str(e)
+                )
+                return {"symbol": job.symbol, "error": str(e)}
+            except Exception as e:
+                logger.error(
+                    "Backtest sweep job failed", symbol=job.symbol, error=str(e)
+                )
+                return {"symbol": job.symbol, "error": str(e) or type(e).__name__}
+
+        with tempfile.TemporaryDirectory(prefix="cresus-sweep-") as tmp:
+            path = os.path.join(tmp, "closes.npy")
+            np.save(path, np.concatenate(list(closes.values())))
+
+            jobs = []
+            offset = 0
+            for symbol, close in closes.items():
+                for start in range(0, len(combos), job_size):
+                    jobs.append(
+                        SweepJob(
+                            path=path,
+                            symbol=symbol,
+                            start=offset,
+                            stop=offset + len(close),
+                            strategy=request.strategy,
+                            combos=combos[start : start + job_size],
+                            costs=(
+                                request.initial_capital,
+                                request.fee_rate,
+                                request.fee_per_trade,
+                            ),
+                            periods_per_year=PERIODS_PER_YEAR.get(
+                                request.interval, 252
+                            ),
+                            sort_by=request.sort_by,
+                            limit=request.limit,
+                        )
+                    )
+                offset += len(close)
+
+            tasks = [asyncio.ensure_future(attempt(job)) for job in jobs]
+            try:
+                for completed, task in enumerate(asyncio.as_completed(tasks), 1):
+                    yield {**await task, "completed": completed, "total": len(tasks)}
+            finally:
+                # Drop queued jobs if the consumer goes away early
+                for task in tasks:
+                    task.cancel()
+
+
+_service: Optional[BacktestService] = None
+
+
+def get_backtest_service() -> BacktestService:
+    """Dependency for getting the shared backtest service."""
+    global _service
+    if _service is None:
+        _service = BacktestService()
+    return _service
@@ -0,0 +1,111 @@
+"""Local persistent OHLCV bar store."""
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from app.core.config import settings
+
+
+BAR_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+# Parquet schema metadata keys
+COVERED_FROM_KEY = b"cresus.covered_from"
+SYNCED_AT_KEY = b"cresus.synced_at"
+
+# ``covered_from`` value for a store holding the full provider history
+FULL_HISTORY = "max"
+
+
+def merge_bars(stored: Optional[pd.DataFrame], fetched: pd.DataFrame) -> pd.DataFrame:
+    """Merge newly fetched bars into stored bars.
+
+    Bars with the same timestamp are de-duplicated, keeping the fetched bar
+    since the provider revises the latest (still forming) bar.
+    """
+    fetched = fetched[BAR_COLUMNS]
+    if stored is None or stored.empty:
+        merged = fetched
+    else:
+        if stored.index.tz is not None and fetched.index.tz is not None:
+            fetched = fetched.tz_convert(stored.index.tz)
+        merged = pd.concat([stored, fetched])
+    merged = merged[~merged.index.duplicated(keep="last")]
+    return merged.sort_index()
+
+
+class BarStore:
+    """Per-symbol, per-interval Parquet files of OHLCV bars.
+
+    Each file records which part of the provider history it covers
+    (``covered_from``) and when its tail was last refreshed (``synced_at``)
+    so callers can fetch only the missing range.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or settings.MARKET_DATA_STORE_PATH)
+        self._locks: Dict[Path, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _path(self, symbol: str, interval: str) -> Path:
+        return self.root / interval / f"{symbol.upper()}.parquet"
+
+    def lock(self, symbol: str, interval: str) -> threading.Lock:
+        """Get the lock serializing read-merge-write cycles for one file."""
+        path = self._path(symbol, interval)
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def read(self, symbol: str, interval: str) -> Tuple[Optional[pd.DataFrame], Dict]:
+        """Read stored bars and their coverage metadata.
+
+        Returns ``(None, {})`` if nothing is stored for the symbol yet.
+        """
+        import pyarrow.parquet as pq
+
+        path = self._path(symbol, interval)
+        if not path.exists():
+            return None, {}
+
+        table = pq.read_table(path)
+        raw = table.schema.metadata or {}
+        meta = {
+            "covered_from": raw.get(COVERED_FROM_KEY, b"").decode() or None,
+            "synced_at": (
+                pd.Timestamp(raw[SYNCED_AT_KEY].decode())
+                if SYNCED_AT_KEY in raw
+                else None
+            ),
+        }
+        return table.to_pandas(), meta
+
+    def write(
+        self,
+        symbol: str,
+        interval: str,
+        bars: pd.DataFrame,
+        covered_from: Optional[str],
+        synced_at: pd.Timestamp,
+    ) -> None:
+        """Replace the stored bars for a symbol, writing atomically."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = self._path(symbol, interval)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        table = pa.Table.from_pandas(bars[BAR_COLUMNS])
+        table = table.replace_schema_metadata(
+            {
+                **(table.schema.metadata or {}),
+                COVERED_FROM_KEY: (covered_from or "").encode(),
+                SYNCED_AT_KEY: synced_at.isoformat().encode(),
+            }
+        )
+
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
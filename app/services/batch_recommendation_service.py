@@ -0,0 +1,263 @@
+"""Offline recommendation generation through provider batch APIs."""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.integrations.ai_batch import COMPLETED, FAILED, BatchProvider, BatchRequest
+from app.integrations.ai_client import MAX_TOKENS, prompt_key
+from app.models.recommendation import Recommendation
+from app.models.stock import Stock
+from app.services.recommendation_service import (
+    RecommendationService,
+    recommendation_draft,
+)
+
+
+# Symbols whose market data is loaded per round
+ANALYSIS_BATCH_SIZE = 500
+
+
+def custom_id(symbol: str) -> str:
+    """Get the batch request ID of a symbol.
+
+    Batch APIs restrict IDs to a few characters, so the symbol is hex
+    encoded; results of a resumed batch decode back to their symbols.
+    """
+    return "rec_" + symbol.encode().hex()
+
+
+def symbol_of(request_id: str) -> str:
+    """Get the symbol of a batch request ID."""
+    return bytes.fromhex(request_id[len("rec_") :]).decode()
+
+
+class BatchRecommendationService:
+    """Nightly recommendations for the whole stock universe.
+
+    Prompts are the ones of ``AIClient.generate_recommendation`` and
+    answers share its cache, so symbols answered online during the day are
+    not submitted again, and the batch warms the cache for the next day.
+    Loaded recommendations have no portfolio.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        provider: BatchProvider,
+        recommendations: Optional[RecommendationService] = None,
+    ):
+        self.db = db
+        self.provider = provider
+        self.recommendations = recommendations or RecommendationService(db)
+
+    @property
+    def cache(self):
+        return self.recommendations.ai_client.cache
+
+    async def run(
+        self,
+        symbols: Optional[List[str]] = None,
+        poll_interval: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict:
+        """Generate and store recommendations for ``symbols``, all stocks by default.
+
+        Cached answers are loaded at once; the other prompts go out as one
+        batch, which is polled until it ends. Returns counts and the batch
+        ID, with which an interrupted run can be resumed.
+        """
+        if symbols is None:
+            symbols = list(
+                (
+                    await self.db.scalars(select(Stock.symbol).order_by(Stock.symbol))
+                ).all()
+            )
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        prompts, failed = await self._prompts(symbols)
+
+        keys = {
+            symbol: prompt_key(self.provider.name, self.provider.model, prompt)
+            for symbol, prompt in prompts.items()
+        }
+        responses: Dict[str, Any] = {}
+        if settings.AI_CACHE_ENABLED:
+            cached = await self.cache.get_many(list(keys.values()))
+            responses = {
+                s: cached[k] for s, k in keys.items() if cached.get(k) is not None
+            }
+        pending = [symbol for symbol in prompts if symbol not in responses]
+
+        stats = {
+            "symbols": len(symbols),
+            "cached": len(responses),
+            "submitted": len(pending),
+        }
+        batch_id = None
+        if pending:
+            batch_id = await self.provider.submit(
+                [BatchRequest(custom_id(s), prompts[s], MAX_TOKENS) for s in pending]
+            )
+            logger.info(
+                "Submitted recommendation batch",
+                provider=self.provider.name,
+                batch_id=batch_id,
+                requests=len(pending),
+            )
+            fresh, errors, unparsed = await self._collect(
+                batch_id, poll_interval, timeout
+            )
+            failed.update(errors)
+            responses.update(fresh)
+            for symbol in pending:
+                if symbol not in fresh and symbol not in errors:
+                    failed[symbol] = f"No result in batch {batch_id}"
+            cacheable = {
+                keys[s]: response
+                for s, response in fresh.items()
+                if s in keys and s not in unparsed
+            }
+            if settings.AI_CACHE_ENABLED and cacheable:
+                await self.cache.set_many(
+                    cacheable, settings.RECOMMENDATION_EXPIRY_HOURS * 3600
+                )
+
+        loaded = await self._load(responses, failed)
+        return {**stats, "loaded": loaded, "failed": failed, "batch_id": batch_id}
+
+    async def resume(
+        self,
+        batch_id: str,
+        poll_interval: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict:
+        """Wait for a submitted batch and store its recommendations.
+
+        Answers are not cached, since their prompts are not known again.
+        """
+        responses, failed, _ = await self._collect(batch_id, poll_interval, timeout)
+        loaded = await self._load(responses, failed)
+        return {
+            "symbols": len(responses) + len(failed),
+            "cached": 0,
+            "submitted": 0,
+            "loaded": loaded,
+            "failed": failed,
+            "batch_id": batch_id,
+        }
+
+    async def _prompts(
+        self, symbols: List[str]
+    ) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Build the prompt of every symbol with market data."""
+        ai_client = self.recommendations.ai_client
+        prompts: Dict[str, str] = {}
+        failed: Dict[str, str] = {}
+        for i in range(0, len(symbols), ANALYSIS_BATCH_SIZE):
+            batch = symbols[i : i + ANALYSIS_BATCH_SIZE]
+            analysis = await self.recommendations.load_analysis_data(batch)
+            for symbol in batch:
+                if analysis.get(symbol):
+                    prompts[symbol] = ai_client.prepare_prompt(symbol, analysis[symbol])
+                else:
+                    failed[symbol] = "No market data"
+        return prompts, failed
+
+    async def _collect(
+        self,
+        batch_id: str,
+        poll_interval: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> Tuple[Dict[str, Dict], Dict[str, str], Set[str]]:
+        """Poll a batch until it ends and parse its answers.
+
+        A failed batch, e.g. an expired one, still yields the answers it
+        finished. Also returns the symbols answered without JSON, whose
+        fallback responses must not be cached.
+        """
+        poll_interval = (
+            settings.AI_BATCH_POLL_INTERVAL if poll_interval is None else poll_interval
+        )
+        timeout = settings.AI_BATCH_TIMEOUT if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            status = await self.provider.status(batch_id)
+            if status in (COMPLETED, FAILED):
+                break
+            if time.monotonic() >= deadline:
+                raise TimeoutError(
+                    f"Batch {batch_id} not finished after {timeout:.0f}s"
+                )
+            await asyncio.sleep(poll_interval)
+        if status == FAILED:
+            logger.warning(
+                "Batch failed, collecting partial results", batch_id=batch_id
+            )
+
+        generated_at = datetime.utcnow().isoformat()
+        responses: Dict[str, Dict] = {}
+        failed: Dict[str, str] = {}
+        unparsed: Set[str] = set()
+        for request_id, result in (await self.provider.results(batch_id)).items():
+            try:
+                symbol = symbol_of(request_id)
+            except ValueError:
+                logger.warning(
+                    "Unknown batch request", batch_id=batch_id, custom_id=request_id
+                )
+                continue
+            if isinstance(result, Exception):
+                failed[symbol] = str(result) or type(result).__name__
+            else:
+                ai_client = self.recommendations.ai_client
+                parsed = ai_client.extract_recommendation(result)
+                if parsed is None:
+                    unparsed.add(symbol)
+                    parsed = ai_client.parse_recommendation(result)
+                responses[symbol] = {**parsed, "generated_at": generated_at}
+        return responses, failed, unparsed
+
+    async def _load(self, responses: Dict[str, Dict], failed: Dict[str, str]) -> int:
+        """Insert the valid responses; invalid ones are added to ``failed``."""
+        now = datetime.utcnow()
+        lifetime = timedelta(hours=settings.RECOMMENDATION_EXPIRY_HOURS)
+        rows = []
+        for symbol, response in sorted(responses.items()):
+            try:
+                draft = recommendation_draft(response)
+            except ValidationError as e:
+                error = e.errors()[0]
+                failed[symbol] = (
+                    f"Invalid AI response: {error['loc'][0]}: {error['msg']}"
+                )
+                continue
+            generated_at = response.get("generated_at")
+            generated_at = datetime.fromisoformat(generated_at) if generated_at else now
+            rows.append(
+                {
+                    **draft.model_dump(),
+                    "portfolio_id": None,
+                    "symbol": symbol,
+                    "status": "active",
+                    "created_at": now,
+                    "expires_at": generated_at + lifetime,
+                }
+            )
+        if rows:
+            await self.db.execute(insert(Recommendation), rows)
+            await self.db.commit()
+
+        logger.info(
+            "Loaded batch recommendations",
+            provider=self.provider.name,
+            loaded=len(rows),
+            failed=len(failed),
+        )
+        return len(rows)
@@ -0,0 +1,288 @@
+"""Incremental technical indicator state."""
+
+import copy
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from app.schemas.analysis import IndicatorSettings
+
+
+class _Rolling:
+    """Sum of the trailing ``window`` values, updated in O(1) per bar.
+
+    The sum is only valid once the window holds ``window`` present values.
+    Each column has its own position in the ring buffer, so columns without
+    a bar can be skipped. Running sums are rebuilt from the buffer each time
+    a column wraps so floating point drift cannot accumulate over long
+    streams.
+    """
+
+    def __init__(self, window: int, width: int):
+        self.window = window
+        self.buffer = np.full((window, width), np.nan)
+        self.pos = np.zeros(width, dtype=np.intp)
+        self.sum = np.zeros(width)
+        self.present = np.zeros(width)
+
+    def update(self, values: np.ndarray, mask: Optional[np.ndarray] = None) -> None:
+        columns = np.arange(len(values)) if mask is None else np.flatnonzero(mask)
+        values = values[columns]
+        pos = self.pos[columns]
+        old = self.buffer[pos, columns]
+        old_present = ~np.isnan(old)
+        new_present = ~np.isnan(values)
+        self.sum[columns] += np.where(new_present, values, 0.0) - np.where(
+            old_present, old, 0.0
+        )
+        self.present[columns] += new_present.astype(float) - old_present
+        self.buffer[pos, columns] = values
+        pos = (pos + 1) % self.window
+        self.pos[columns] = pos
+        wrapped = columns[pos == 0]
+        if len(wrapped):
+            self.sum[wrapped] = np.nansum(self.buffer[:, wrapped], axis=0)
+
+    def full(self) -> np.ndarray:
+        return self.present == self.window
+
+    def total(self) -> np.ndarray:
+        return np.where(self.full(), self.sum, np.nan)
+
+    def take(self, columns: Union[slice, List[int]]) -> "_Rolling":
+        part = copy.copy(self)
+        part.buffer = self.buffer[:, columns].copy()
+        part.pos = self.pos[columns].copy()
+        part.sum = self.sum[columns].copy()
+        part.present = self.present[columns].copy()
+        return part
+
+
+class _Ewm:
+    """Exponentially weighted mean, matching ``ewm(adjust=False)``."""
+
+    def __init__(self, alpha: float, min_periods: int, width: int):
+        self.alpha = alpha
+        self.min_periods = min_periods
+        self.state = np.full(width, np.nan)
+        self.count = np.zeros(width)
+
+    def update(self, values: np.ndarray, mask: Optional[np.ndarray] = None) -> None:
+        present = ~np.isnan(values)
+        state = np.where(
+            np.isnan(self.state),
+            values,
+            np.where(
+                present, self.state + self.alpha * (values - self.state), self.state
+            ),
+        )
+        if mask is not None:
+            state = np.where(mask, state, self.state)
+            present &= mask
+        self.state = state
+        self.count += present
+
+    def value(self) -> np.ndarray:
+        return np.where(self.count >= self.min_periods, self.state, np.nan)
+
+    def take(self, columns: Union[slice, List[int]]) -> "_Ewm":
+        part = copy.copy(self)
+        part.state = self.state[columns].copy()
+        part.count = self.count[columns].copy()
+        return part
+
+
+def _ema(window: int, width: int) -> _Ewm:
+    return _Ewm(2 / (window + 1), window, width)
+
+
+def _wilder(window: int, width: int) -> _Ewm:
+    return _Ewm(1 / window, window, width)
+
+
+class IndicatorState:
+    """Rolling indicator state for a vector of symbols.
+
+    ``update`` appends one bar per symbol in constant time and ``values``
+    returns the same indicators as ``compute_indicators`` would for the full
+    bar history seen so far.
+
+    Symbols without a bar at some step are left out of that update with a
+    ``mask``, so symbols on different calendars can share one state.
+    """
+
+    def __init__(self, config: IndicatorSettings, width: int = 1):
+        self.config = config
+        self.width = width
+        selected = set(config.indicators)
+        self.selected = selected
+        self.prev_close = np.full(width, np.nan)
+
+        if "sma" in selected:
+            self.sma = {w: _Rolling(w, width) for w in config.sma_windows}
+        if "ema" in selected:
+            self.ema = {w: _ema(w, width) for w in config.ema_windows}
+        if "rsi" in selected:
+            self.rsi_gain = _wilder(config.rsi_window, width)
+            self.rsi_loss = _wilder(config.rsi_window, width)
+        if "macd" in selected:
+            self.macd_fast = _ema(config.macd_fast, width)
+            self.macd_slow = _ema(config.macd_slow, width)
+            self.macd_signal = _ema(config.macd_signal, width)
+        if "bollinger" in selected:
+            # Centered on the first close to keep the variance accurate
+            self.bb_offset = np.full(width, np.nan)
+            self.bb_sum = _Rolling(config.bollinger_window, width)
+            self.bb_sumsq = _Rolling(config.bollinger_window, width)
+        if "atr" in selected:
+            self.atr_ranges = _Rolling(config.atr_window, width)
+            self.atr_value = np.full(width, np.nan)
+            self.atr_seeded = np.zeros(width, dtype=bool)
+        if "vwap" in selected:
+            self.vwap_pv = _Rolling(config.vwap_window, width)
+            self.vwap_volume = _Rolling(config.vwap_window, width)
+
+    @classmethod
+    def replay(
+        cls,
+        high: np.ndarray,
+        low: np.ndarray,
+        close: np.ndarray,
+        volume: np.ndarray,
+        config: IndicatorSettings,
+        mask: Optional[np.ndarray] = None,
+    ) -> "IndicatorState":
+        """Build state from (bars, symbols) arrays, one vectorized step per bar.
+
+        ``mask`` marks, per step and symbol, the bars that exist.
+        """
+        state = cls(config, width=close.shape[1])
+        for t in range(close.shape[0]):
+            state.update(
+                high[t], low[t], close[t], volume[t], None if mask is None else mask[t]
+            )
+        return state
+
+    def update(
+        self,
+        high: np.ndarray,
+        low: np.ndarray,
+        close: np.ndarray,
+        volume: np.ndarray,
+        mask: Optional[np.ndarray] = None,
+    ) -> None:
+        """Append one bar per symbol, or per symbol in ``mask`` if given."""
+        selected = self.selected
+        present = ~np.isnan(close)
+        stepped = np.ones(self.width, dtype=bool) if mask is None else mask
+
+        if "sma" in selected:
+            for rolling in self.sma.values():
+                rolling.update(close, mask)
+        if "ema" in selected:
+            for ewm in self.ema.values():
+                ewm.update(close, mask)
+        if "rsi" in selected:
+            diff = close - self.prev_close
+            self.rsi_gain.update(
+                np.where(present, np.where(diff > 0, diff, 0.0), np.nan), mask
+            )
+            self.rsi_loss.update(
+                np.where(present, np.where(diff < 0, -diff, 0.0), np.nan), mask
+            )
+        if "macd" in selected:
+            self.macd_fast.update(close, mask)
+            self.macd_slow.update(close, mask)
+            self.macd_signal.update(
+                self.macd_fast.value() - self.macd_slow.value(), mask
+            )
+        if "bollinger" in selected:
+            self.bb_offset = np.where(
+                np.isnan(self.bb_offset) & stepped, close, self.bb_offset
+            )
+            centered = close - self.bb_offset
+            self.bb_sum.update(centered, mask)
+            self.bb_sumsq.update(centered * centered, mask)
+        if "atr" in selected:
+            ranges = np.fmax(
+                np.fmax(high - low, np.abs(high - self.prev_close)),
+                np.abs(low - self.prev_close),
+            )
+            self.atr_ranges.update(ranges, mask)
+            full = self.atr_ranges.full() & stepped
+            window = self.config.atr_window
+            self.atr_value = np.where(
+                full & ~self.atr_seeded,
+                self.atr_ranges.sum / window,
+                np.where(
+                    full & self.atr_seeded,
+                    self.atr_value + (ranges - self.atr_value) / window,
+                    self.atr_value,
+                ),
+            )
+            self.atr_seeded |= full
+        if "vwap" in selected:
+            self.vwap_pv.update((high + low + close) / 3 * volume, mask)
+            self.vwap_volume.update(volume, mask)
+
+        self.prev_close = np.where(stepped, close, self.prev_close).astype(float)
+
+    def values(self) -> Dict[str, np.ndarray]:
+        """Current indicator values, keyed like ``compute_indicators``."""
+        selected = self.selected
+        config = self.config
+        out: Dict[str, np.ndarray] = {}
+
+        if "sma" in selected:
+            for window, rolling in self.sma.items():
+                out[f"ma_{window}"] = rolling.total() / window
+        if "ema" in selected:
+            for window, ewm in self.ema.items():
+                out[f"ema_{window}"] = ewm.value()
+        if "rsi" in selected:
+            avg_gain = self.rsi_gain.value()
+            avg_loss = self.rsi_loss.value()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+            out["rsi"] = np.where(avg_loss == 0, 100.0, rsi)
+        if "macd" in selected:
+            line = self.macd_fast.value() - self.macd_slow.value()
+            signal = self.macd_signal.value()
+            out["macd"], out["macd_signal"], out["macd_histogram"] = (
+                line,
+                signal,
+                line - signal,
+            )
+        if "bollinger" in selected:
+            window = config.bollinger_window
+            mean = self.bb_sum.total() / window
+            variance = self.bb_sumsq.total() / window - mean * mean
+            std = np.sqrt(np.maximum(variance, 0.0))
+            middle = mean + self.bb_offset
+            out["bb_upper"] = middle + config.bollinger_std * std
+            out["bb_middle"] = middle
+            out["bb_lower"] = middle - config.bollinger_std * std
+        if "atr" in selected:
+            out["atr"] = self.atr_value.copy()
+        if "vwap" in selected:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out["vwap"] = self.vwap_pv.total() / self.vwap_volume.total()
+
+        return out
+
+    def copy(self) -> "IndicatorState":
+        """Independent copy, e.g. to apply a bar that may still be revised."""
+        return self.take(slice(None))
+
+    def take(self, columns: Union[slice, List[int]]) -> "IndicatorState":
+        """Independent state for a subset of the symbol columns."""
+        part = copy.copy(self)
+        part.width = len(np.arange(self.width)[columns])
+        for name, value in vars(self).items():
+            if isinstance(value, (_Rolling, _Ewm)):
+                setattr(part, name, value.take(columns))
+            elif isinstance(value, dict):
+                setattr(part, name, {k: v.take(columns) for k, v in value.items()})
+            elif isinstance(value, np.ndarray):
+                setattr(part, name, value[columns].copy())
+        return part
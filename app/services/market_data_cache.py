@@ -0,0 +1,268 @@
+"""Two-tier cache for market data."""
+
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.redis import get_async_redis
+from app.services.single_flight import SingleFlight
+
+
+INTRADAY_INTERVALS = {"1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"}
+
+# Seconds to skip Redis after a connection error before trying again
+REDIS_RETRY_AFTER = 30.0
+
+# Seconds between Redis polls while another worker holds the fetch lock
+LOCK_POLL_INTERVAL = 0.05
+
+# Delete the lock only if it still holds our token
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def history_ttl(interval: str) -> int:
+    """Get the cache TTL for historical bars of the given interval."""
+    if interval in INTRADAY_INTERVALS:
+        return settings.MARKET_DATA_INTRADAY_TTL
+    return settings.REDIS_CACHE_TTL
+
+
+class MarketDataCache:
+    """Bounded in-process LRU backed by a Redis cache shared across workers.
+
+    Lookups hit the local LRU first, then Redis; values found in Redis are
+    promoted into the LRU for the rest of their Redis TTL. Redis failures
+    are logged and treated as misses so the service keeps working without it.
+
+    Misses are coalesced: concurrent ``get_or_load`` calls for the same key
+    share one loader call, and with ``distributed_lock`` enabled workers
+    also take a Redis lock so only one of them hits the provider.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        redis: Any = None,
+        use_redis: bool = True,
+        prefix: str = "md",
+        distributed_lock: Optional[bool] = None,
+    ):
+        self.max_entries = max_entries or settings.MARKET_DATA_CACHE_SIZE
+        self.prefix = prefix
+        # Redis client or a stand-in; only used once _redis_available() holds
+        self._redis: Any = (
+            redis if redis is not None else (get_async_redis() if use_redis else None)
+        )
+        self._local: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._redis_retry_at = 0.0
+        self.distributed_lock = (
+            settings.MARKET_DATA_DISTRIBUTED_LOCK
+            if distributed_lock is None
+            else distributed_lock
+        )
+        self.flights = SingleFlight()
+        self.stats = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "redis_errors": 0,
+            "loads": 0,
+        }
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def _redis_available(self) -> bool:
+        return self._redis is not None and time.monotonic() >= self._redis_retry_at
+
+    def _redis_failed(self, error: Exception) -> None:
+        self.stats["redis_errors"] += 1
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_AFTER
+        logger.warning("Market data cache Redis error", error=str(error))
+
+    def _get_local(self, key: str) -> Optional[Any]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: Any, ttl: float) -> None:
+        self._local[key] = (time.monotonic() + ttl, value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Get all cached values for the given keys, skipping misses."""
+        found: Dict[str, Any] = {}
+        remote: List[str] = []
+        for key in keys:
+            value = self._get_local(key)
+            if value is not None:
+                self.stats["local_hits"] += 1
+                found[key] = value
+            else:
+                remote.append(key)
+
+        if remote and self._redis_available():
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                for key in remote:
+                    pipe.get(self._redis_key(key))
+                    pipe.pttl(self._redis_key(key))
+                replies = await pipe.execute()
+            except Exception as e:
+                self._redis_failed(e)
+                replies = []
+
+            for key, raw, pttl in zip(remote, replies[::2], replies[1::2]):
+                if raw is None:
+                    continue
+                value = json.loads(raw)
+                if pttl and pttl > 0:
+                    self._set_local(key, value, pttl / 1000)
+                self.stats["redis_hits"] += 1
+                found[key] = value
+
+        self.stats["misses"] += len(keys) - len(found)
+        return found
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Get a cached value, or None on miss."""
+        return (await self.get_many([key])).get(key)
+
+    async def set_many(self, items: Dict[str, Any], ttl: int) -> None:
+        """Store values in both tiers with the given TTL in seconds."""
+        for key, value in items.items():
+            self._set_local(key, value, ttl)
+
+        if items and self._redis_available():
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                for key, value in items.items():
+                    pipe.set(self._redis_key(key), json.dumps(value), ex=ttl)
+                await pipe.execute()
+            except Exception as e:
+                self._redis_failed(e)
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        """Store a value in both tiers with the given TTL in seconds."""
+        await self.set_many({key: value}, ttl)
+
+    async def get_or_load(
+        self, key: str, ttl: int, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Get a cached value, calling ``loader`` and caching its result on miss."""
+        value = await self.get(key)
+        if value is None:
+            value = await self.flights.do(
+                key, lambda: self._load_and_store(key, ttl, loader)
+            )
+        return value
+
+    async def _load_and_store(
+        self, key: str, ttl: int, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Call ``loader`` and cache its result, holding the Redis lock if enabled."""
+        token = None
+        if self.distributed_lock and self._redis_available():
+            token = await self._acquire_lock(key)
+            if token is None and self._redis_available():
+                value = await self._wait_for_value(key, ttl)
+                if value is not None:
+                    return value
+        try:
+            self.stats["loads"] += 1
+            value = await loader()
+            await self.set(key, value, ttl)
+            return value
+        finally:
+            if token is not None:
+                await self._release_lock(key, token)
+
+    async def _acquire_lock(self, key: str) -> Optional[str]:
+        """Try to take the cross-worker fetch lock for ``key``."""
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self._redis.set(
+                self._redis_key(f"lock:{key}"),
+                token,
+                nx=True,
+                px=int(settings.MARKET_DATA_LOCK_TIMEOUT * 1000),
+            )
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+        return token if acquired else None
+
+    async def _release_lock(self, key: str, token: str) -> None:
+        try:
+            await self._redis.eval(
+                RELEASE_LOCK_SCRIPT, 1, self._redis_key(f"lock:{key}"), token
+            )
+        except Exception as e:
+            self._redis_failed(e)
+
+    async def _wait_for_value(self, key: str, ttl: int) -> Optional[Any]:
+        """Poll Redis for a value another worker is loading.
+
+        A value found is kept locally for ``ttl`` seconds. Returns None if
+        the lock is released or expires without a value, in which case the
+        caller loads it itself.
+        """
+        deadline = time.monotonic() + settings.MARKET_DATA_LOCK_TIMEOUT
+        lock_key = self._redis_key(f"lock:{key}")
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            try:
+                raw, locked = await (
+                    self._redis.pipeline(transaction=False)
+                    .get(self._redis_key(key))
+                    .exists(lock_key)
+                    .execute()
+                )
+            except Exception as e:
+                self._redis_failed(e)
+                return None
+            if raw is not None:
+                self.stats["redis_hits"] += 1
+                value = json.loads(raw)
+                self._set_local(key, value, ttl)
+                return value
+            if not locked:
+                return None
+        return None
+
+    def clear_local(self) -> None:
+        """Drop every entry from the in-process tier."""
+        self._local.clear()
+
+    def get_stats(self) -> Dict:
+        """Get hit/miss counters and the current LRU size."""
+        lookups = (
+            self.stats["local_hits"] + self.stats["redis_hits"] + self.stats["misses"]
+        )
+        hits = self.stats["local_hits"] + self.stats["redis_hits"]
+        return {
+            **self.stats,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "in_flight": self.flights.in_flight(),
+            "coalesced": self.flights.stats["followers"],
+            "local_entries": len(self._local),
+            "local_capacity": self.max_entries,
+        }
@@ -1,24 +1,195 @@
 """Market data fetching service."""
 
-import yfinance as yf
-from typing import Dict, List, Optional
-from datetime import datetime
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import numpy as np
 import pandas as pd
+import yfinance as yf
 
+from app.core.config import settings
 from app.core.logging import logger
+from app.services.bar_store import FULL_HISTORY, BarStore, merge_bars
+from app.services.market_data_cache import MarketDataCache, history_ttl
+
+
+HISTORY_FORMATS = ("rows", "columnar")
+HISTORY_FIELDS = ("open", "high", "low", "close", "volume")
+
+# Periods served from the bar store; shorter ones go straight to the provider
+STORE_PERIOD_OFFSETS = {
+    "1mo": pd.DateOffset(months=1),
+    "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1),
+    "2y": pd.DateOffset(years=2),
+    "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10),
+}
+STORE_PERIODS = set(STORE_PERIOD_OFFSETS) | {"ytd", FULL_HISTORY}
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get the shared worker pool for blocking provider calls."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.MARKET_DATA_MAX_WORKERS,
+            thread_name_prefix="market-data",
+        )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """Shut down the shared worker pool, dropping queued provider calls."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def period_start(period: str, now: pd.Timestamp) -> Optional[pd.Timestamp]:
+    """Get the first timestamp covered by a store period, or None for ``max``."""
+    if period == FULL_HISTORY:
+        return None
+    if period == "ytd":
+        return pd.Timestamp(year=now.year, month=1, day=1, tz=now.tz)
+    return now - STORE_PERIOD_OFFSETS[period]
+
+
+def _covers(covered_from: Optional[str], start: Optional[pd.Timestamp]) -> bool:
+    """Check whether stored coverage reaches back to ``start``."""
+    if covered_from == FULL_HISTORY:
+        return True
+    if covered_from is None or start is None:
+        return False
+    return pd.Timestamp(covered_from) <= start
+
+
+def _frame_to_columns(data: pd.DataFrame) -> Dict:
+    """Convert a provider OHLCV frame to JSON-ready columns."""
+    index = pd.DatetimeIndex(data.index)
+    return {
+        "timezone": str(index.tz) if index.tz is not None else None,
+        "timestamp": (index.asi8 // 1_000_000).tolist(),
+        "open": data["Open"].to_numpy(dtype="float64").tolist(),
+        "high": data["High"].to_numpy(dtype="float64").tolist(),
+        "low": data["Low"].to_numpy(dtype="float64").tolist(),
+        "close": data["Close"].to_numpy(dtype="float64").tolist(),
+        "volume": data["Volume"].fillna(0).to_numpy(dtype="int64").tolist(),
+    }
+
+
+def _iso_dates(timestamps: List[int], timezone: Optional[str]) -> np.ndarray:
+    """Format epoch-millisecond timestamps as ISO 8601 strings.
+
+    Produces the same strings as ``Timestamp.isoformat()`` for
+    second-resolution bars, without a Python-level loop over the bars.
+    """
+    utc = pd.to_datetime(np.asarray(timestamps, dtype="int64"), unit="ms", utc=True)
+    if timezone is None:
+        return np.datetime_as_string(utc.tz_localize(None).to_numpy(), unit="s")
+
+    local = utc.tz_convert(timezone).tz_localize(None)
+    wall = np.datetime_as_string(local.to_numpy(), unit="s")
+    offsets = (local.asi8 - utc.tz_localize(None).asi8) // 60_000_000_000
+    unique, inverse = np.unique(offsets, return_inverse=True)
+    labels = np.array(
+        [
+            f"{'-' if minutes < 0 else '+'}{abs(minutes) // 60:02d}:{abs(minutes) % 60:02d}"
+            for minutes in unique.tolist()
+        ]
+    )
+    return np.char.add(wall, labels[inverse])
 
 
 class MarketDataService:
     """Service for fetching market data."""
 
-    def __init__(self):
-        self.cache = {}  # Simple in-memory cache
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        cache: Optional[MarketDataCache] = None,
+        store: Optional[BarStore] = None,
+    ):
+        self.cache = cache if cache is not None else MarketDataCache()
+        if store is None and settings.MARKET_DATA_STORE_ENABLED:
+            store = BarStore()
+        self.store = store
+        self.timeout = timeout if timeout is not None else settings.MARKET_DATA_TIMEOUT
+
+    async def _run_blocking(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking provider call on the worker pool.
+
+        The call is bounded by ``self.timeout``. On timeout or cancellation the
+        pending job is cancelled if it has not started yet; a job that is
+        already running finishes in its worker and its result is discarded.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            get_executor(), functools.partial(func, *args, **kwargs)
+        )
+        try:
+            return await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            logger.error(
+                "Market data provider call timed out",
+                call=getattr(func, "__name__", repr(func)),
+                timeout=self.timeout,
+            )
+            raise
+
+    @staticmethod
+    def _fetch_info(symbol: str) -> Dict:
+        """Fetch raw ticker info from the provider (blocking)."""
+        return yf.Ticker(symbol).info
+
+    @staticmethod
+    def _fetch_history(symbol: str, **kwargs) -> pd.DataFrame:
+        """Fetch raw OHLCV bars from the provider (blocking)."""
+        return yf.Ticker(symbol).history(**kwargs)
+
+    @staticmethod
+    def _fetch_batch_history(symbols: List[str], **kwargs) -> pd.DataFrame:
+        """Fetch OHLCV bars for several symbols in one download (blocking)."""
+        return yf.download(
+            symbols,
+            group_by="ticker",
+            auto_adjust=True,
+            threads=False,
+            progress=False,
+            **kwargs,
+        )
+
+    @staticmethod
+    def _quote_from_bar(symbol: str, bar: pd.Series) -> Dict:
+        """Build a quote from the latest OHLCV bar."""
+        return {
+            "symbol": symbol.upper(),
+            "price": float(bar["Close"]),
+            "timestamp": bar.name.isoformat(),
+            "open": float(bar["Open"]),
+            "high": float(bar["High"]),
+            "low": float(bar["Low"]),
+            "volume": int(bar["Volume"]),
+        }
 
     async def get_stock_info(self, symbol: str) -> Dict:
         """Get comprehensive stock information."""
+        return await self.cache.get_or_load(
+            f"info:{symbol.upper()}",
+            settings.REDIS_CACHE_TTL,
+            lambda: self._load_stock_info(symbol),
+        )
+
+    async def _load_stock_info(self, symbol: str) -> Dict:
+        """Fetch stock information from the provider."""
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
+            info = await self._run_blocking(self._fetch_info, symbol)
 
             return {
                 "symbol": symbol.upper(),
@@ -44,71 +215,299 @@ class MarketDataService:
 
     async def get_current_price(self, symbol: str) -> Dict:
         """Get current stock price."""
+        return await self.cache.get_or_load(
+            f"quote:{symbol.upper()}",
+            settings.MARKET_DATA_QUOTE_TTL,
+            lambda: self._load_current_price(symbol),
+        )
+
+    async def _load_current_price(self, symbol: str) -> Dict:
+        """Fetch the current stock price from the provider."""
         try:
-            ticker = yf.Ticker(symbol)
-            data = ticker.history(period="1d")
+            data = await self._run_blocking(self._fetch_history, symbol, period="1d")
 
             if data.empty:
                 raise ValueError(f"No data found for {symbol}")
 
-            latest = data.iloc[-1]
-            return {
-                "symbol": symbol.upper(),
-                "price": float(latest["Close"]),
-                "timestamp": latest.name.isoformat(),
-                "open": float(latest["Open"]),
-                "high": float(latest["High"]),
-                "low": float(latest["Low"]),
-                "volume": int(latest["Volume"]),
-            }
+            return self._quote_from_bar(symbol, data.iloc[-1])
         except Exception as e:
             logger.error("Failed to fetch current price", symbol=symbol, error=str(e))
             raise
 
     async def get_historical_data(
+        self,
+        symbol: str,
+        period: str = "1mo",
+        interval: str = "1d",
+        format: str = "rows",
+    ) -> Dict:
+        """Get historical stock data.
+
+        ``format="rows"`` returns one dict per bar; ``format="columnar"``
+        returns parallel arrays keyed by field name.
+        """
+        if format not in HISTORY_FORMATS:
+            raise ValueError(f"Unsupported history format: {format}")
+
+        columns = await self._get_history_columns(symbol, period, interval)
+        dates = _iso_dates(columns["timestamp"], columns["timezone"])
+
+        data: Union[Dict[str, Any], List[Dict[str, Any]]]
+        if format == "columnar":
+            data = {"date": dates.tolist()}
+            data.update({field: columns[field] for field in HISTORY_FIELDS})
+        else:
+            data = [
+                {
+                    "date": date,
+                    "open": open_,
+                    "high": high,
+                    "low": low,
+                    "close": close,
+                    "volume": volume,
+                }
+                for date, open_, high, low, close, volume in zip(
+                    dates.tolist(), *(columns[field] for field in HISTORY_FIELDS)
+                )
+            ]
+
+        return {
+            "symbol": symbol.upper(),
+            "period": period,
+            "interval": interval,
+            "format": format,
+            "timezone": columns["timezone"],
+            "data": data,
+            "total_records": len(columns["timestamp"]),
+        }
+
+    async def get_historical_table(
         self, symbol: str, period: str = "1mo", interval: str = "1d"
+    ):
+        """Get historical stock data as an Apache Arrow table."""
+        import pyarrow as pa
+
+        columns = await self._get_history_columns(symbol, period, interval)
+        timestamps = pa.array(
+            np.asarray(columns["timestamp"], dtype="int64"),
+            type=pa.timestamp("ms", tz=columns["timezone"]),
+        )
+        return pa.table(
+            {
+                "date": timestamps,
+                "open": pa.array(columns["open"], type=pa.float64()),
+                "high": pa.array(columns["high"], type=pa.float64()),
+                "low": pa.array(columns["low"], type=pa.float64()),
+                "close": pa.array(columns["close"], type=pa.float64()),
+                "volume": pa.array(columns["volume"], type=pa.int64()),
+            },
+            metadata={"symbol": symbol.upper(), "period": period, "interval": interval},
+        )
+
+    async def _get_history_columns(
+        self, symbol: str, period: str, interval: str
     ) -> Dict:
-        """Get historical stock data."""
+        """Get cached bars as columns of epoch-millisecond timestamps and OHLCV."""
+        return await self.cache.get_or_load(
+            f"bars:{symbol.upper()}:{period}:{interval}",
+            history_ttl(interval),
+            lambda: self._load_historical_data(symbol, period, interval),
+        )
+
+    async def _load_historical_data(
+        self, symbol: str, period: str, interval: str
+    ) -> Dict:
+        """Load historical stock data from the bar store or provider."""
         try:
-            ticker = yf.Ticker(symbol)
-            data = ticker.history(period=period, interval=interval)
+            return _frame_to_columns(await self.get_bars(symbol, period, interval))
+        except Exception as e:
+            logger.error("Failed to fetch historical data", symbol=symbol, error=str(e))
+            raise
 
-            if data.empty:
-                raise ValueError(f"No historical data found for {symbol}")
-
-            history = []
-            for date, row in data.iterrows():
-                history.append(
-                    {
-                        "date": date.isoformat(),
-                        "open": float(row["Open"]),
-                        "high": float(row["High"]),
-                        "low": float(row["Low"]),
-                        "close": float(row["Close"]),
-                        "volume": int(row["Volume"]),
-                    }
+    async def get_bars(
+        self, symbol: str, period: str = "1mo", interval: str = "1d"
+    ) -> pd.DataFrame:
+        """Get OHLCV bars as a DataFrame indexed by bar timestamp.
+
+        Periods of a month or longer are read from the bar store, fetching
+        only the missing range from the provider.
+        """
+        symbol = symbol.upper()
+        if self.store is None or period not in STORE_PERIODS:
+            data = await self._run_blocking(
+                self._fetch_history, symbol, period=period, interval=interval
+            )
+        else:
+            store = self.store
+            data = await self.cache.flights.do(
+                f"store:{symbol}:{period}:{interval}",
+                lambda: self._run_blocking(
+                    self._sync_store, store, symbol, period, interval
+                ),
+            )
+
+        if data.empty:
+            raise ValueError(f"No historical data found for {symbol}")
+        return data
+
+    def _sync_store(
+        self, store: BarStore, symbol: str, period: str, interval: str
+    ) -> pd.DataFrame:
+        """Bring the stored bars up to date for a period and return them (blocking).
+
+        Fetches the whole period if the store does not reach back far enough,
+        only the tail since the last stored bar if it has not been refreshed
+        within the cache TTL, and nothing otherwise. Stored bars are served if
+        the provider fails.
+        """
+        now = pd.Timestamp.now(tz="UTC")
+        start = period_start(period, now)
+
+        with store.lock(symbol, interval):
+            stored, meta = store.read(symbol, interval)
+            covered_from = meta.get("covered_from")
+            synced_at = meta.get("synced_at")
+            bars = stored
+
+            try:
+                if stored is None or not _covers(covered_from, start):
+                    fetched = self._fetch_history(
+                        symbol, period=period, interval=interval
+                    )
+                    if start is None:
+                        covered_from = FULL_HISTORY
+                    elif not _covers(covered_from, start):
+                        covered_from = start.isoformat()
+                elif synced_at is None or now - synced_at >= pd.Timedelta(
+                    seconds=history_ttl(interval)
+                ):
+                    fetched = self._fetch_history(
+                        symbol, start=stored.index[-1], interval=interval
+                    )
+                else:
+                    fetched = None
+
+                if fetched is not None and not fetched.empty:
+                    bars = merge_bars(stored, fetched)
+                    store.write(symbol, interval, bars, covered_from, now)
+                elif fetched is not None and stored is None:
+                    return fetched
+                elif fetched is not None:
+                    # Nothing new upstream; record the refresh so the tail
+                    # is not refetched on every call until the next bar
+                    store.write(symbol, interval, stored, covered_from, now)
+            except Exception as e:
+                if stored is None or stored.empty:
+                    raise
+                logger.warning(
+                    "Serving stored bars after provider error",
+                    symbol=symbol,
+                    interval=interval,
+                    error=str(e),
                 )
 
-            return {
-                "symbol": symbol.upper(),
-                "period": period,
-                "interval": interval,
-                "data": history,
-                "total_records": len(history),
-            }
+        # Without stored bars, the fetched ones were returned or the error raised
+        assert bars is not None
+        if start is None:
+            return bars
+        if bars.index.tz is None:
+            start = start.tz_localize(None)
+        return bars[bars.index >= start]
+
+    async def get_batch_quotes(self, symbols: List[str]) -> Dict:
+        """Get quotes for many symbols using chunked bulk downloads.
+
+        Cached quotes are served directly. The remaining symbols are split
+        into chunks of ``MARKET_DATA_BATCH_SIZE`` that are downloaded
+        concurrently on the worker pool. A failing chunk or symbol only
+        affects its own entries, which are reported under ``errors``.
+        """
+        unique = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+        cached = await self.cache.get_many([f"quote:{symbol}" for symbol in unique])
+        quotes: Dict[str, Dict] = {
+            key.split(":", 1)[1]: value for key, value in cached.items()
+        }
+        missing = [symbol for symbol in unique if symbol not in quotes]
+
+        size = max(settings.MARKET_DATA_BATCH_SIZE, 1)
+        chunks = [missing[i : i + size] for i in range(0, len(missing), size)]
+
+        results = await asyncio.gather(
+            *(
+                self.cache.flights.do(
+                    f"quotes:{','.join(chunk)}",
+                    functools.partial(self._fetch_quote_chunk, chunk),
+                )
+                for chunk in chunks
+            )
+        )
+
+        fetched: Dict[str, Dict] = {}
+        errors: Dict[str, str] = {}
+        for chunk_quotes, chunk_errors in results:
+            fetched.update(chunk_quotes)
+            errors.update(chunk_errors)
+
+        await self.cache.set_many(
+            {f"quote:{symbol}": quote for symbol, quote in fetched.items()},
+            settings.MARKET_DATA_QUOTE_TTL,
+        )
+        quotes.update(fetched)
+
+        return {
+            "quotes": quotes,
+            "errors": errors,
+            "total_requested": len(unique),
+            "total_returned": len(quotes),
+        }
+
+    async def _fetch_quote_chunk(self, symbols: List[str]) -> tuple:
+        """Download one chunk of symbols and split it into quotes and errors."""
+        quotes: Dict[str, Dict] = {}
+        errors: Dict[str, str] = {}
+        try:
+            data = await self._run_blocking(
+                self._fetch_batch_history, symbols, period="1d"
+            )
         except Exception as e:
-            logger.error(
-                "Failed to fetch historical data", symbol=symbol, error=str(e)
+            logger.warning(
+                "Failed to fetch quote batch", symbols=len(symbols), error=str(e)
             )
-            raise
+            return quotes, {symbol: str(e) or type(e).__name__ for symbol in symbols}
 
-    async def get_multiple_quotes(self, symbols: List[str]) -> Dict[str, Dict]:
-        """Get quotes for multiple symbols."""
-        quotes = {}
         for symbol in symbols:
             try:
-                quotes[symbol] = await self.get_current_price(symbol)
+                if isinstance(data.columns, pd.MultiIndex):
+                    if symbol not in data.columns.get_level_values(0):
+                        raise ValueError(f"No data found for {symbol}")
+                    frame = data[symbol]
+                else:
+                    frame = data
+                frame = frame.dropna(subset=["Close"])
+                if frame.empty:
+                    raise ValueError(f"No data found for {symbol}")
+                quotes[symbol] = self._quote_from_bar(symbol, frame.iloc[-1])
             except Exception as e:
-                logger.warning(f"Failed to get quote for {symbol}", error=str(e))
-                quotes[symbol] = {"error": str(e)}
+                errors[symbol] = str(e)
+
+        return quotes, errors
+
+    async def get_multiple_quotes(self, symbols: List[str]) -> Dict[str, Dict]:
+        """Get quotes for multiple symbols."""
+        batch = await self.get_batch_quotes(symbols)
+        quotes = dict(batch["quotes"])
+        for symbol, error in batch["errors"].items():
+            logger.warning(f"Failed to get quote for {symbol}", error=error)
+            quotes[symbol] = {"error": error}
         return quotes
+
+
+_service: Optional[MarketDataService] = None
+
+
+def get_market_data_service() -> MarketDataService:
+    """Dependency for getting the shared market data service."""
+    global _service
+    if _service is None:
+        _service = MarketDataService()
+    return _service
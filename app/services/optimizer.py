@@ -0,0 +1,504 @@
+"""Portfolio optimization and rebalancing proposals."""
+
+import asyncio
+import hashlib
+import json
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.models.portfolio import Portfolio
+from app.models.position import Position
+from app.services.market_data_service import (
+    MarketDataService,
+    get_market_data_service,
+)
+from app.services.risk_service import (
+    MIN_OBSERVATIONS,
+    PERIODS_PER_YEAR,
+    daily_returns,
+    load_daily_closes,
+)
+
+
+METHODS = ("mean_variance", "min_variance", "risk_parity")
+
+# Solver limits; the tolerance is on the largest weight change per iteration
+MAX_ITERATIONS = 2000
+MAX_NEWTON_ITERATIONS = 100
+TOLERANCE = 1e-9
+
+# Weight of the diagonal in the shrunk covariance estimate
+SHRINKAGE = 0.1
+
+# Portfolios read and optimized per round of the batch job
+PROPOSAL_BATCH_SIZE = 500
+
+# Seconds a solution is kept to warm-start the next run
+WARM_START_TTL = 7 * 24 * 3600
+
+
+def project_capped_simplex(v: np.ndarray, upper: float = 1.0) -> np.ndarray:
+    """Project ``v`` onto long-only weights summing to one, each at most ``upper``.
+
+    The projection is ``clip(v - tau, 0, upper)`` for the ``tau`` at which
+    the weights sum to one. That sum is piecewise linear in ``tau`` with
+    kinks at ``v`` and ``v - upper``, so ``tau`` is found exactly after one
+    sort of the kinks.
+    """
+    n = len(v)
+    if upper * n < 1 - 1e-12:
+        raise ValueError(f"Max weight {upper:g} is too low for {n} positions")
+    upper = min(upper, 1.0)
+
+    points = np.concatenate([v, v - upper])
+    steps = np.concatenate([np.ones(n), -np.ones(n)])
+    order = np.argsort(-points, kind="stable")
+    points, steps = points[order], steps[order]
+    # Weights strictly between their bounds, scanning tau downwards
+    active = np.cumsum(steps)
+    totals = np.concatenate([[0.0], np.cumsum(active[:-1] * -np.diff(points))])
+
+    k = min(int(np.searchsorted(totals, 1.0)), 2 * n - 1)
+    tau = points[k - 1] - (1.0 - totals[k - 1]) / active[k - 1] if k > 0 else points[0]
+    return np.clip(v - tau, 0.0, upper)
+
+
+def solve_quadratic(
+    Q: np.ndarray,
+    q: np.ndarray,
+    upper: float = 1.0,
+    start: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, int, bool]:
+    """Minimize ``w'Qw / 2 - q'w`` over capped long-only weights.
+
+    Accelerated projected gradient (FISTA with adaptive restart), started
+    from ``start`` when given. Returns the weights, the iterations used and
+    whether the solver converged.
+    """
+    n = len(q)
+    w = project_capped_simplex(np.full(n, 1.0 / n) if start is None else start, upper)
+    lipschitz = np.linalg.eigvalsh(Q)[-1]
+    if lipschitz <= 0:
+        return w, 0, True
+
+    y, t = w, 1.0
+    for iteration in range(1, MAX_ITERATIONS + 1):
+        step = project_capped_simplex(y - (Q @ y - q) / lipschitz, upper)
+        change = step - w
+        if np.abs(change).max() < TOLERANCE:
+            return step, iteration, True
+        if (y - step) @ change > 0:
+            # Momentum points uphill; restart from the last iterate
+            t = 1.0
+        t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        y = step + (t - 1) / t_next * change
+        w, t = step, t_next
+    return w, MAX_ITERATIONS, False
+
+
+def risk_parity(
+    cov: np.ndarray, start: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, int, bool]:
+    """Get long-only weights with equal risk contributions.
+
+    Damped Newton on ``y'Σy / 2 - sum(log y)``, whose minimizer normalized
+    to sum to one is the risk parity portfolio (Spinu, 2013).
+    """
+    n = len(cov)
+    if start is not None and (start > 0).all():
+        x = start.astype("float64")
+    else:
+        x = 1 / np.sqrt(np.diag(cov))
+    x = x * np.sqrt(n / (x @ cov @ x))
+
+    for iteration in range(1, MAX_NEWTON_ITERATIONS + 1):
+        gradient = cov @ x - 1 / x
+        step = np.linalg.solve(cov + np.diag(1 / (x * x)), gradient)
+        decrement = np.sqrt(max(gradient @ step, 0.0))
+        if decrement < 1e-10:
+            return x / x.sum(), iteration, True
+        if decrement > 0.25:
+            step = step / (1 + decrement)
+        while (x - step <= 0).any():
+            step = step / 2
+        x = x - step
+    return x / x.sum(), MAX_NEWTON_ITERATIONS, False
+
+
+def _estimate(returns: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Get annualized mean returns and a covariance shrunk toward its diagonal."""
+    R = returns.to_numpy()
+    X = R - R.mean(axis=0)
+    sample = X.T @ X / (len(R) - 1)
+    cov = (1 - SHRINKAGE) * sample + SHRINKAGE * np.diag(np.diag(sample))
+    return R.mean(axis=0) * PERIODS_PER_YEAR, cov * PERIODS_PER_YEAR
+
+
+def optimize_weights(
+    returns: pd.DataFrame,
+    current: pd.Series,
+    method: str = "min_variance",
+    max_weight: float = 1.0,
+    turnover: Optional[float] = None,
+    risk_aversion: float = 3.0,
+    start: Optional[Dict[str, float]] = None,
+) -> Dict:
+    """Get target weights for a portfolio from daily returns.
+
+    ``current`` holds the current weight of every symbol, summing to one,
+    with zero for candidates not held yet. Symbols with fewer than
+    ``MIN_OBSERVATIONS`` returns or a constant price keep their current
+    weight and are listed under ``excluded``; the rest share what remains.
+    ``turnover`` caps the sum of absolute weight changes by moving only
+    part of the way from the current weights toward the optimum.
+    ``start`` is a previous solution to warm-start the solver from; the
+    unrounded ``solution`` is returned for that purpose, since a rounded
+    one is no longer within ``TOLERANCE`` of the optimum.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown optimization method: {method}")
+
+    counts = returns.notna().sum()
+    spread = returns.std()
+    excluded: Dict[str, str] = {}
+    for symbol in current.index:
+        if counts.get(symbol, 0) < MIN_OBSERVATIONS:
+            excluded[symbol] = "insufficient history"
+        elif not spread[symbol] > 0:
+            excluded[symbol] = "constant price"
+    symbols = [s for s in current.index if s not in excluded]
+
+    budget = 1.0 - current[list(excluded)].sum()
+    if not symbols or budget <= 1e-12:
+        raise ValueError("No position has enough price history to optimize")
+    aligned = returns[symbols].dropna()
+    if len(aligned) < MIN_OBSERVATIONS:
+        raise ValueError("Positions have too few trading days in common")
+
+    mu, cov = _estimate(aligned)
+    held = current[symbols].to_numpy(dtype="float64")
+    initial = held / budget
+    if start:
+        initial = np.array([start.get(s, w) for s, w in zip(symbols, initial)])
+
+    # Weights are optimized within the budget, so the cap scales with it
+    upper = max_weight / budget
+    if method == "risk_parity":
+        solution, iterations, converged = risk_parity(cov, initial if start else None)
+        if solution.max() > upper:
+            solution = project_capped_simplex(solution, upper)
+    elif method == "min_variance":
+        solution, iterations, converged = solve_quadratic(
+            cov, np.zeros(len(symbols)), upper, initial
+        )
+    else:
+        solution, iterations, converged = solve_quadratic(
+            risk_aversion * cov, mu, upper, initial
+        )
+
+    target = budget * solution
+    traded = np.abs(target - held).sum()
+    if turnover is not None and traded > turnover:
+        target = held + (turnover / traded) * (target - held)
+        traded = turnover
+
+    def _profile(weights: np.ndarray) -> Dict:
+        sleeve = weights / weights.sum()
+        return {
+            "expected_return": round(float(mu @ sleeve), 6),
+            "volatility": round(float(np.sqrt(sleeve @ cov @ sleeve)), 6),
+        }
+
+    targets = dict(zip(symbols, target.tolist()))
+    return {
+        "method": method,
+        "as_of": aligned.index[-1].date().isoformat(),
+        "observations": len(aligned),
+        "iterations": iterations,
+        "converged": converged,
+        "turnover": round(float(traded), 6),
+        "current": _profile(held) if held.sum() > 0 else None,
+        "target": _profile(target),
+        "weights": {
+            symbol: {
+                "current": round(float(weight), 6),
+                "target": round(targets.get(symbol, float(weight)), 6),
+            }
+            for symbol, weight in current.items()
+        },
+        "excluded": excluded,
+        "solution": dict(zip(symbols, solution.tolist())),
+    }
+
+
+def _propose(
+    positions: Sequence,
+    candidates: Sequence[str],
+    closes: Dict[str, pd.Series],
+    errors: Dict[str, str],
+    options: Dict,
+    start: Optional[Dict[str, float]],
+) -> Dict:
+    """Value a portfolio at the last closes and propose trades toward its targets."""
+    quantities = {row.symbol: float(row.quantity) for row in positions}
+    symbols = list(dict.fromkeys([*quantities, *candidates]))
+    frame = pd.DataFrame({s: closes[s] for s in symbols if s in closes})
+
+    last = frame.ffill().iloc[-1] if not frame.empty else pd.Series(dtype="float64")
+    prices = last.reindex(symbols)
+    for row in positions:
+        fallback = (
+            row.current_price if row.current_price is not None else row.average_cost
+        )
+        if pd.isna(prices[row.symbol]) and fallback is not None:
+            prices[row.symbol] = float(fallback)
+    values = (
+        pd.Series(quantities, dtype="float64").reindex(symbols).fillna(0.0) * prices
+    )
+    market_value = values.sum()
+    if not market_value > 0:
+        raise ValueError("Positions have no market value")
+
+    current = values.fillna(0.0) / market_value
+    result = optimize_weights(
+        daily_returns(frame),
+        current,
+        method=options["method"],
+        max_weight=options["max_weight"],
+        turnover=options["turnover"],
+        risk_aversion=options["risk_aversion"],
+        start=start,
+    )
+    result["market_value"] = round(float(market_value), 2)
+    for symbol, weights in result["weights"].items():
+        trade = float((weights["target"] - weights["current"]) * market_value)
+        price = float(prices[symbol])
+        weights["trade_value"] = round(trade, 2)
+        weights["trade_quantity"] = round(trade / price, 4) if price > 0 else None
+    result["excluded"].update({s: errors[s] for s in symbols if s in errors})
+    return result
+
+
+class OptimizerService:
+    """Service for target weights and rebalancing proposals.
+
+    Proposals are cached under a fingerprint of the portfolio's positions
+    and the options, and each solution is kept to warm-start the next
+    optimization of the same portfolio and method.
+    """
+
+    def __init__(
+        self, db: AsyncSession, market_data: Optional[MarketDataService] = None
+    ):
+        self.db = db
+        self.market_data = market_data or get_market_data_service()
+        # Daily closes loaded by this instance, shared by its batches
+        self._closes: Dict[str, Dict[str, pd.Series]] = {}
+        self._errors: Dict[str, Dict[str, str]] = {}
+
+    @staticmethod
+    def _options(
+        method: str,
+        max_weight: Optional[float],
+        turnover: Optional[float],
+        risk_aversion: Optional[float],
+        period: Optional[str],
+    ) -> Dict:
+        if method not in METHODS:
+            raise ValueError(f"Unknown optimization method: {method}")
+        return {
+            "method": method,
+            "max_weight": max_weight or settings.OPTIMIZER_MAX_WEIGHT,
+            "turnover": turnover,
+            "risk_aversion": risk_aversion or settings.OPTIMIZER_RISK_AVERSION,
+            "period": period or settings.OPTIMIZER_LOOKBACK_PERIOD,
+        }
+
+    async def propose(
+        self,
+        portfolio_id: UUID,
+        method: str = "min_variance",
+        max_weight: Optional[float] = None,
+        turnover: Optional[float] = None,
+        risk_aversion: Optional[float] = None,
+        period: Optional[str] = None,
+        symbols: Iterable[str] = (),
+    ) -> Optional[Dict]:
+        """Propose target weights for a portfolio, or None if it does not exist.
+
+        ``symbols`` are candidates to buy that the portfolio does not hold.
+        """
+        if await self.db.get(Portfolio, portfolio_id) is None:
+            return None
+        options = self._options(method, max_weight, turnover, risk_aversion, period)
+        candidates = [s.upper() for s in dict.fromkeys(symbols)]
+        proposal = (await self.propose_many([portfolio_id], options, candidates))[
+            portfolio_id
+        ]
+        if "error" in proposal:
+            raise ValueError(proposal["error"])
+        return proposal
+
+    async def propose_all(
+        self,
+        method: str = "min_variance",
+        max_weight: Optional[float] = None,
+        turnover: Optional[float] = None,
+        risk_aversion: Optional[float] = None,
+        period: Optional[str] = None,
+    ) -> Dict:
+        """Propose target weights for every active portfolio.
+
+        Portfolios are processed ``PROPOSAL_BATCH_SIZE`` at a time; daily
+        closes of each symbol are loaded once for the whole run.
+        """
+        options = self._options(method, max_weight, turnover, risk_aversion, period)
+        stats = {"portfolios": 0, "proposed": 0, "failed": 0}
+        last_id = None
+        while True:
+            query = select(Portfolio.id).where(Portfolio.is_active.is_(True))
+            if last_id is not None:
+                query = query.where(Portfolio.id > last_id)
+            ids = list(
+                (
+                    await self.db.scalars(
+                        query.order_by(Portfolio.id).limit(PROPOSAL_BATCH_SIZE)
+                    )
+                ).all()
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            proposals = await self.propose_many(ids, options)
+            stats["portfolios"] += len(ids)
+            for portfolio_id, proposal in proposals.items():
+                if "error" in proposal:
+                    stats["failed"] += 1
+                    logger.info(
+                        "No rebalancing proposal",
+                        portfolio_id=str(portfolio_id),
+                        error=proposal["error"],
+                    )
+                else:
+                    stats["proposed"] += 1
+        logger.info("Proposed portfolio rebalances", method=options["method"], **stats)
+        return stats
+
+    async def propose_many(
+        self, portfolio_ids: List[UUID], options: Dict, candidates: Sequence[str] = ()
+    ) -> Dict[UUID, Dict]:
+        """Propose target weights for several portfolios.
+
+        Positions are read in one query, proposals still valid are served
+        from the cache, and the rest are optimized in a worker thread.
+        Portfolios that cannot be optimized get ``{"error": ...}``.
+        """
+        rows = (
+            await self.db.execute(
+                select(
+                    Position.portfolio_id,
+                    Position.symbol,
+                    Position.quantity,
+                    Position.average_cost,
+                    Position.current_price,
+                )
+                .where(Position.portfolio_id.in_(portfolio_ids), Position.quantity != 0)
+                .order_by(Position.portfolio_id, Position.symbol)
+            )
+        ).all()
+        positions: Dict[UUID, List] = {
+            portfolio_id: [] for portfolio_id in portfolio_ids
+        }
+        for row in rows:
+            positions[row.portfolio_id].append(row)
+
+        proposals: Dict[UUID, Dict] = {}
+        keys: Dict[UUID, str] = {}
+        for portfolio_id, held in positions.items():
+            if not held:
+                proposals[portfolio_id] = {"error": "Portfolio has no open positions"}
+                continue
+            fingerprint = hashlib.sha256(
+                json.dumps(
+                    [
+                        options,
+                        list(candidates),
+                        [
+                            [row.symbol, str(row.quantity), str(row.current_price)]
+                            for row in held
+                        ],
+                    ]
+                ).encode()
+            ).hexdigest()[:24]
+            keys[portfolio_id] = f"optimize:{portfolio_id}:{fingerprint}"
+
+        cached = await self.market_data.cache.get_many(list(keys.values()))
+        pending = [
+            portfolio_id for portfolio_id, key in keys.items() if key not in cached
+        ]
+        proposals.update({i: cached[keys[i]] for i in keys if i not in pending})
+        if not pending:
+            return proposals
+
+        period = options["period"]
+        symbols = {row.symbol for i in pending for row in positions[i]} | set(
+            candidates
+        )
+        await self._load(symbols, period)
+        starts = await self.market_data.cache.get_many(
+            [self._start_key(i, options["method"]) for i in pending]
+        )
+
+        def _compute() -> Dict[UUID, Dict]:
+            computed = {}
+            for portfolio_id in pending:
+                try:
+                    computed[portfolio_id] = _propose(
+                        positions[portfolio_id],
+                        candidates,
+                        self._closes[period],
+                        self._errors[period],
+                        options,
+                        starts.get(self._start_key(portfolio_id, options["method"])),
+                    )
+                except ValueError as e:
+                    computed[portfolio_id] = {"error": str(e)}
+            return computed
+
+        computed = await asyncio.to_thread(_compute)
+        solutions = {
+            i: p.pop("solution") for i, p in computed.items() if "error" not in p
+        }
+        await self.market_data.cache.set_many(
+            {keys[i]: computed[i] for i in solutions}, settings.OPTIMIZER_CACHE_TTL
+        )
+        await self.market_data.cache.set_many(
+            {self._start_key(i, options["method"]): s for i, s in solutions.items()},
+            WARM_START_TTL,
+        )
+        proposals.update(computed)
+        return proposals
+
+    async def _load(self, symbols: Iterable[str], period: str) -> None:
+        """Load daily closes of symbols not loaded yet by this service."""
+        closes = self._closes.setdefault(period, {})
+        errors = self._errors.setdefault(period, {})
+        missing = [s for s in symbols if s not in closes and s not in errors]
+        if missing:
+            frame, failed = await load_daily_closes(
+                self.market_data, sorted(missing), period
+            )
+            closes.update({s: frame[s].dropna() for s in frame})
+            errors.update(failed)
+
+    @staticmethod
+    def _start_key(portfolio_id: UUID, method: str) -> str:
+        return f"optimize:start:{portfolio_id}:{method}"
@@ -0,0 +1,277 @@
+"""Bulk order import from CSV and NDJSON broker statements."""
+
+import csv
+import hashlib
+import io
+import itertools
+import json
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import IO, Any, Dict, Iterator, List, Optional, Set
+from uuid import UUID
+
+from pydantic import ValidationError
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    MetaData,
+    Numeric,
+    String,
+    Table,
+    Text,
+    bindparam,
+    cast,
+    func,
+    select,
+)
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.schema import CreateTable
+from starlette.concurrency import run_in_threadpool
+
+from app.core.logging import logger
+from app.models.order import Order
+from app.models.portfolio import Portfolio
+from app.schemas.order import OrderCreate
+from app.services.position_ledger import PositionLedger, naive_utc
+
+
+# Rows parsed, validated and copied per round trip
+IMPORT_BATCH_SIZE = 5000
+
+# Row errors reported back; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+# Session-local staging table; COPY fills it, one INSERT moves it to orders
+_staging = Table(
+    "orders_import",
+    MetaData(),
+    Column("id", PG_UUID(as_uuid=True)),
+    Column("portfolio_id", PG_UUID(as_uuid=True)),
+    Column("symbol", String(20)),
+    Column("side", String(10)),
+    Column("quantity", Float),
+    Column("price", Float),
+    Column("fees", Float),
+    Column("order_date", DateTime),
+    Column("notes", Text),
+    Column("external_id", String(255)),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+STAGING_COLUMNS = [column.name for column in _staging.columns]
+
+
+def read_csv(stream: IO[bytes]) -> Iterator[Dict[str, Any]]:
+    """Read rows of a CSV upload with a header line; empty cells are omitted."""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    for row in reader:
+        yield {
+            key.strip(): value
+            for key, value in row.items()
+            if key and value not in (None, "")
+        }
+
+
+def read_ndjson(stream: IO[bytes]) -> Iterator[Dict[str, Any]]:
+    """Read rows of a newline-delimited JSON upload, skipping blank lines.
+
+    Lines that are not JSON objects come back as ``_error`` rows naming
+    their line in the file.
+    """
+    lines = io.TextIOWrapper(stream, encoding="utf-8-sig")
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {"_error": f"line {number}: Invalid JSON: {e.msg}"}
+            continue
+        if isinstance(row, dict):
+            yield row
+        else:
+            yield {"_error": f"line {number}: expected a JSON object"}
+
+
+def _fill_fields(order: OrderCreate) -> tuple:
+    """Get the fields that identify a fill."""
+    return (
+        order.portfolio_id,
+        order.symbol.upper(),
+        order.side,
+        order.quantity,
+        order.price,
+        order.fees,
+        order.order_date.isoformat(),
+    )
+
+
+def idempotency_key(order: OrderCreate, occurrence: int) -> str:
+    """Derive a stable key for an order that came without ``external_id``.
+
+    ``occurrence`` numbers identical rows within one upload, so genuine
+    repeated fills are kept while re-uploading a statement is a no-op.
+    """
+    content = "|".join(str(value) for value in (*_fill_fields(order), occurrence))
+    return "auto:" + hashlib.sha256(content.encode()).hexdigest()[:40]
+
+
+def _insert_staged():
+    """Build the statement moving staged rows into orders, skipping known keys."""
+    columns = [c for c in STAGING_COLUMNS if c not in ("quantity", "price", "fees")]
+    quantity = cast(_staging.c.quantity, Numeric(15, 4))
+    price = cast(_staging.c.price, Numeric(15, 4))
+    return (
+        insert(Order)
+        .from_select(
+            [*columns, "quantity", "price", "fees", "total_value", "created_at"],
+            select(
+                *(_staging.c[c] for c in columns),
+                quantity,
+                price,
+                _staging.c.fees,
+                func.round(quantity * price, 2),
+                bindparam("now", datetime.utcnow(), type_=DateTime),
+            ),
+        )
+        .on_conflict_do_nothing(
+            index_elements=["portfolio_id", "external_id"],
+            index_where=Order.external_id.isnot(None),
+        )
+        .returning(Order.portfolio_id, Order.symbol)
+    )
+
+
+class OrderImporter:
+    """Imports large order files in one transaction."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def import_orders(
+        self, rows: Iterator[Dict[str, Any]], portfolio_id: Optional[UUID] = None
+    ) -> Dict:
+        """Validate, stage and insert orders, then rebuild affected positions.
+
+        ``rows`` is consumed in batches off the event loop. Each batch is
+        validated against ``OrderCreate`` and copied into a staging table;
+        orders whose ``(portfolio_id, external_id)`` already exists are
+        skipped. Invalid rows are reported and do not stop the import.
+        ``portfolio_id`` fills in rows that do not name a portfolio.
+        """
+        stats: Dict[str, int] = {
+            "received": 0,
+            "inserted": 0,
+            "duplicates": 0,
+            "invalid": 0,
+        }
+        errors: List[Dict[str, Any]] = []
+        occurrences: Counter = Counter()
+        portfolios: Dict[UUID, bool] = {}
+
+        await self.db.execute(CreateTable(_staging))
+        raw = await (await self.db.connection()).get_raw_connection()
+        # asyncpg connection, for COPY
+        connection = raw.driver_connection
+        assert connection is not None
+
+        staged = 0
+        while True:
+            batch = await run_in_threadpool(
+                lambda: list(itertools.islice(rows, IMPORT_BATCH_SIZE))
+            )
+            if not batch:
+                break
+
+            valid = []
+            for row in batch:
+                stats["received"] += 1
+                line = stats["received"]
+                if "_error" in row:
+                    self._reject(stats, errors, line, row["_error"])
+                    continue
+                if portfolio_id and not row.get("portfolio_id"):
+                    row["portfolio_id"] = portfolio_id
+                try:
+                    valid.append((line, OrderCreate.model_validate(row)))
+                except ValidationError as e:
+                    error = e.errors()[0]
+                    field = ".".join(str(part) for part in error["loc"])
+                    self._reject(stats, errors, line, f"{field}: {error['msg']}")
+
+            unknown = {order.portfolio_id for _, order in valid} - portfolios.keys()
+            if unknown:
+                found = set(
+                    (
+                        await self.db.scalars(
+                            select(Portfolio.id).where(Portfolio.id.in_(unknown))
+                        )
+                    ).all()
+                )
+                portfolios.update({i: i in found for i in unknown})
+
+            records = []
+            for line, order in valid:
+                if not portfolios[order.portfolio_id]:
+                    self._reject(
+                        stats,
+                        errors,
+                        line,
+                        f"Portfolio not found: {order.portfolio_id}",
+                    )
+                    continue
+                external_id = order.external_id
+                if not external_id:
+                    fields = _fill_fields(order)
+                    occurrences[fields] += 1
+                    external_id = idempotency_key(order, occurrences[fields])
+                records.append(
+                    (
+                        uuid.uuid4(),
+                        order.portfolio_id,
+                        order.symbol.upper(),
+                        order.side,
+                        order.quantity,
+                        order.price,
+                        order.fees,
+                        naive_utc(order.order_date),
+                        order.notes,
+                        external_id,
+                    )
+                )
+            if records:
+                await connection.copy_records_to_table(
+                    _staging.name, records=records, columns=STAGING_COLUMNS
+                )
+                staged += len(records)
+
+        keys: Set = set()
+        if staged:
+            inserted = (await self.db.execute(_insert_staged())).all()
+            stats["inserted"] = len(inserted)
+            stats["duplicates"] = staged - len(inserted)
+            keys = {(row.portfolio_id, row.symbol) for row in inserted}
+
+        stats["positions"] = await PositionLedger(self.db).rebuild(keys=keys)
+        await self.db.commit()
+
+        logger.info(
+            "Imported orders",
+            received=stats["received"],
+            inserted=stats["inserted"],
+            duplicates=stats["duplicates"],
+            invalid=stats["invalid"],
+        )
+        return {**stats, "errors": errors}
+
+    @staticmethod
+    def _reject(
+        stats: Dict[str, int], errors: List[Dict[str, Any]], line: int, error: str
+    ) -> None:
+        stats["invalid"] += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"row": line, "error": error})
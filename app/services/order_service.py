@@ -0,0 +1,71 @@
+"""Order management service."""
+
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.order import Order
+from app.models.portfolio import Portfolio
+from app.schemas.order import OrderCreate
+from app.services.pagination import DEFAULT_PAGE_SIZE, Page, paginate
+from app.services.position_ledger import PositionLedger
+
+
+class OrderService:
+    """Service for order management."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_order(self, order_id: UUID) -> Optional[Order]:
+        """Get order by ID."""
+        return await self.db.get(Order, order_id)
+
+    async def create_order(self, order_data: OrderCreate) -> Order:
+        """Record an order and update its position."""
+        return (await self.create_orders([order_data]))[0]
+
+    async def create_orders(self, orders: List[OrderCreate]) -> List[Order]:
+        """Record many orders at once, updating each position incrementally."""
+        return await PositionLedger(self.db).record(orders)
+
+    async def list_orders_page(
+        self,
+        portfolio_id: Optional[UUID] = None,
+        user_id: Optional[UUID] = None,
+        symbol: Optional[str] = None,
+        side: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Page:
+        """List one page of orders, newest first.
+
+        The date range applies to ``order_date``; ``user_id`` matches orders
+        of any portfolio owned by that user.
+        """
+        criteria = []
+        if portfolio_id:
+            criteria.append(Order.portfolio_id == portfolio_id)
+        if user_id:
+            criteria.append(
+                Order.portfolio_id.in_(
+                    select(Portfolio.id).where(Portfolio.user_id == user_id)
+                )
+            )
+        if symbol:
+            criteria.append(Order.symbol == symbol.upper())
+        if side:
+            criteria.append(Order.side == side)
+        if start_date:
+            criteria.append(Order.order_date >= start_date)
+        if end_date:
+            criteria.append(Order.order_date < end_date)
+        return await paginate(
+            self.db, Order, *criteria, limit=limit, cursor=cursor, fields=fields
+        )
@@ -0,0 +1,119 @@
+"""Keyset pagination for list endpoints."""
+
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, List, Optional, Tuple, Type
+from uuid import UUID
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Response header carrying the cursor of the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Columns every paginated model orders by, newest first
+KEYSET_FIELDS = ("created_at", "id")
+
+
+@dataclass
+class Page:
+    """One page of a list: ORM objects, or dicts when fields were projected."""
+
+    items: List[Any]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(created_at: datetime, id: UUID) -> str:
+    """Encode the keyset position after a row as an opaque cursor."""
+    raw = f"{created_at.isoformat()}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Decode a cursor from ``encode_cursor``, raising ValueError if invalid."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[List[str]]:
+    """Parse a comma-separated field projection against a response schema."""
+    if not fields:
+        return None
+    selected = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in selected if f not in schema.model_fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return selected or None
+
+
+async def paginate(
+    db: AsyncSession,
+    model: Any,
+    *criteria: Any,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> Page:
+    """Get one page of ``model`` rows matching ``criteria``, newest first.
+
+    Pages are keyed on ``(created_at, id)`` rather than offsets, so each
+    page is an index range scan however deep it is. With ``fields`` only
+    those columns are selected and items are plain dicts.
+    """
+    keyset = [getattr(model, name) for name in KEYSET_FIELDS]
+    if fields:
+        extra = [name for name in KEYSET_FIELDS if name not in fields]
+        query = select(*(getattr(model, name) for name in [*fields, *extra]))
+    else:
+        query = select(model)
+
+    query = query.where(*criteria)
+    if cursor:
+        query = query.where(tuple_(*keyset) < decode_cursor(cursor))
+    query = query.order_by(*(column.desc() for column in keyset)).limit(limit + 1)
+
+    if fields:
+        rows = (await db.execute(query)).mappings().all()
+    else:
+        rows = (await db.scalars(query)).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        if fields:
+            next_cursor = encode_cursor(last["created_at"], last["id"])
+        else:
+            next_cursor = encode_cursor(last.created_at, last.id)
+
+    items: List[Any] = (
+        [{name: row[name] for name in fields} for row in rows] if fields else list(rows)
+    )
+    return Page(items=items, next_cursor=next_cursor)
+
+
+def page_response(page: Page, response: Response) -> Any:
+    """Return a page from an endpoint, with the next cursor as a header.
+
+    Projected pages bypass the endpoint's ``response_model`` so that only
+    the selected fields are serialized.
+    """
+    headers = {NEXT_CURSOR_HEADER: page.next_cursor} if page.next_cursor else {}
+    if page.items and isinstance(page.items[0], dict):
+        return JSONResponse(jsonable_encoder(page.items), headers=headers)
+    response.headers.update(headers)
+    return page.items
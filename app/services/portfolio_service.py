@@ -1,38 +1,71 @@
 """Portfolio management service."""
 
-from typing import List, Optional
-from uuid import UUID
-from sqlalchemy.orm import Session
+from datetime import datetime
 from decimal import Decimal
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.portfolio import Portfolio
 from app.models.position import Position
 from app.schemas.portfolio import PortfolioCreate, PortfolioUpdate
+from app.services.pagination import DEFAULT_PAGE_SIZE, Page, paginate
 
 
 class PortfolioService:
     """Service for portfolio management."""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
     async def list_portfolios(self, user_id: Optional[UUID] = None) -> List[Portfolio]:
         """List all portfolios, optionally filtered by user."""
-        query = self.db.query(Portfolio)
+        query = select(Portfolio)
         if user_id:
-            query = query.filter(Portfolio.user_id == user_id)
-        return query.all()
+            query = query.where(Portfolio.user_id == user_id)
+        result = await self.db.scalars(query)
+        return list(result.all())
+
+    async def list_portfolio_ids(self, user_id: UUID) -> List[UUID]:
+        """List the IDs of a user's portfolios."""
+        result = await self.db.scalars(
+            select(Portfolio.id).where(Portfolio.user_id == user_id)
+        )
+        return list(result.all())
+
+    async def list_portfolios_page(
+        self,
+        user_id: Optional[UUID] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Page:
+        """List one page of portfolios, newest first."""
+        criteria = []
+        if user_id:
+            criteria.append(Portfolio.user_id == user_id)
+        if start_date:
+            criteria.append(Portfolio.created_at >= start_date)
+        if end_date:
+            criteria.append(Portfolio.created_at < end_date)
+        return await paginate(
+            self.db, Portfolio, *criteria, limit=limit, cursor=cursor, fields=fields
+        )
 
     async def get_portfolio(self, portfolio_id: UUID) -> Optional[Portfolio]:
         """Get portfolio by ID."""
-        return self.db.query(Portfolio).filter(Portfolio.id == portfolio_id).first()
+        return await self.db.get(Portfolio, portfolio_id)
 
     async def create_portfolio(self, portfolio_data: PortfolioCreate) -> Portfolio:
         """Create a new portfolio."""
         portfolio = Portfolio(**portfolio_data.model_dump())
         self.db.add(portfolio)
-        self.db.commit()
-        self.db.refresh(portfolio)
+        await self.db.commit()
+        await self.db.refresh(portfolio)
         return portfolio
 
     async def update_portfolio(
@@ -47,8 +80,8 @@ class PortfolioService:
         for field, value in update_data.items():
             setattr(portfolio, field, value)
 
-        self.db.commit()
-        self.db.refresh(portfolio)
+        await self.db.commit()
+        await self.db.refresh(portfolio)
         return portfolio
 
     async def delete_portfolio(self, portfolio_id: UUID) -> bool:
@@ -57,45 +90,56 @@ class PortfolioService:
         if not portfolio:
             return False
 
-        self.db.delete(portfolio)
-        self.db.commit()
+        await self.db.delete(portfolio)
+        await self.db.commit()
         return True
 
     async def calculate_performance(self, portfolio_id: UUID) -> dict:
         """Calculate portfolio performance metrics."""
-        portfolio = await self.get_portfolio(portfolio_id)
-        if not portfolio:
+        performance = await self.calculate_performance_many([portfolio_id])
+        return performance.get(portfolio_id, {})
+
+    async def calculate_performance_many(
+        self, portfolio_ids: List[UUID]
+    ) -> Dict[UUID, dict]:
+        """Calculate performance metrics for many portfolios in one query.
+
+        Position totals are summed by the database; portfolios that do not
+        exist are left out of the result.
+        """
+        if not portfolio_ids:
             return {}
 
-        positions = (
-            self.db.query(Position)
-            .filter(Position.portfolio_id == portfolio_id)
-            .all()
+        query = (
+            select(
+                Portfolio.id,
+                func.coalesce(func.sum(Position.market_value), 0),
+                func.coalesce(func.sum(Position.average_cost * Position.quantity), 0),
+                func.coalesce(func.sum(Position.unrealized_pnl), 0),
+                func.count(Position.id),
+            )
+            .outerjoin(Position, Position.portfolio_id == Portfolio.id)
+            .where(Portfolio.id.in_(portfolio_ids))
+            .group_by(Portfolio.id)
         )
-
-        total_value = Decimal("0")
-        total_cost = Decimal("0")
-        total_pnl = Decimal("0")
-
-        for position in positions:
-            if position.market_value:
-                total_value += Decimal(str(position.market_value))
-            if position.average_cost and position.quantity:
-                total_cost += Decimal(str(position.average_cost)) * Decimal(
-                    str(position.quantity)
-                )
-            if position.unrealized_pnl:
-                total_pnl += Decimal(str(position.unrealized_pnl))
-
-        total_return_pct = (
-            (total_pnl / total_cost * 100) if total_cost > 0 else Decimal("0")
-        )
-
-        return {
-            "portfolio_id": str(portfolio_id),
-            "total_value": float(total_value),
-            "total_cost": float(total_cost),
-            "total_pnl": float(total_pnl),
-            "total_return_percent": float(total_return_pct),
-            "num_positions": len(positions),
-        }
+        rows = (await self.db.execute(query)).all()
+
+        performance = {}
+        for portfolio_id, total_value, total_cost, total_pnl, num_positions in rows:
+            total_value, total_cost, total_pnl = (
+                Decimal(total_value),
+                Decimal(total_cost),
+                Decimal(total_pnl),
+            )
+            total_return_pct = (
+                (total_pnl / total_cost * 100) if total_cost > 0 else Decimal("0")
+            )
+            performance[portfolio_id] = {
+                "portfolio_id": str(portfolio_id),
+                "total_value": float(total_value),
+                "total_cost": float(total_cost),
+                "total_pnl": float(total_pnl),
+                "total_return_percent": float(total_return_pct),
+                "num_positions": num_positions,
+            }
+        return performance
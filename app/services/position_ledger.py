@@ -0,0 +1,429 @@
+"""Position ledger maintained from order fills."""
+
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import DateTime, Float, String, bindparam, func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logging import logger
+from app.models.order import Order
+from app.models.portfolio import Portfolio
+from app.models.position import Position
+from app.schemas.order import OrderCreate
+
+
+# Orders store quantities with 4 decimals; replays count in these units so
+# that running totals, and flat positions in particular, are exact
+QUANTITY_SCALE = 10_000
+
+# Positions written per upsert statement during a rebuild
+WRITE_BATCH_SIZE = 5000
+
+LEDGER_COLUMNS = ["portfolio_id", "symbol", "quantity", "average_cost", "realized_pnl"]
+
+PositionKey = Tuple[UUID, str]
+
+_CENT = Decimal("0.01")
+_PRICE = Decimal("0.0001")
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Convert an aware datetime to naive UTC, as stored in the database."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def apply_fill(
+    quantity: Decimal,
+    average_cost: Optional[Decimal],
+    realized_pnl: Decimal,
+    side: str,
+    fill_quantity: Decimal,
+    price: Decimal,
+    fees: Decimal = Decimal("0"),
+) -> Tuple[Decimal, Optional[Decimal], Decimal]:
+    """Apply one fill to a long position using the average cost method.
+
+    Buy fees are added to the cost basis, sell fees are deducted from the
+    realized P&L. The average cost is None while the position is flat.
+    """
+    if side == "buy":
+        held = quantity + fill_quantity
+        cost = quantity * (average_cost or 0) + fill_quantity * price + fees
+        return held, (cost / held).quantize(_PRICE), realized_pnl
+
+    if fill_quantity > quantity:
+        raise ValueError(f"Cannot sell {fill_quantity}, only {quantity} held")
+    held = quantity - fill_quantity
+    realized = fill_quantity * (price - (average_cost or 0)) - fees
+    return (
+        held,
+        (average_cost if held else None),
+        (realized_pnl + realized).quantize(_CENT),
+    )
+
+
+def replay_orders(orders: pd.DataFrame) -> pd.DataFrame:
+    """Compute positions from an order history with vectorized group-bys.
+
+    ``orders`` has ``portfolio_id, symbol, side, quantity, price, fees``
+    and is sorted in fill order within each position. The cost basis obeys
+    ``B[t] = r[t] * B[t-1] + c[t]``, where buys add their cost ``c`` and
+    sells keep the fraction ``r`` of the units still held. Between two
+    flat points ``r`` is never zero, so ``B`` is ``R * cumsum(c / R)`` with
+    ``R`` the running product of ``r``. The result has one row per
+    position, as in ``LEDGER_COLUMNS``, matching repeated ``apply_fill``.
+    """
+    if orders.empty:
+        return pd.DataFrame(columns=LEDGER_COLUMNS)
+
+    position = (
+        orders.groupby(["portfolio_id", "symbol"], sort=False).ngroup().to_numpy()
+    )
+    buy = orders["side"].to_numpy() == "buy"
+    quantity = orders["quantity"].to_numpy(dtype="float64")
+    price = orders["price"].to_numpy(dtype="float64")
+    fees = orders["fees"].fillna(0).to_numpy(dtype="float64")
+
+    units = np.rint(quantity * QUANTITY_SCALE).astype(np.int64)
+    held = pd.Series(np.where(buy, units, -units)).groupby(position).cumsum().to_numpy()
+    if (held < 0).any():
+        bad = orders.loc[held < 0, ["portfolio_id", "symbol"]].drop_duplicates()
+        raise ValueError(
+            "Orders sell more than held for "
+            + ", ".join(f"{row.portfolio_id}/{row.symbol}" for row in bad.itertuples())
+        )
+    before = np.where(buy, held - units, held + units)
+
+    # A fill that closes the position starts a new segment from the next fill
+    flat = held == 0
+    segment = pd.Series(flat).groupby(position).cumsum().to_numpy() - flat
+    keys = [position, segment]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        kept = np.where(buy | flat, 1.0, held / before)
+    retained = pd.Series(kept).groupby(keys).cumprod().to_numpy()
+    cost = np.where(buy, quantity * price + fees, 0.0)
+    basis = retained * pd.Series(cost / retained).groupby(keys).cumsum().to_numpy()
+    basis[flat] = 0.0
+
+    previous_basis = pd.Series(basis).groupby(position).shift(1).fillna(0).to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cost_per_unit = np.where(
+            before > 0, previous_basis / before * QUANTITY_SCALE, 0.0
+        )
+        average_cost = np.where(held > 0, basis / held * QUANTITY_SCALE, np.nan)
+    realized = np.where(buy, 0.0, quantity * (price - cost_per_unit) - fees)
+
+    ledger = pd.DataFrame(
+        {
+            "portfolio_id": orders["portfolio_id"].to_numpy(),
+            "symbol": orders["symbol"].to_numpy(),
+            "quantity": held / QUANTITY_SCALE,
+            "average_cost": average_cost,
+            "realized_pnl": realized,
+            "position": position,
+        }
+    )
+    totals = ledger.groupby("position", sort=False).agg(
+        portfolio_id=("portfolio_id", "last"),
+        symbol=("symbol", "last"),
+        quantity=("quantity", "last"),
+        average_cost=("average_cost", "last"),
+        realized_pnl=("realized_pnl", "sum"),
+    )
+    totals["average_cost"] = totals["average_cost"].round(4)
+    totals["realized_pnl"] = totals["realized_pnl"].round(2)
+    return totals.reset_index(drop=True)[LEDGER_COLUMNS]
+
+
+# Typed Any: the declarative models expose their columns as Column[...] to
+# mypy, not as the values read and assigned here
+def _mark(position: Any) -> None:
+    """Refresh the market value and unrealized P&L of a ``Position``."""
+    if position.current_price is None:
+        return
+    price = Decimal(position.current_price)
+    quantity = Decimal(position.quantity)
+    cost_basis = quantity * Decimal(position.average_cost or 0)
+    pnl = quantity * price - cost_basis
+    position.market_value = (quantity * price).quantize(_CENT)
+    position.unrealized_pnl = pnl.quantize(_CENT)
+    position.unrealized_pnl_percent = (
+        (pnl / cost_basis * 100).quantize(_PRICE) if cost_basis > 0 else None
+    )
+
+
+class PositionLedger:
+    """Keeps positions in step with the orders recorded against them."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def record(self, orders: List[OrderCreate]) -> List[Order]:
+        """Record fills and update their positions, committing once.
+
+        Each fill updates its position in constant time. A fill dated
+        before the latest order already applied to its position cannot be
+        applied incrementally; those positions are rebuilt from their full
+        order history instead. Aware order dates are stored as naive UTC.
+        """
+        if not orders:
+            return []
+        fills = sorted(
+            (
+                order.model_copy(update={"order_date": naive_utc(order.order_date)})
+                for order in orders
+            ),
+            key=lambda order: order.order_date,
+        )
+        keys = sorted({(order.portfolio_id, order.symbol.upper()) for order in fills})
+
+        portfolio_ids = {portfolio_id for portfolio_id, _ in keys}
+        found = set(
+            (
+                await self.db.scalars(
+                    select(Portfolio.id).where(Portfolio.id.in_(portfolio_ids))
+                )
+            ).all()
+        )
+        if portfolio_ids - found:
+            raise ValueError(
+                "Portfolio not found: "
+                + ", ".join(str(i) for i in portfolio_ids - found)
+            )
+
+        positions = await self._lock_positions(keys)
+        applied = await self.db.execute(
+            select(Order.position_id, func.max(Order.order_date))
+            .where(Order.position_id.in_([p.id for p in positions.values()]))
+            .group_by(Order.position_id)
+        )
+        latest: Dict[UUID, datetime] = {
+            position_id: last for position_id, last in applied.all()
+        }
+
+        stale: Set[PositionKey] = set()
+        recorded = []
+        for fill in fills:
+            key = (fill.portfolio_id, fill.symbol.upper())
+            position = positions[key]
+            last = latest.get(position.id)
+            if key in stale or (last is not None and fill.order_date < last):
+                stale.add(key)
+            else:
+                position.quantity, position.average_cost, position.realized_pnl = (
+                    apply_fill(
+                        Decimal(position.quantity),
+                        (
+                            None
+                            if position.average_cost is None
+                            else Decimal(position.average_cost)
+                        ),
+                        Decimal(position.realized_pnl or 0),
+                        fill.side,
+                        Decimal(str(fill.quantity)),
+                        Decimal(str(fill.price)),
+                        Decimal(str(fill.fees)),
+                    )
+                )
+                latest[position.id] = fill.order_date
+            order = Order(
+                **fill.model_dump(exclude={"symbol"}),
+                symbol=key[1],
+                total_value=round(fill.quantity * fill.price, 2),
+                position_id=position.id,
+            )
+            self.db.add(order)
+            recorded.append(order)
+
+        for key, position in positions.items():
+            if key not in stale:
+                _mark(position)
+        await self.db.flush()
+        if stale:
+            await self.rebuild(keys=stale)
+        await self.db.commit()
+        return recorded
+
+    async def _lock_positions(self, keys: List[PositionKey]) -> dict:
+        """Get the positions for ``keys`` locked for update, creating missing ones."""
+        now = datetime.utcnow()
+        await self.db.execute(
+            insert(Position)
+            .values(
+                [
+                    {
+                        "id": uuid.uuid4(),
+                        "portfolio_id": portfolio_id,
+                        "symbol": symbol,
+                        "quantity": 0,
+                        "realized_pnl": 0,
+                        "created_at": now,
+                        "last_updated": now,
+                    }
+                    for portfolio_id, symbol in keys
+                ]
+            )
+            .on_conflict_do_nothing(index_elements=["portfolio_id", "symbol"])
+        )
+        # Lock in key order so concurrent imports cannot deadlock
+        positions = await self.db.scalars(
+            select(Position)
+            .where(tuple_(Position.portfolio_id, Position.symbol).in_(keys))
+            .order_by(Position.portfolio_id, Position.symbol)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        return {(p.portfolio_id, p.symbol): p for p in positions}
+
+    async def rebuild(
+        self,
+        portfolio_id: Optional[UUID] = None,
+        keys: Optional[Iterable[PositionKey]] = None,
+        commit: bool = False,
+    ) -> int:
+        """Recompute positions from their order history.
+
+        Covers every position, those of one portfolio, or the given
+        ``(portfolio_id, symbol)`` keys. Orders are loaded as columns and
+        replayed with ``replay_orders``; positions are then upserted in
+        batches and orders are linked to them.
+        """
+        criteria = []
+        if portfolio_id:
+            criteria.append(Order.portfolio_id == portfolio_id)
+        if keys is not None:
+            keys = list(keys)
+            if not keys:
+                return 0
+            criteria.append(tuple_(Order.portfolio_id, Order.symbol).in_(keys))
+
+        rows = (
+            await self.db.execute(
+                select(
+                    Order.portfolio_id,
+                    Order.symbol,
+                    Order.side,
+                    Order.quantity,
+                    Order.price,
+                    Order.fees,
+                )
+                .where(*criteria)
+                .order_by(
+                    Order.portfolio_id,
+                    Order.symbol,
+                    Order.order_date,
+                    Order.created_at,
+                    Order.id,
+                )
+            )
+        ).all()
+        orders = pd.DataFrame.from_records(
+            rows,
+            columns=["portfolio_id", "symbol", "side", "quantity", "price", "fees"],
+        )
+        ledger = replay_orders(orders)
+
+        for start in range(0, len(ledger), WRITE_BATCH_SIZE):
+            await self._write_batch(ledger.iloc[start : start + WRITE_BATCH_SIZE])
+        await self.db.execute(
+            update(Order)
+            .where(
+                Position.portfolio_id == Order.portfolio_id,
+                Position.symbol == Order.symbol,
+                Order.position_id.is_distinct_from(Position.id),
+                *criteria,
+            )
+            .values(position_id=Position.id)
+            .execution_options(synchronize_session=False)
+        )
+        if commit:
+            await self.db.commit()
+
+        logger.info("Rebuilt positions", orders=len(orders), positions=len(ledger))
+        return len(ledger)
+
+    async def _write_batch(self, ledger: pd.DataFrame) -> None:
+        """Upsert one batch of rebuilt positions.
+
+        Columns are sent as array parameters and unnested into rows, as in
+        the revaluation job; market values follow the new quantities.
+        """
+        rebuilt = (
+            func.unnest(
+                bindparam("portfolio_ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+                bindparam("symbols", type_=ARRAY(String)),
+                bindparam("quantities", type_=ARRAY(Float)),
+                bindparam("average_costs", type_=ARRAY(Float)),
+                bindparam("realized_pnls", type_=ARRAY(Float)),
+            )
+            .table_valued(
+                "portfolio_id", "symbol", "quantity", "average_cost", "realized_pnl"
+            )
+            .render_derived(name="rebuilt")
+        )
+        now = datetime.utcnow()
+        stamp = bindparam("now", now, type_=DateTime)
+        # A Core insert on the table: with array parameters, an insert on
+        # the entity would take the ORM bulk insert path
+        positions = Position.__table__
+        statement = insert(positions).from_select(
+            [
+                "id",
+                "portfolio_id",
+                "symbol",
+                "quantity",
+                "average_cost",
+                "realized_pnl",
+                "created_at",
+                "last_updated",
+            ],
+            select(
+                func.gen_random_uuid(),
+                rebuilt.c.portfolio_id,
+                rebuilt.c.symbol,
+                rebuilt.c.quantity,
+                rebuilt.c.average_cost,
+                rebuilt.c.realized_pnl,
+                stamp,
+                stamp,
+            ),
+        )
+        excluded = statement.excluded
+        cost_basis = excluded.quantity * excluded.average_cost
+        pnl = excluded.quantity * positions.c.current_price - cost_basis
+        statement = statement.on_conflict_do_update(
+            index_elements=["portfolio_id", "symbol"],
+            set_={
+                "quantity": excluded.quantity,
+                "average_cost": excluded.average_cost,
+                "realized_pnl": excluded.realized_pnl,
+                "market_value": excluded.quantity * positions.c.current_price,
+                "unrealized_pnl": pnl,
+                "unrealized_pnl_percent": pnl / func.nullif(cost_basis, 0) * 100,
+                "last_updated": now,
+            },
+        )
+        await self.db.execute(
+            statement,
+            {
+                "portfolio_ids": ledger["portfolio_id"].tolist(),
+                "symbols": ledger["symbol"].tolist(),
+                "quantities": ledger["quantity"].tolist(),
+                "average_costs": [
+                    None if np.isnan(v) else v for v in ledger["average_cost"].tolist()
+                ],
+                "realized_pnls": ledger["realized_pnl"].tolist(),
+            },
+        )
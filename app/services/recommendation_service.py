@@ -0,0 +1,397 @@
+"""Recommendation service."""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional
+from uuid import UUID
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.integrations.ai_client import AIClient, get_ai_client
+from app.models.portfolio import Portfolio
+from app.models.position import Position
+from app.models.recommendation import Recommendation
+from app.schemas.recommendation import RecommendationDraft
+from app.services.market_data_service import (
+    MarketDataService,
+    get_market_data_service,
+)
+from app.services.pagination import DEFAULT_PAGE_SIZE, Page, paginate
+from app.services.technical_analysis_service import (
+    TechnicalAnalysisService,
+    get_technical_analysis_service,
+)
+
+
+# Recommendation content copied when an active one is reused
+COPIED_COLUMNS = [
+    "symbol",
+    "action",
+    "confidence_score",
+    "reasoning",
+    "target_price",
+    "stop_loss",
+    "time_horizon",
+    "expires_at",
+]
+
+
+def recommendation_draft(response: Dict) -> RecommendationDraft:
+    """Validate a parsed AI response, tolerating case and blank fields."""
+    fields = {
+        key: (
+            value.strip().lower()
+            if key in ("action", "time_horizon") and isinstance(value, str)
+            else value
+        )
+        for key, value in response.items()
+        if value not in (None, "")
+    }
+    return RecommendationDraft.model_validate(fields)
+
+
+class RecommendationService:
+    """Service for stored AI recommendations."""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        ai_client: Optional[AIClient] = None,
+        market_data: Optional[MarketDataService] = None,
+        technical: Optional[TechnicalAnalysisService] = None,
+    ):
+        self.db = db
+        self._ai_client = ai_client
+        self.market_data = market_data or get_market_data_service()
+        self.technical = technical or get_technical_analysis_service()
+
+    @property
+    def ai_client(self) -> AIClient:
+        # Created on first use, so listing does not need API keys configured
+        if self._ai_client is None:
+            self._ai_client = get_ai_client()
+        return self._ai_client
+
+    async def list_recommendations_page(
+        self,
+        portfolio_id: Optional[UUID] = None,
+        user_id: Optional[UUID] = None,
+        symbol: Optional[str] = None,
+        status: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Page:
+        """List one page of recommendations, newest first."""
+        criteria = []
+        if portfolio_id:
+            criteria.append(Recommendation.portfolio_id == portfolio_id)
+        if user_id:
+            criteria.append(
+                Recommendation.portfolio_id.in_(
+                    select(Portfolio.id).where(Portfolio.user_id == user_id)
+                )
+            )
+        if symbol:
+            criteria.append(Recommendation.symbol == symbol.upper())
+        if status:
+            criteria.append(Recommendation.status == status)
+        if start_date:
+            criteria.append(Recommendation.created_at >= start_date)
+        if end_date:
+            criteria.append(Recommendation.created_at < end_date)
+        return await paginate(
+            self.db,
+            Recommendation,
+            *criteria,
+            limit=limit,
+            cursor=cursor,
+            fields=fields,
+        )
+
+    async def generate_for_portfolio(
+        self, portfolio_id: UUID, provider: str = "openai", reuse: bool = False
+    ) -> Optional[Dict]:
+        """Generate a recommendation for every open position of a portfolio.
+
+        Market data for all positions is loaded concurrently, then the
+        symbols are sent to the model ``AI_BATCH_SIZE`` per request, at most
+        ``AI_MAX_CONCURRENCY`` requests at a time. Parsed results are
+        inserted in one statement. Symbols whose data or AI response fails
+        are reported under ``failed`` and do not stop the others. Returns
+        None if the portfolio does not exist.
+
+        With ``reuse``, symbols that already have an active, unexpired
+        recommendation (from any portfolio and provider) get a copy of the
+        newest one instead of a model call; the portfolio's own ones are
+        returned as they are.
+        """
+        if await self.db.get(Portfolio, portfolio_id) is None:
+            return None
+        if not self.ai_client.is_available(provider):
+            raise ValueError(f"AI provider {provider} not available or not configured")
+        symbols = list(
+            (
+                await self.db.scalars(
+                    select(Position.symbol)
+                    .where(
+                        Position.portfolio_id == portfolio_id, Position.quantity != 0
+                    )
+                    .order_by(Position.symbol)
+                )
+            ).all()
+        )
+        if not symbols:
+            raise ValueError("Portfolio has no open positions")
+
+        now = datetime.utcnow()
+        recommendations: List[Recommendation] = []
+        rows = []
+        if reuse:
+            for active in await self._active_recommendations(symbols, now):
+                if active.portfolio_id == portfolio_id:
+                    recommendations.append(active)
+                else:
+                    rows.append(
+                        {
+                            **{
+                                column: getattr(active, column)
+                                for column in COPIED_COLUMNS
+                            },
+                            "portfolio_id": portfolio_id,
+                            "status": "active",
+                            "created_at": now,
+                        }
+                    )
+            reused = {r.symbol for r in recommendations} | {
+                row["symbol"] for row in rows
+            }
+            symbols = [s for s in symbols if s not in reused]
+
+        analysis = await self.load_analysis_data(symbols) if symbols else {}
+        failed = {s: "No market data" for s in symbols if not analysis.get(s)}
+        ready = [s for s in symbols if s not in failed]
+
+        responses = await self._generate(ready, analysis, provider)
+
+        lifetime = timedelta(hours=settings.RECOMMENDATION_EXPIRY_HOURS)
+        for symbol in ready:
+            response = responses[symbol]
+            if isinstance(response, BaseException):
+                failed[symbol] = str(response) or type(response).__name__
+                continue
+            try:
+                draft = recommendation_draft(response)
+            except ValidationError as e:
+                error = e.errors()[0]
+                failed[symbol] = (
+                    f"Invalid AI response: {error['loc'][0]}: {error['msg']}"
+                )
+                continue
+            # Cached answers expire with the cache entry they came from
+            generated_at = response.get("generated_at")
+            generated_at = datetime.fromisoformat(generated_at) if generated_at else now
+            rows.append(
+                {
+                    **draft.model_dump(),
+                    "portfolio_id": portfolio_id,
+                    "symbol": symbol,
+                    "status": "active",
+                    "created_at": now,
+                    "expires_at": generated_at + lifetime,
+                }
+            )
+
+        if rows:
+            recommendations.extend(
+                (
+                    await self.db.scalars(
+                        insert(Recommendation).returning(Recommendation), rows
+                    )
+                ).all()
+            )
+            await self.db.commit()
+
+        logger.info(
+            "Generated recommendations",
+            portfolio_id=str(portfolio_id),
+            provider=provider,
+            generated=len(recommendations),
+            failed=len(failed),
+        )
+        return {
+            "portfolio_id": portfolio_id,
+            "recommendations": sorted(recommendations, key=lambda r: r.symbol),
+            "failed": failed,
+        }
+
+    async def stream_recommendation(
+        self,
+        symbol: str,
+        portfolio_id: Optional[UUID] = None,
+        provider: str = "openai",
+    ) -> Optional[AsyncIterator[Dict]]:
+        """Get the events of generating one recommendation as it is written.
+
+        The portfolio and provider are checked up front; the returned
+        iterator then yields a ``start`` event at once, a ``token`` event
+        per piece of the model's answer, and finally the stored
+        ``recommendation``, or an ``error``. Returns None if the portfolio
+        does not exist.
+        """
+        symbol = symbol.strip().upper()
+        if not symbol:
+            raise ValueError("Symbol is required")
+        if (
+            portfolio_id is not None
+            and await self.db.get(Portfolio, portfolio_id) is None
+        ):
+            return None
+        if not self.ai_client.is_available(provider):
+            raise ValueError(f"AI provider {provider} not available or not configured")
+        return self._stream(symbol, portfolio_id, provider)
+
+    async def _stream(
+        self, symbol: str, portfolio_id: Optional[UUID], provider: str
+    ) -> AsyncIterator[Dict]:
+        yield {"event": "start", "data": {"symbol": symbol, "provider": provider}}
+
+        analysis = (await self.load_analysis_data([symbol])).get(symbol)
+        if not analysis:
+            yield {
+                "event": "error",
+                "data": {"symbol": symbol, "detail": "No market data"},
+            }
+            return
+
+        response: Dict = {}
+        try:
+            async for event in self.ai_client.stream_recommendation(
+                symbol, analysis, provider
+            ):
+                if "token" in event:
+                    yield {"event": "token", "data": {"text": event["token"]}}
+                else:
+                    response = event["recommendation"]
+            draft = recommendation_draft(response)
+        except ValidationError as e:
+            error = e.errors()[0]
+            detail = f"Invalid AI response: {error['loc'][0]}: {error['msg']}"
+            yield {"event": "error", "data": {"symbol": symbol, "detail": detail}}
+            return
+        except Exception as e:
+            yield {
+                "event": "error",
+                "data": {"symbol": symbol, "detail": str(e) or type(e).__name__},
+            }
+            return
+
+        now = datetime.utcnow()
+        generated_at = response.get("generated_at")
+        generated_at = datetime.fromisoformat(generated_at) if generated_at else now
+        recommendation = Recommendation(
+            **draft.model_dump(),
+            portfolio_id=portfolio_id,
+            symbol=symbol,
+            status="active",
+            created_at=now,
+            expires_at=generated_at
+            + timedelta(hours=settings.RECOMMENDATION_EXPIRY_HOURS),
+        )
+        self.db.add(recommendation)
+        await self.db.commit()
+        await self.db.refresh(recommendation)
+        logger.info(
+            "Streamed recommendation",
+            symbol=symbol,
+            portfolio_id=str(portfolio_id) if portfolio_id else None,
+            provider=provider,
+        )
+        yield {"event": "recommendation", "data": recommendation}
+
+    async def _generate(
+        self, symbols: List[str], analysis: Dict[str, Dict], provider: str
+    ) -> Dict[str, Any]:
+        """Get an AI response or the exception it failed with for every symbol."""
+        size = max(settings.AI_BATCH_SIZE, 1)
+        batches = [symbols[i : i + size] for i in range(0, len(symbols), size)]
+        semaphore = asyncio.Semaphore(settings.AI_MAX_CONCURRENCY)
+
+        async def _request(batch: List[str]) -> Dict[str, Any]:
+            async with semaphore:
+                if len(batch) == 1:
+                    (symbol,) = batch
+                    return {
+                        symbol: await self.ai_client.generate_recommendation(
+                            symbol, analysis[symbol], provider
+                        )
+                    }
+                return await self.ai_client.generate_recommendations(
+                    {symbol: analysis[symbol] for symbol in batch}, provider
+                )
+
+        results = await asyncio.gather(
+            *(_request(b) for b in batches), return_exceptions=True
+        )
+        responses: Dict[str, Any] = {}
+        for batch, result in zip(batches, results):
+            if isinstance(result, BaseException):
+                responses.update({symbol: result for symbol in batch})
+            else:
+                responses.update(result)
+        return responses
+
+    async def _active_recommendations(
+        self, symbols: List[str], now: datetime
+    ) -> List[Recommendation]:
+        """Get the newest active, unexpired recommendation of each symbol."""
+        result = await self.db.scalars(
+            select(Recommendation)
+            .where(
+                Recommendation.symbol.in_(symbols),
+                Recommendation.status == "active",
+                Recommendation.expires_at > now,
+            )
+            .order_by(Recommendation.symbol, Recommendation.created_at.desc())
+            .distinct(Recommendation.symbol)
+        )
+        return list(result.all())
+
+    async def load_analysis_data(self, symbols: List[str]) -> Dict[str, Dict]:
+        """Get the prompt inputs of many symbols: fundamentals and indicators.
+
+        Symbols with neither are left empty.
+        """
+        analysis, infos = await asyncio.gather(
+            self.technical.analyze(symbols),
+            asyncio.gather(
+                *(self.market_data.get_stock_info(s) for s in symbols),
+                return_exceptions=True,
+            ),
+        )
+
+        data: Dict[str, Dict] = {}
+        for symbol, info in zip(symbols, infos):
+            info = {} if isinstance(info, BaseException) else info
+            snapshot = analysis["results"].get(symbol, {})
+            values = {
+                "current_price": info.get("current_price") or snapshot.get("close"),
+                "market_cap": info.get("market_cap"),
+                "pe_ratio": info.get("pe_ratio"),
+                "rsi": snapshot.get("rsi"),
+                "macd": snapshot.get("macd"),
+                "ma_50": snapshot.get("ma_50"),
+                "ma_200": snapshot.get("ma_200"),
+            }
+            data[symbol] = {
+                key: round(value, 4) if isinstance(value, float) else value
+                for key, value in values.items()
+                if value is not None
+            }
+        return data
@@ -0,0 +1,190 @@
+"""Position mark-to-market revaluation service."""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, cast
+
+import numpy as np
+from sqlalchemy import Float, bindparam, func, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.models.portfolio import Portfolio
+from app.models.position import Position
+from app.services.market_data_service import (
+    MarketDataService,
+    get_market_data_service,
+)
+
+
+# Largest magnitude ``unrealized_pnl_percent`` (NUMERIC(10, 4)) can hold
+MAX_PNL_PERCENT = 999999.9999
+
+
+def mark_to_market(
+    quantity: np.ndarray, average_cost: np.ndarray, price: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Compute market value, unrealized P&L and P&L percent per position.
+
+    The percentage is NaN where the cost basis is unknown or zero.
+    """
+    market_value = quantity * price
+    cost_basis = quantity * average_cost
+    pnl = market_value - cost_basis
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pnl_percent = np.where(cost_basis > 0, pnl / cost_basis * 100, np.nan)
+    return (
+        np.round(market_value, 2),
+        np.round(pnl, 2),
+        np.clip(np.round(pnl_percent, 4), -MAX_PNL_PERCENT, MAX_PNL_PERCENT),
+    )
+
+
+def _nullable(values: np.ndarray) -> List[Optional[float]]:
+    """Convert to a list, mapping NaN to NULL."""
+    return [None if np.isnan(v) else v for v in values.tolist()]
+
+
+class RevaluationService:
+    """Service for marking positions of active portfolios to market."""
+
+    def __init__(
+        self, db: AsyncSession, market_data: Optional[MarketDataService] = None
+    ):
+        self.db = db
+        self.market_data = market_data or get_market_data_service()
+
+    async def revalue(self, batch_size: Optional[int] = None) -> Dict:
+        """Refresh price, market value and unrealized P&L of every position.
+
+        Prices are fetched once per distinct symbol, derived values are
+        computed for all positions at once and written back with one
+        ``UPDATE ... FROM unnest(...)`` per batch. Positions whose symbol
+        could not be priced keep their previous values.
+        """
+        batch_size = batch_size or settings.REVALUATION_BATCH_SIZE
+        active = Portfolio.is_active.is_(True)
+
+        symbols = (
+            await self.db.scalars(
+                select(Position.symbol).distinct().join(Portfolio).where(active)
+            )
+        ).all()
+        if not symbols:
+            return {"symbols": 0, "priced": 0, "positions": 0, "errors": {}}
+
+        quotes = await self.market_data.get_batch_quotes(list(symbols))
+        prices = {
+            symbol: quote["price"]
+            for symbol, quote in quotes["quotes"].items()
+            if quote.get("price") is not None
+        }
+
+        rows = (
+            await self.db.execute(
+                select(
+                    Position.id,
+                    Position.symbol,
+                    Position.quantity,
+                    Position.average_cost,
+                )
+                .join(Portfolio)
+                .where(active, Position.symbol.in_(list(prices)))
+            )
+        ).all()
+
+        updated = 0
+        if rows:
+            ids = [row.id for row in rows]
+            quantity = np.array([row.quantity for row in rows], dtype="float64")
+            average_cost = np.array(
+                [
+                    row.average_cost if row.average_cost is not None else np.nan
+                    for row in rows
+                ],
+                dtype="float64",
+            )
+            price = np.array([prices[row.symbol] for row in rows], dtype="float64")
+            market_value, pnl, pnl_percent = mark_to_market(
+                quantity, average_cost, price
+            )
+
+            now = datetime.utcnow()
+            for start in range(0, len(ids), batch_size):
+                stop = start + batch_size
+                updated += await self._write_batch(
+                    ids[start:stop],
+                    price[start:stop],
+                    market_value[start:stop],
+                    pnl[start:stop],
+                    pnl_percent[start:stop],
+                    now,
+                )
+            await self.db.commit()
+
+        logger.info(
+            "Revalued positions",
+            symbols=len(symbols),
+            priced=len(prices),
+            positions=updated,
+        )
+        return {
+            "symbols": len(symbols),
+            "priced": len(prices),
+            "positions": updated,
+            "errors": quotes["errors"],
+        }
+
+    async def _write_batch(
+        self,
+        ids: list,
+        price: np.ndarray,
+        market_value: np.ndarray,
+        pnl: np.ndarray,
+        pnl_percent: np.ndarray,
+        now: datetime,
+    ) -> int:
+        """Write one batch of revalued positions with a single UPDATE.
+
+        Each column is sent as one array parameter and unnested into rows, so
+        the statement is the same whatever the batch size.
+        """
+        revalued = (
+            func.unnest(
+                bindparam("ids", type_=ARRAY(UUID(as_uuid=True))),
+                bindparam("prices", type_=ARRAY(Float)),
+                bindparam("market_values", type_=ARRAY(Float)),
+                bindparam("pnls", type_=ARRAY(Float)),
+                bindparam("pnl_percents", type_=ARRAY(Float)),
+            )
+            .table_valued(
+                "id",
+                "current_price",
+                "market_value",
+                "unrealized_pnl",
+                "unrealized_pnl_percent",
+            )
+            .render_derived(name="revalued")
+        )
+        result = await self.db.execute(
+            update(Position)
+            .where(Position.id == revalued.c.id)
+            .values(
+                current_price=revalued.c.current_price,
+                market_value=revalued.c.market_value,
+                unrealized_pnl=revalued.c.unrealized_pnl,
+                unrealized_pnl_percent=revalued.c.unrealized_pnl_percent,
+                last_updated=now,
+            )
+            .execution_options(synchronize_session=False),
+            {
+                "ids": ids,
+                "prices": price.tolist(),
+                "market_values": _nullable(market_value),
+                "pnls": _nullable(pnl),
+                "pnl_percents": _nullable(pnl_percent),
+            },
+        )
+        return cast(CursorResult, result).rowcount
@@ -0,0 +1,318 @@
+"""Portfolio risk analytics."""
+
+import asyncio
+import hashlib
+import json
+from statistics import NormalDist
+from typing import Dict, Iterable, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.models.portfolio import Portfolio
+from app.models.position import Position
+from app.services.market_data_service import (
+    MarketDataService,
+    get_market_data_service,
+)
+
+
+# Daily bars
+PERIODS_PER_YEAR = 252
+
+# Fewest aligned daily returns the estimates are computed from
+MIN_OBSERVATIONS = 20
+
+# Trading days a missing close is carried forward, e.g. over local holidays
+MAX_FILL_DAYS = 5
+
+
+def _daily_closes(bars: pd.DataFrame) -> pd.Series:
+    """Get closes indexed by calendar date, so markets in other timezones align."""
+    index = pd.DatetimeIndex(bars.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    closes = pd.Series(bars["Close"].to_numpy(dtype="float64"), index=index.normalize())
+    return closes[~closes.index.duplicated(keep="last")]
+
+
+def daily_returns(closes: pd.DataFrame) -> pd.DataFrame:
+    """Get daily returns of aligned closes, bridging short gaps in a series."""
+    return (
+        closes.sort_index()
+        .ffill(limit=MAX_FILL_DAYS)
+        .pct_change(fill_method=None)
+        .iloc[1:]
+    )
+
+
+async def load_daily_closes(
+    market_data: MarketDataService, symbols: Iterable[str], period: str
+) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """Load daily closes of ``symbols`` concurrently, one column per symbol.
+
+    Symbols whose bars fail to load are left out and returned with their
+    error message instead.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    loaded = await asyncio.gather(
+        *(market_data.get_bars(s, period, "1d") for s in symbols),
+        return_exceptions=True,
+    )
+
+    closes: Dict[str, pd.Series] = {}
+    errors: Dict[str, str] = {}
+    for symbol, result in zip(symbols, loaded):
+        if isinstance(result, BaseException):
+            logger.warning(
+                "Failed to load daily bars", symbol=symbol, error=str(result)
+            )
+            errors[symbol] = str(result) or type(result).__name__
+        else:
+            closes[symbol] = _daily_closes(result)
+    return pd.DataFrame(closes), errors
+
+
+def _rounded(value: float, digits: int = 6) -> Optional[float]:
+    return None if not np.isfinite(value) else round(float(value), digits)
+
+
+def _pairwise_moments(
+    returns: pd.DataFrame,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Estimate covariances of every pair of columns over the dates both have.
+
+    Returns ``(counts, covariance, variance)``: the number of shared
+    dates, the covariances, and in ``variance[i, j]`` the variance of
+    column ``j`` over the dates it shares with column ``i``. Everything
+    comes from matrix products of the zero-filled returns and their mask.
+    """
+    M = returns.notna().to_numpy(dtype="float64")
+    X = (returns - returns.mean()).fillna(0).to_numpy()
+    counts = M.T @ M
+    # sums[i, j]: sum of column i over the dates it shares with column j
+    sums = X.T @ M
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = (X.T @ X - sums * sums.T / counts) / (counts - 1)
+        variance = (M.T @ (X * X) - sums.T**2 / counts) / (counts - 1)
+    return counts, covariance, variance
+
+
+def compute_risk(
+    closes: pd.DataFrame,
+    quantities: pd.Series,
+    benchmark: str,
+    confidence: float = 0.95,
+    correlation: bool = False,
+) -> Dict:
+    """Compute risk metrics of a portfolio from aligned daily closes.
+
+    ``closes`` has one column per position symbol plus ``benchmark``;
+    ``quantities`` is indexed by symbol. Positions are weighted by their
+    value at the last close. Symbols with fewer than ``MIN_OBSERVATIONS``
+    returns on benchmark dates are left out and listed under ``excluded``.
+    Covariances, volatilities and betas use every date each pair of
+    series has, so a recent listing does not shorten the history of the
+    other positions; each position reports its ``observations``. The
+    historical VaR and CVaR need portfolio returns, which exist on the
+    dates all positions have: their count is the top-level
+    ``observations``. VaR and CVaR are one-day losses as a fraction of
+    the portfolio value, from the empirical return distribution and from
+    a normal fit.
+    """
+    returns = daily_returns(closes)
+    if benchmark not in returns or returns[benchmark].count() < MIN_OBSERVATIONS:
+        raise ValueError(f"Not enough history for benchmark {benchmark}")
+
+    candidates = [s for s in quantities.index if s in returns]
+    columns = list(dict.fromkeys([*candidates, benchmark]))
+    counts, covariance, variance = _pairwise_moments(returns[columns])
+    overlap = dict(zip(columns, counts[:, columns.index(benchmark)]))
+
+    symbols = [s for s in quantities.index if overlap.get(s, 0) >= MIN_OBSERVATIONS]
+    excluded = {s: "insufficient history" for s in quantities.index if s not in symbols}
+    if not symbols:
+        raise ValueError("No position has enough price history")
+
+    index = [columns.index(s) for s in symbols]
+    shared = counts[np.ix_(index, index)]
+    if (shared < MIN_OBSERVATIONS).any():
+        i, j = np.argwhere(shared < MIN_OBSERVATIONS)[0]
+        raise ValueError(
+            f"{symbols[i]} and {symbols[j]} have too few trading days in common"
+        )
+
+    aligned = returns[list(dict.fromkeys([*symbols, benchmark]))].dropna()
+    if len(aligned) < MIN_OBSERVATIONS:
+        raise ValueError("Positions have too few trading days in common")
+    T = len(aligned)
+
+    last = closes[symbols].ffill().iloc[-1].to_numpy()
+    values = quantities[symbols].to_numpy(dtype="float64") * last
+    market_value = values.sum()
+    w = values / market_value
+
+    b = columns.index(benchmark)
+    cov = covariance[np.ix_(index, index)]
+    cov_w = cov @ w
+    # Pairwise estimates need not form a positive semi-definite matrix
+    portfolio_var = max(w @ cov_w, 0.0)
+    sigma = np.sqrt(portfolio_var)
+    rp = aligned[symbols].to_numpy() @ w
+    position_beta = covariance[index, b] / variance[index, b]
+    position_vol = np.sqrt(np.diag(cov))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        contribution = w * cov_w / portfolio_var
+
+    tail = 1 - confidence
+    cutoff = np.quantile(rp, tail)
+    normal = NormalDist()
+    z = normal.inv_cdf(tail)
+    mu = w @ returns[symbols].mean().to_numpy()
+    var = {
+        "historical": -cutoff,
+        "parametric": -(mu + z * sigma),
+    }
+    cvar = {
+        "historical": -rp[rp <= cutoff].mean(),
+        "parametric": -(mu - sigma * normal.pdf(z) / tail),
+    }
+
+    result = {
+        "as_of": aligned.index[-1].date().isoformat(),
+        "observations": T,
+        "confidence": confidence,
+        "benchmark": benchmark,
+        "market_value": _rounded(market_value, 2),
+        "volatility": _rounded(sigma * np.sqrt(PERIODS_PER_YEAR)),
+        "beta": _rounded(w @ position_beta),
+        "var": {
+            method: {
+                "percent": _rounded(loss * 100, 4),
+                "amount": _rounded(loss * market_value, 2),
+            }
+            for method, loss in var.items()
+        },
+        "cvar": {
+            method: {
+                "percent": _rounded(loss * 100, 4),
+                "amount": _rounded(loss * market_value, 2),
+            }
+            for method, loss in cvar.items()
+        },
+        "positions": {
+            symbol: {
+                "weight": _rounded(w[i]),
+                "volatility": _rounded(position_vol[i] * np.sqrt(PERIODS_PER_YEAR)),
+                "beta": _rounded(position_beta[i]),
+                "risk_contribution": _rounded(contribution[i]),
+                "observations": int(overlap[symbol]),
+            }
+            for i, symbol in enumerate(symbols)
+        },
+        "excluded": excluded,
+    }
+    if correlation:
+        pair_variance = variance[np.ix_(index, index)]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            matrix = cov / np.sqrt(pair_variance * pair_variance.T)
+        finite = np.isfinite(matrix)
+        matrix = np.round(matrix, 4).tolist()
+        if not finite.all():
+            # Constant prices have no defined correlation
+            for i, j in zip(*np.nonzero(~finite)):
+                matrix[i][j] = None
+        result["correlation"] = {"symbols": symbols, "matrix": matrix}
+    return result
+
+
+class RiskService:
+    """Service for portfolio risk metrics."""
+
+    def __init__(
+        self, db: AsyncSession, market_data: Optional[MarketDataService] = None
+    ):
+        self.db = db
+        self.market_data = market_data or get_market_data_service()
+
+    async def portfolio_risk(
+        self,
+        portfolio_id: UUID,
+        period: Optional[str] = None,
+        confidence: float = 0.95,
+        correlation: bool = False,
+    ) -> Optional[Dict]:
+        """Get risk metrics for a portfolio, or None if it does not exist.
+
+        Results are cached under a fingerprint of the open positions and
+        their last prices, so they are recomputed once positions change or
+        the revaluation job moves prices.
+        """
+        if await self.db.get(Portfolio, portfolio_id) is None:
+            return None
+        rows = (
+            await self.db.execute(
+                select(Position.symbol, Position.quantity, Position.current_price)
+                .where(Position.portfolio_id == portfolio_id, Position.quantity != 0)
+                .order_by(Position.symbol)
+            )
+        ).all()
+        if not rows:
+            raise ValueError("Portfolio has no open positions")
+
+        period = period or settings.RISK_LOOKBACK_PERIOD
+        benchmark = settings.RISK_BENCHMARK_SYMBOL.upper()
+        fingerprint = hashlib.sha256(
+            json.dumps(
+                [
+                    benchmark,
+                    period,
+                    confidence,
+                    correlation,
+                    [
+                        [row.symbol, str(row.quantity), str(row.current_price)]
+                        for row in rows
+                    ],
+                ]
+            ).encode()
+        ).hexdigest()[:24]
+
+        quantities = pd.Series(
+            [float(row.quantity) for row in rows], index=[row.symbol for row in rows]
+        )
+        return await self.market_data.cache.get_or_load(
+            f"risk:{portfolio_id}:{fingerprint}",
+            settings.RISK_CACHE_TTL,
+            lambda: self._compute(
+                quantities, benchmark, period, confidence, correlation
+            ),
+        )
+
+    async def _compute(
+        self,
+        quantities: pd.Series,
+        benchmark: str,
+        period: str,
+        confidence: float,
+        correlation: bool,
+    ) -> Dict:
+        """Load daily bars for the positions and benchmark, then compute."""
+        frame, errors = await load_daily_closes(
+            self.market_data, [*quantities.index, benchmark], period
+        )
+        if benchmark not in frame:
+            raise ValueError(f"No price history for benchmark {benchmark}")
+
+        held = quantities[[s for s in quantities.index if s in frame]]
+        result = await asyncio.to_thread(
+            compute_risk, frame, held, benchmark, confidence, correlation
+        )
+        result["excluded"].update(
+            {s: errors[s] for s in quantities.index if s in errors}
+        )
+        return result
@@ -0,0 +1,327 @@
+"""Daily portfolio value snapshots."""
+
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+from uuid import UUID
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Date, DateTime, Float, bindparam, case, func, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logging import logger
+from app.models.order import Order
+from app.models.portfolio import Portfolio
+from app.models.portfolio_snapshot import PortfolioSnapshot
+from app.models.position import Position
+from app.services.bar_store import FULL_HISTORY
+from app.services.market_data_service import (
+    STORE_PERIOD_OFFSETS,
+    MarketDataService,
+    get_market_data_service,
+)
+from app.services.position_ledger import replay_orders
+from app.services.revaluation_service import MAX_PNL_PERCENT
+from app.services.risk_service import load_daily_closes
+
+
+# Days before a past snapshot date whose close still prices a position,
+# e.g. Friday's close for a Sunday
+CLOSE_LOOKBACK_DAYS = 7
+
+SNAPSHOT_COLUMNS = [
+    "portfolio_id",
+    "total_value",
+    "cash",
+    "invested",
+    "market_value",
+    "total_return",
+    "total_return_percent",
+]
+
+
+def portfolio_values(positions: pd.DataFrame, portfolios: pd.DataFrame) -> pd.DataFrame:
+    """Value portfolios from their positions and order cash flows.
+
+    ``positions`` has ``portfolio_id, quantity, average_cost, realized_pnl,
+    price``; a position without a price is valued at cost. ``portfolios``
+    has ``portfolio_id, initial_capital, cash_flow`` where ``cash_flow`` is
+    sell proceeds minus buy costs, fees included. The total return is the
+    unrealized plus realized P&L, as a percentage of the initial capital,
+    or of the amount invested when the capital is unknown.
+    """
+    invested = positions["quantity"] * positions["average_cost"].fillna(0)
+    market_value = (positions["quantity"] * positions["price"]).fillna(invested)
+    totals = (
+        pd.DataFrame(
+            {
+                "portfolio_id": positions["portfolio_id"],
+                "invested": invested,
+                "market_value": market_value,
+                "realized_pnl": positions["realized_pnl"].fillna(0),
+            }
+        )
+        .groupby("portfolio_id")
+        .sum()
+    )
+
+    values = (
+        portfolios.set_index("portfolio_id")
+        .join(totals)
+        .fillna({"invested": 0.0, "market_value": 0.0, "realized_pnl": 0.0})
+    )
+    capital = values["initial_capital"].fillna(0)
+    values["cash"] = capital + values["cash_flow"].fillna(0)
+    values["total_value"] = values["cash"] + values["market_value"]
+    values["total_return"] = (
+        values["market_value"] - values["invested"] + values["realized_pnl"]
+    )
+    base = capital.where(capital > 0, values["invested"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percent = np.where(base > 0, values["total_return"] / base * 100, np.nan)
+    values["total_return_percent"] = np.clip(percent, -MAX_PNL_PERCENT, MAX_PNL_PERCENT)
+    return values.reset_index()[SNAPSHOT_COLUMNS]
+
+
+def history_period(start: pd.Timestamp) -> str:
+    """Get the shortest stored bar period that reaches back to ``start``."""
+    now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+    for period, offset in STORE_PERIOD_OFFSETS.items():
+        if now - offset <= start:
+            return period
+    return FULL_HISTORY
+
+
+class SnapshotService:
+    """Service for end-of-day portfolio snapshots and equity curves."""
+
+    def __init__(
+        self, db: AsyncSession, market_data: Optional[MarketDataService] = None
+    ):
+        self.db = db
+        self.market_data = market_data or get_market_data_service()
+
+    async def take_snapshots(self, as_of: Optional[date] = None) -> Dict:
+        """Snapshot every active portfolio for ``as_of`` (default today, UTC).
+
+        Today's snapshot values the current positions with one batched
+        quote request. Past days replay the orders placed up to ``as_of``
+        and use the daily closes of that day, so missed days can be
+        backfilled. Cash flows are summed by the database, and all
+        snapshots are upserted in one statement, so re-running the job for
+        a day overwrites that day.
+        """
+        today = datetime.utcnow().date()
+        as_of = as_of or today
+        if as_of > today:
+            raise ValueError(f"Cannot snapshot {as_of.isoformat()}, a future date")
+        end = datetime.combine(as_of + timedelta(days=1), time.min)
+        active = Portfolio.is_active.is_(True)
+
+        signed = case(
+            (
+                Order.side == "sell",
+                Order.quantity * Order.price - func.coalesce(Order.fees, 0),
+            ),
+            else_=-(Order.quantity * Order.price) - func.coalesce(Order.fees, 0),
+        )
+        cash_flows = (
+            select(Order.portfolio_id, func.sum(signed).label("cash_flow"))
+            .where(Order.order_date < end)
+            .group_by(Order.portfolio_id)
+            .subquery()
+        )
+        portfolios = pd.DataFrame.from_records(
+            (
+                await self.db.execute(
+                    select(
+                        Portfolio.id, Portfolio.initial_capital, cash_flows.c.cash_flow
+                    )
+                    .outerjoin(cash_flows, cash_flows.c.portfolio_id == Portfolio.id)
+                    .where(active)
+                )
+            ).all(),
+            columns=["portfolio_id", "initial_capital", "cash_flow"],
+        )
+        if portfolios.empty:
+            return {"date": as_of.isoformat(), "portfolios": 0, "unpriced": []}
+
+        if as_of < today:
+            positions = await self._replay_positions(end)
+        else:
+            positions = await self._current_positions()
+
+        unpriced: List[str] = []
+        if not positions.empty:
+            numeric = ["quantity", "average_cost", "realized_pnl"]
+            positions[numeric] = positions[numeric].astype("float64")
+            held = positions["quantity"] != 0
+            symbols = positions.loc[held, "symbol"].unique().tolist()
+            if as_of < today:
+                closes = await self._closes(symbols, as_of)
+            else:
+                closes = await self._quotes(symbols)
+            positions["price"] = positions["symbol"].map(closes).astype("float64")
+            if "current_price" in positions:
+                # Fall back to the last revaluation price for symbols without a quote
+                positions["price"] = positions["price"].fillna(
+                    positions["current_price"].astype("float64")
+                )
+            unpriced = sorted(
+                positions.loc[held & positions["price"].isna(), "symbol"].unique()
+            )
+        else:
+            positions["price"] = []
+
+        portfolios[["initial_capital", "cash_flow"]] = portfolios[
+            ["initial_capital", "cash_flow"]
+        ].astype("float64")
+        values = portfolio_values(positions, portfolios)
+        await self._write(values, as_of)
+        await self.db.commit()
+
+        if unpriced:
+            logger.warning("Snapshot positions valued at cost", symbols=unpriced)
+        logger.info(
+            "Took portfolio snapshots", date=as_of.isoformat(), portfolios=len(values)
+        )
+        return {
+            "date": as_of.isoformat(),
+            "portfolios": len(values),
+            "unpriced": unpriced,
+        }
+
+    async def _current_positions(self) -> pd.DataFrame:
+        """Get the positions of active portfolios with their revaluation price."""
+        return pd.DataFrame.from_records(
+            (
+                await self.db.execute(
+                    select(
+                        Position.portfolio_id,
+                        Position.symbol,
+                        Position.quantity,
+                        Position.average_cost,
+                        Position.realized_pnl,
+                        Position.current_price,
+                    )
+                    .join(Portfolio)
+                    .where(Portfolio.is_active.is_(True))
+                )
+            ).all(),
+            columns=[
+                "portfolio_id",
+                "symbol",
+                "quantity",
+                "average_cost",
+                "realized_pnl",
+                "current_price",
+            ],
+        )
+
+    async def _replay_positions(self, end: datetime) -> pd.DataFrame:
+        """Get the positions of active portfolios from their orders before ``end``."""
+        rows = (
+            await self.db.execute(
+                select(
+                    Order.portfolio_id,
+                    Order.symbol,
+                    Order.side,
+                    Order.quantity,
+                    Order.price,
+                    Order.fees,
+                )
+                .join(Portfolio, Portfolio.id == Order.portfolio_id)
+                .where(Portfolio.is_active.is_(True), Order.order_date < end)
+                .order_by(
+                    Order.portfolio_id,
+                    Order.symbol,
+                    Order.order_date,
+                    Order.created_at,
+                    Order.id,
+                )
+            )
+        ).all()
+        return replay_orders(
+            pd.DataFrame.from_records(
+                rows,
+                columns=["portfolio_id", "symbol", "side", "quantity", "price", "fees"],
+            )
+        )
+
+    async def _quotes(self, symbols: List[str]) -> Dict[str, float]:
+        """Get the latest price of ``symbols`` with one batched quote request."""
+        if not symbols:
+            return {}
+        quotes = (await self.market_data.get_batch_quotes(symbols))["quotes"]
+        return {s: q["price"] for s, q in quotes.items() if q.get("price") is not None}
+
+    async def _closes(self, symbols: List[str], as_of: date) -> Dict[str, float]:
+        """Get the last daily close of ``symbols`` on or shortly before ``as_of``."""
+        if not symbols:
+            return {}
+        start = pd.Timestamp(as_of) - pd.Timedelta(days=CLOSE_LOOKBACK_DAYS)
+        closes, _ = await load_daily_closes(
+            self.market_data, symbols, history_period(start)
+        )
+        closes = closes[(closes.index >= start) & (closes.index <= pd.Timestamp(as_of))]
+        if closes.empty:
+            return {}
+        last = closes.sort_index().ffill().iloc[-1]
+        return last.dropna().to_dict()
+
+    async def _write(self, values: pd.DataFrame, as_of: date) -> None:
+        """Upsert one snapshot per portfolio with array parameters."""
+        floats = SNAPSHOT_COLUMNS[1:]
+        snapshots = (
+            func.unnest(
+                bindparam("portfolio_ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+                *(
+                    bindparam(f"{column}_values", type_=ARRAY(Float))
+                    for column in floats
+                ),
+            )
+            .table_valued(*SNAPSHOT_COLUMNS)
+            .render_derived(name="snapshots")
+        )
+        # A Core insert, as array parameters would send an entity insert
+        # down the ORM bulk insert path
+        statement = insert(PortfolioSnapshot.__table__).from_select(
+            [*SNAPSHOT_COLUMNS, "date", "created_at"],
+            select(
+                *(snapshots.c[column] for column in SNAPSHOT_COLUMNS),
+                bindparam("snapshot_date", as_of, type_=Date),
+                bindparam("now", datetime.utcnow(), type_=DateTime),
+            ),
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=["portfolio_id", "date"],
+            set_={
+                column: statement.excluded[column] for column in [*floats, "created_at"]
+            },
+        )
+        params = {"portfolio_ids": values["portfolio_id"].tolist()}
+        for column in floats:
+            params[f"{column}_values"] = [
+                None if np.isnan(v) else round(v, 4) for v in values[column].tolist()
+            ]
+        await self.db.execute(statement, params)
+
+    async def get_equity_curve(
+        self,
+        portfolio_id: UUID,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> List[PortfolioSnapshot]:
+        """Get a portfolio's snapshots in a date range (inclusive), oldest first."""
+        query = select(PortfolioSnapshot).where(
+            PortfolioSnapshot.portfolio_id == portfolio_id
+        )
+        if start_date:
+            query = query.where(PortfolioSnapshot.date >= start_date)
+        if end_date:
+            query = query.where(PortfolioSnapshot.date <= end_date)
+        result = await self.db.scalars(query.order_by(PortfolioSnapshot.date))
+        return list(result.all())
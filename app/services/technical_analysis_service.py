@@ -0,0 +1,426 @@
+"""Technical analysis service."""
+
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from app.core.logging import logger
+from app.schemas.analysis import IndicatorSettings
+from app.services.indicator_state import IndicatorState
+from app.services.market_data_service import (
+    MarketDataService,
+    get_market_data_service,
+)
+
+
+MEMO_SIZE = 4096
+PRICE_COLUMNS = ["High", "Low", "Close", "Volume"]
+
+
+# Indicator functions operate on 2-D float arrays shaped (bars, symbols), so
+# one call computes an indicator for many symbols at once. They
+# follow the conventions of the ``ta`` package; NaN marks missing bars and
+# the warm-up period of each indicator.
+
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum over the trailing ``window`` bars; NaN unless all are present."""
+    present = ~np.isnan(values)
+    zero = np.zeros((1, values.shape[1]))
+    sums = np.concatenate([zero, np.cumsum(np.where(present, values, 0.0), axis=0)])
+    counts = np.concatenate([zero, np.cumsum(present, axis=0)])
+
+    out = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        full = (counts[window:] - counts[:-window]) == window
+        out[window - 1 :] = np.where(full, sums[window:] - sums[:-window], np.nan)
+    return out
+
+
+def sma(close: np.ndarray, window: int) -> np.ndarray:
+    """Simple moving average."""
+    return rolling_sum(close, window) / window
+
+
+def ewm(
+    values: np.ndarray,
+    alpha: Union[float, np.ndarray],
+    min_periods: Union[int, np.ndarray],
+) -> np.ndarray:
+    """Exponentially weighted mean seeded with the first present value.
+
+    Equivalent to ``ewm(alpha=alpha, adjust=False).mean()``; a missing bar
+    holds the previous value. ``alpha`` and ``min_periods`` may be given
+    per column.
+    """
+    out = np.full(values.shape, np.nan)
+    state = np.full(values.shape[1], np.nan)
+    count = np.zeros(values.shape[1])
+    for t, row in enumerate(values):
+        present = ~np.isnan(row)
+        state = np.where(
+            np.isnan(state),
+            row,
+            np.where(present, state + alpha * (row - state), state),
+        )
+        count += present
+        out[t] = np.where(count >= min_periods, state, np.nan)
+    return out
+
+
+def ema(values: np.ndarray, window: int) -> np.ndarray:
+    """Exponential moving average."""
+    return ewm(values, 2 / (window + 1), window)
+
+
+def wilder(values: np.ndarray, window: Union[int, np.ndarray]) -> np.ndarray:
+    """Wilder smoothing (EMA with ``alpha = 1 / window``)."""
+    return ewm(values, 1 / window, window)
+
+
+def _shift(values: np.ndarray) -> np.ndarray:
+    return np.concatenate([np.full((1, values.shape[1]), np.nan), values[:-1]])
+
+
+def rsi(close: np.ndarray, window: Union[int, np.ndarray]) -> np.ndarray:
+    """Relative strength index; ``window`` may be given per column."""
+    present = ~np.isnan(close)
+    diff = close - _shift(close)
+    gain = np.where(present, np.where(diff > 0, diff, 0.0), np.nan)
+    loss = np.where(present, np.where(diff < 0, -diff, 0.0), np.nan)
+    avg_gain = wilder(gain, window)
+    avg_loss = wilder(loss, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100 - 100 / (1 + avg_gain / avg_loss)
+    return np.where(avg_loss == 0, 100.0, values)
+
+
+def macd(
+    close: np.ndarray, fast: int, slow: int, signal: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """MACD line, signal line and histogram."""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def bollinger(
+    close: np.ndarray, window: int, num_std: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Upper, middle and lower Bollinger bands (population std)."""
+    # Center each column first to keep the sum-of-squares variance accurate
+    offset = np.nanmean(close, axis=0) if close.size else 0.0
+    centered = close - offset
+    mean = rolling_sum(centered, window) / window
+    variance = rolling_sum(centered * centered, window) / window - mean * mean
+    std = np.sqrt(np.maximum(variance, 0.0))
+    middle = mean + offset
+    return middle + num_std * std, middle, middle - num_std * std
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """True range; the first bar uses its high-low range."""
+    prev_close = _shift(close)
+    return np.fmax(
+        np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close)
+    )
+
+
+def atr(
+    high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int
+) -> np.ndarray:
+    """Average true range, Wilder-smoothed from an initial simple average."""
+    ranges = true_range(high, low, close)
+    seed = sma(ranges, window)
+    seeded = ~np.isnan(seed)
+    first = seeded & (np.cumsum(seeded, axis=0) == 1)
+    start = np.where(first, seed, np.where(seeded, ranges, np.nan))
+    return ewm(start, 1 / window, 1)
+
+
+def vwap(
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    volume: np.ndarray,
+    window: int,
+) -> np.ndarray:
+    """Rolling volume-weighted average price over ``window`` bars."""
+    typical = (high + low + close) / 3
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return rolling_sum(typical * volume, window) / rolling_sum(volume, window)
+
+
+def compute_indicators(
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    volume: np.ndarray,
+    config: IndicatorSettings,
+) -> Dict[str, np.ndarray]:
+    """Compute the configured indicators for every column of the arrays."""
+    selected = set(config.indicators)
+    out: Dict[str, np.ndarray] = {}
+
+    if "sma" in selected:
+        for window in config.sma_windows:
+            out[f"ma_{window}"] = sma(close, window)
+    if "ema" in selected:
+        for window in config.ema_windows:
+            out[f"ema_{window}"] = ema(close, window)
+    if "rsi" in selected:
+        out["rsi"] = rsi(close, config.rsi_window)
+    if "macd" in selected:
+        out["macd"], out["macd_signal"], out["macd_histogram"] = macd(
+            close, config.macd_fast, config.macd_slow, config.macd_signal
+        )
+    if "bollinger" in selected:
+        out["bb_upper"], out["bb_middle"], out["bb_lower"] = bollinger(
+            close, config.bollinger_window, config.bollinger_std
+        )
+    if "atr" in selected:
+        out["atr"] = atr(high, low, close, config.atr_window)
+    if "vwap" in selected:
+        out["vwap"] = vwap(high, low, close, volume, config.vwap_window)
+
+    return out
+
+
+def _none_if_nan(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+def _price_array(frame: pd.DataFrame) -> np.ndarray:
+    """Get (bars, [high, low, close, volume]) as a float array."""
+    return frame.to_numpy(dtype="float64")[:, frame.columns.get_indexer(PRICE_COLUMNS)]
+
+
+def _align(
+    frames: List[pd.DataFrame],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Stack frames on the union of their timestamps.
+
+    Returns (bars, symbols, [high, low, close, volume]) prices, NaN where a
+    symbol has no bar, the mask of the bars that exist, and the row of each
+    symbol's latest bar.
+    """
+    stamps = [frame.index.as_unit("ns").asi8 for frame in frames]
+    calendar = np.unique(np.concatenate(stamps))
+    prices = np.full((len(calendar), len(frames), len(PRICE_COLUMNS)), np.nan)
+    mask = np.zeros((len(calendar), len(frames)), dtype=bool)
+    last = np.empty(len(frames), dtype=np.intp)
+    for i, (frame, stamp) in enumerate(zip(frames, stamps)):
+        rows = np.searchsorted(calendar, stamp)
+        prices[rows, i] = _price_array(frame)
+        mask[rows, i] = True
+        last[i] = rows[-1]
+    return prices, mask, last
+
+
+def _last_bar(frame: pd.DataFrame) -> tuple:
+    """Timestamp and prices of the latest bar, to detect provider revisions."""
+    return (frame.index[-1], *(float(frame[c].iat[-1]) for c in PRICE_COLUMNS))
+
+
+def _new_bars(entry: Optional[Dict], frame: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """Get the bars of ``frame`` not yet committed to a tracked state.
+
+    Returns None if there is no state or ``frame`` no longer contains the
+    last committed bar, in which case the state must be rebuilt.
+    """
+    if entry is None:
+        return None
+    committed_at = entry["committed_at"]
+    if committed_at is None:
+        return frame
+    position = frame.index.searchsorted(committed_at)
+    if position >= len(frame) - 1 or frame.index[position] != committed_at:
+        return None
+    return frame.iloc[position + 1 :]
+
+
+def _snapshot(
+    symbol: str,
+    interval: str,
+    timestamp: pd.Timestamp,
+    close: float,
+    values: Dict[str, float],
+) -> Dict:
+    snapshot = {
+        "symbol": symbol,
+        "interval": interval,
+        "timestamp": timestamp.isoformat(),
+        "close": _none_if_nan(close),
+    }
+    snapshot.update({name: _none_if_nan(value) for name, value in values.items()})
+    return snapshot
+
+
+class TechnicalAnalysisService:
+    """Service for computing technical indicators over stored bar data.
+
+    Indicator state is kept per (symbol, interval, settings) so that when
+    new bars arrive only those bars are applied, in constant time each. The
+    state covers every bar except the latest, which may still be revised by
+    the provider; the latest bar is applied to a copy when a snapshot is
+    taken.
+    """
+
+    def __init__(
+        self,
+        market_data: Optional[MarketDataService] = None,
+        memo_size: int = MEMO_SIZE,
+    ):
+        self.market_data = market_data or get_market_data_service()
+        self.memo_size = memo_size
+        self._states: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self._states_lock = threading.Lock()
+
+    async def analyze(
+        self,
+        symbols: List[str],
+        period: str = "2y",
+        interval: str = "1d",
+        config: Optional[IndicatorSettings] = None,
+    ) -> Dict:
+        """Get the latest indicator values for many symbols.
+
+        Bars are loaded concurrently through the market data service; symbols
+        that fail to load are reported under ``errors``.
+        """
+        # Drop request-only fields so they do not leak into the state key
+        config = IndicatorSettings.model_validate(
+            config.model_dump(include=set(IndicatorSettings.model_fields))
+            if config
+            else {}
+        )
+        unique = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+
+        loaded = await asyncio.gather(
+            *(self.market_data.get_bars(s, period, interval) for s in unique),
+            return_exceptions=True,
+        )
+
+        bars: Dict[str, pd.DataFrame] = {}
+        errors: Dict[str, str] = {}
+        for symbol, result in zip(unique, loaded):
+            if isinstance(result, BaseException):
+                logger.warning(
+                    "Failed to load bars for analysis", symbol=symbol, error=str(result)
+                )
+                errors[symbol] = str(result) or type(result).__name__
+            else:
+                bars[symbol] = result
+
+        results = await asyncio.to_thread(
+            self.compute_snapshots, bars, interval, config
+        )
+        return {"results": results, "errors": errors}
+
+    def compute_snapshots(
+        self,
+        bars: Dict[str, pd.DataFrame],
+        interval: str,
+        config: IndicatorSettings,
+    ) -> Dict[str, Dict]:
+        """Compute latest indicator values for many symbols.
+
+        Symbols with tracked state only apply their new bars; the rest are
+        rebuilt from their full history. Either way the bars are stacked on
+        the union of their timestamps, and each step is one vectorized update
+        of the symbols that have a bar at that time, so symbols with gaps or
+        different listing dates do not split the batch.
+        """
+        config_key = config.model_dump_json()
+        results: Dict[str, Dict] = {}
+        # State to extend, or None -> [(symbol, column, new bars, previous committed_at)]
+        batches: Dict[Optional[IndicatorState], List[tuple]] = {}
+
+        with self._states_lock:
+            for symbol, frame in bars.items():
+                if frame.empty:
+                    continue
+                key = (symbol, interval, config_key)
+                entry = self._states.get(key)
+                new = _new_bars(entry, frame)
+                if entry is None or new is None:
+                    batches.setdefault(None, []).append((symbol, 0, frame, None))
+                    continue
+
+                self._states.move_to_end(key)
+                if len(new) == 1 and _last_bar(new) == entry["last_bar"]:
+                    results[symbol] = entry["snapshot"]
+                    continue
+                batches.setdefault(entry["state"], []).append(
+                    (symbol, entry["column"], new, entry["committed_at"])
+                )
+
+        for base, members in batches.items():
+            # (bars, symbols, [high, low, close, volume])
+            stacked, mask, last = _align([member[2] for member in members])
+            high, low, close, volume = (stacked[:, :, i] for i in range(4))
+            columns = np.arange(len(members))
+            # The latest bar of each symbol may still be revised, so it is
+            # only applied to a copy of the state
+            committed = mask.copy()
+            committed[last, columns] = False
+
+            if base is None:
+                state = IndicatorState.replay(
+                    high, low, close, volume, config, mask=committed
+                )
+            else:
+                # Tracked states are shared, so extend a copy of the columns
+                state = base.take([member[1] for member in members])
+                for t in range(len(stacked)):
+                    state.update(high[t], low[t], close[t], volume[t], committed[t])
+
+            latest = state.copy()
+            latest_bars = stacked[last, columns]
+            latest.update(*(latest_bars[:, i] for i in range(4)))
+            values = latest.values()
+
+            for i, (symbol, _, frame, committed_at) in enumerate(members):
+                index = frame.index
+                snapshot = _snapshot(
+                    symbol,
+                    interval,
+                    index[-1],
+                    latest_bars[i, 2],
+                    {name: column[i] for name, column in values.items()},
+                )
+                self._track(
+                    (symbol, interval, config_key),
+                    {
+                        "state": state,
+                        "column": i,
+                        "committed_at": index[-2] if len(index) > 1 else committed_at,
+                        "last_bar": (index[-1], *latest_bars[i].tolist()),
+                        "snapshot": snapshot,
+                    },
+                )
+                results[symbol] = snapshot
+
+        return results
+
+    def _track(self, key: tuple, entry: Dict) -> None:
+        with self._states_lock:
+            self._states[key] = entry
+            self._states.move_to_end(key)
+            while len(self._states) > self.memo_size:
+                self._states.popitem(last=False)
+
+
+_service: Optional[TechnicalAnalysisService] = None
+
+
+def get_technical_analysis_service() -> TechnicalAnalysisService:
+    """Dependency for getting the shared technical analysis service."""
+    global _service
+    if _service is None:
+        _service = TechnicalAnalysisService()
+    return _service
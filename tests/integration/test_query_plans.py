@@ -0,0 +1,229 @@
+"""Query plan regression tests for the trading tables.
+
+Seeds a realistic volume of rows, then checks with ``EXPLAIN`` that the
+queries issued by the services are served by indexes rather than
+sequential scans.
+"""
+
+import json
+import random
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, event, insert, text
+
+from app.models.order import Order
+from app.models.portfolio import Portfolio
+from app.models.position import Position
+from app.models.recommendation import Recommendation
+from app.models.user import User
+from app.services.order_service import OrderService
+from app.services.portfolio_service import PortfolioService
+from app.services.recommendation_service import RecommendationService
+
+
+USERS = 200
+PORTFOLIOS_PER_USER = 5
+POSITIONS_PER_PORTFOLIO = 20
+ORDERS_PER_PORTFOLIO = 40
+SYMBOLS = [f"SYM{i:03d}" for i in range(300)]
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture(scope="module")
+def seeded(test_engine):
+    """Seed users, portfolios, positions, orders and recommendations."""
+    rng = random.Random(0)
+    users = [
+        {
+            "id": uuid.uuid4(),
+            "email": f"plan{i}@example.com",
+            "name": f"User {i}",
+            "created_at": START,
+        }
+        for i in range(USERS)
+    ]
+    portfolios, positions, orders, recommendations = [], [], [], []
+    for n, user in enumerate(users):
+        for p in range(PORTFOLIOS_PER_USER):
+            portfolio_id = uuid.uuid4()
+            portfolios.append(
+                {
+                    "id": portfolio_id,
+                    "user_id": user["id"],
+                    "name": f"Portfolio {p}",
+                    "type": "virtual",
+                    "is_active": True,
+                    "created_at": START + timedelta(hours=n * PORTFOLIOS_PER_USER + p),
+                }
+            )
+            for symbol in rng.sample(SYMBOLS, POSITIONS_PER_PORTFOLIO):
+                positions.append(
+                    {
+                        "id": uuid.uuid4(),
+                        "portfolio_id": portfolio_id,
+                        "symbol": symbol,
+                        "quantity": rng.randint(1, 100),
+                        "average_cost": 100,
+                        "market_value": rng.randint(50, 20000),
+                        "unrealized_pnl": rng.randint(-500, 500),
+                        "created_at": START,
+                    }
+                )
+            for o in range(ORDERS_PER_PORTFOLIO):
+                when = START + timedelta(days=rng.randint(0, 700))
+                orders.append(
+                    {
+                        "id": uuid.uuid4(),
+                        "portfolio_id": portfolio_id,
+                        "symbol": rng.choice(SYMBOLS),
+                        "side": rng.choice(["buy", "sell"]),
+                        "quantity": 10,
+                        "price": 100,
+                        "order_date": when,
+                        "created_at": when,
+                    }
+                )
+            for r in range(POSITIONS_PER_PORTFOLIO):
+                recommendations.append(
+                    {
+                        "id": uuid.uuid4(),
+                        "portfolio_id": portfolio_id if r % 2 else None,
+                        "symbol": rng.choice(SYMBOLS),
+                        "action": "hold",
+                        "reasoning": "seed",
+                        "status": rng.choice(["active", "executed", "expired"]),
+                        "created_at": START + timedelta(minutes=rng.randint(0, 10**6)),
+                    }
+                )
+
+    with test_engine.begin() as conn:
+        conn.execute(insert(User), users)
+        conn.execute(insert(Portfolio), portfolios)
+        conn.execute(insert(Position), positions)
+        conn.execute(insert(Order), orders)
+        conn.execute(insert(Recommendation), recommendations)
+    with test_engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("ANALYZE"))
+
+    yield {"users": users, "portfolios": portfolios}
+
+    user_ids = [user["id"] for user in users]
+    portfolio_ids = [portfolio["id"] for portfolio in portfolios]
+    with test_engine.begin() as conn:
+        conn.execute(
+            delete(Recommendation).where(
+                Recommendation.id.in_([r["id"] for r in recommendations])
+            )
+        )
+        conn.execute(delete(Portfolio).where(Portfolio.id.in_(portfolio_ids)))
+        conn.execute(delete(User).where(User.id.in_(user_ids)))
+
+
+async def _explain(db, call):
+    """Run ``call`` and return the plan of every SELECT it issued."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        await call
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    conn = await db.connection()
+    plans = []
+    for statement, parameters in statements:
+        if statement.lstrip().upper().startswith("SELECT"):
+            result = await conn.exec_driver_sql(
+                "EXPLAIN (FORMAT JSON) " + statement, parameters
+            )
+            plan = result.scalar()
+            plans.append(
+                (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+            )
+    assert plans, "no SELECT was issued"
+    return plans
+
+
+def _scans(plan):
+    """Yield ``(node type, relation, index)`` for every scan node of a plan."""
+    if "Relation Name" in plan:
+        yield plan["Node Type"], plan["Relation Name"], plan.get("Index Name")
+    for child in plan.get("Plans", []):
+        yield from _scans(child)
+
+
+def assert_index_scans(plans, *tables):
+    """Assert none of ``tables`` is read with a sequential scan."""
+    scans = [scan for plan in plans for scan in _scans(plan)]
+    for table in tables:
+        table_scans = [scan for scan in scans if scan[1] == table]
+        assert table_scans, f"{table} not scanned: {scans}"
+        assert all(node != "Seq Scan" for node, _, _ in table_scans), scans
+
+
+@pytest.mark.asyncio
+async def test_list_portfolios_by_user_uses_index(test_db, seeded):
+    """Listing a user's portfolios does not scan every portfolio."""
+    service = PortfolioService(test_db)
+    user_id = seeded["users"][17]["id"]
+
+    plans = await _explain(test_db, service.list_portfolios(user_id))
+    assert_index_scans(plans, "portfolios")
+
+    first = await service.list_portfolios_page(user_id=user_id, limit=2)
+    plans = await _explain(
+        test_db,
+        service.list_portfolios_page(
+            user_id=user_id, limit=2, cursor=first.next_cursor
+        ),
+    )
+    assert_index_scans(plans, "portfolios")
+
+
+@pytest.mark.asyncio
+async def test_performance_aggregation_uses_index(test_db, seeded):
+    """Performance totals only read the positions of the requested portfolios."""
+    service = PortfolioService(test_db)
+    ids = [portfolio["id"] for portfolio in seeded["portfolios"][100:103]]
+
+    plans = await _explain(test_db, service.calculate_performance_many(ids))
+    assert_index_scans(plans, "portfolios", "positions")
+
+
+@pytest.mark.asyncio
+async def test_order_history_uses_index(test_db, seeded):
+    """A portfolio's orders over a date range come from an index."""
+    service = OrderService(test_db)
+    portfolio_id = seeded["portfolios"][42]["id"]
+
+    plans = await _explain(
+        test_db,
+        service.list_orders_page(
+            portfolio_id=portfolio_id,
+            start_date=START + timedelta(days=100),
+            end_date=START + timedelta(days=200),
+        ),
+    )
+    assert_index_scans(plans, "orders")
+
+    plans = await _explain(
+        test_db, service.list_orders_page(portfolio_id=portfolio_id, symbol="SYM007")
+    )
+    assert_index_scans(plans, "orders")
+
+
+@pytest.mark.asyncio
+async def test_active_recommendations_for_symbol_use_index(test_db, seeded):
+    """Active recommendations of a symbol come from the composite index."""
+    service = RecommendationService(test_db)
+
+    plans = await _explain(
+        test_db, service.list_recommendations_page(symbol="SYM123", status="active")
+    )
+    assert_index_scans(plans, "recommendations")
@@ -0,0 +1,218 @@
+"""Unit tests for AI client."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.integrations.ai_client import AIClient, normalize_features
+from app.services.market_data_cache import MarketDataCache
+
+
+class _FakeCompletions:
+    """Chat completions stub answering after a delay and counting calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, model, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        content = json.dumps(
+            {"action": "hold", "confidence_score": 0.6, "reasoning": model}
+        )
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+
+
+def _client():
+    client = AIClient(cache=MarketDataCache(use_redis=False))
+    completions = _FakeCompletions()
+    client.openai_client = SimpleNamespace(
+        chat=SimpleNamespace(completions=completions)
+    )
+    return client, completions
+
+
+def test_normalize_features():
+    """Test numeric inputs are rounded to significant digits."""
+    assert normalize_features(
+        {
+            "current_price": 189.8437,
+            "market_cap": 2.95312e12,
+            "rsi": 55.55,
+            "macd": -0.012349,
+        }
+    ) == {
+        "current_price": 189.8,
+        "market_cap": 2953000000000,
+        "rsi": 55.55,
+        "macd": -0.01235,
+    }
+
+
+@pytest.mark.asyncio
+async def test_identical_prompts_share_one_request(monkeypatch):
+    """Test equal prompts are answered once, concurrently or not."""
+    client, completions = _client()
+
+    results = await asyncio.gather(
+        *(
+            client.generate_recommendation(
+                "AAPL", {"current_price": 189.8401 + i * 1e-5}
+            )
+            for i in range(200)
+        )
+    )
+    assert completions.calls == 1
+    assert all(result == results[0] for result in results)
+    assert "generated_at" in results[0]
+
+    await client.generate_recommendation("MSFT", {"current_price": 410.0})
+    await client.generate_recommendation(
+        "AAPL", {"current_price": 189.84}, use_cache=False
+    )
+    assert completions.calls == 3
+
+    monkeypatch.setattr(settings, "OPENAI_MODEL", "another-model")
+    assert (await client.generate_recommendation("AAPL", {"current_price": 189.84}))[
+        "reasoning"
+    ] == "another-model"
+    assert completions.calls == 4
+
+
+@pytest.mark.asyncio
+async def test_fallback_answers_are_not_cached():
+    """Test answers without JSON fall back to hold and are asked again."""
+    client, completions = _client()
+
+    async def create(model, messages, **kwargs):
+        completions.calls += 1
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="Unsure."))]
+        )
+
+    completions.create = create
+    for _ in range(2):
+        result = await client.generate_recommendation("AAPL", {"current_price": 1.0})
+        assert (result["action"], result["reasoning"]) == ("hold", "Unsure.")
+    assert completions.calls == 2
+
+
+def test_parse_recommendations():
+    """Test batched answers are mapped back to symbols robustly."""
+    client = AIClient(cache=MarketDataCache(use_redis=False))
+    symbols = ["AAPL", "MSFT", "BRK.B"]
+
+    fenced = """```json
+[{"symbol": "msft", "action": "buy", "reasoning": "a"},
+ {"symbol": "AAPL", "action": "hold", "reasoning": "b"},
+ {"symbol": "BRK.B", "reasoning": "no action"}]
+```"""
+    parsed = client._parse_recommendations(fenced, symbols)
+    assert set(parsed) == {"AAPL", "MSFT"}
+    assert parsed["MSFT"] == {"action": "buy", "reasoning": "a"}
+
+    truncated = '{"recommendations": [{"symbol": "AAPL", "action": "sell", "reasoning": "c"}, {"symbol": "MSFT", "act'
+    assert set(client._parse_recommendations(truncated, symbols)) == {"AAPL"}
+
+    positional = json.dumps(
+        [
+            {"action": action, "reasoning": str(i)}
+            for i, action in enumerate(("buy", "sell", "hold"), 1)
+        ]
+    )
+    assert (
+        client._parse_recommendations(positional, symbols)["BRK.B"]["action"] == "hold"
+    )
+    assert client._parse_recommendations(positional, symbols[:2]) == {}
+
+
+@pytest.mark.asyncio
+async def test_batch_retries_only_unparsed_symbols():
+    """Test a batch is one request, and only dropped symbols are asked again."""
+    client = AIClient(cache=MarketDataCache(use_redis=False))
+    prompts = []
+
+    async def create(model, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        prompts.append(prompt)
+        # The first answer leaves out the last symbol
+        symbols = [s for s in ("AAPL", "MSFT", "NVDA") if f"Symbol: {s}" in prompt][
+            : 2 if len(prompts) == 1 else 3
+        ]
+        content = json.dumps(
+            [{"symbol": s, "action": "buy", "reasoning": s} for s in symbols]
+        )
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+
+    client.openai_client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    analysis = {s: {"current_price": 100.0} for s in ("AAPL", "MSFT", "NVDA")}
+
+    results = await client.generate_recommendations(analysis)
+    assert {s: r["reasoning"] for s, r in results.items()} == {s: s for s in analysis}
+    assert len(prompts) == 2
+    assert (
+        prompts[0].count("Symbol:") == 3 and prompts[0].count("confidence_score") == 1
+    )
+    assert prompts[1].count("Symbol:") == 1 and "Symbol: NVDA" in prompts[1]
+
+    # Batched answers are cached under the single-symbol prompts
+    assert (await client.generate_recommendation("MSFT", {"current_price": 100.0}))[
+        "reasoning"
+    ] == "MSFT"
+    assert len(prompts) == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_recommendation():
+    """Test tokens are yielded as they arrive and the parsed answer is cached."""
+    client = AIClient(cache=MarketDataCache(use_redis=False))
+    content = json.dumps(
+        {"action": "buy", "confidence_score": 0.9, "reasoning": "Streamed"}
+    )
+    calls = []
+
+    async def create(model, messages, stream=False, **kwargs):
+        calls.append(stream)
+
+        async def chunks():
+            for i in range(0, len(content), 8):
+                yield SimpleNamespace(
+                    choices=[
+                        SimpleNamespace(
+                            delta=SimpleNamespace(content=content[i : i + 8])
+                        )
+                    ]
+                )
+            yield SimpleNamespace(choices=[])
+
+        return chunks()
+
+    client.openai_client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+
+    events = [
+        e async for e in client.stream_recommendation("AAPL", {"current_price": 189.84})
+    ]
+    tokens = [e["token"] for e in events if "token" in e]
+    assert len(tokens) > 1 and "".join(tokens) == content
+    assert events[-1]["recommendation"]["reasoning"] == "Streamed"
+    assert calls == [True]
+
+    cached = [
+        e async for e in client.stream_recommendation("AAPL", {"current_price": 189.84})
+    ]
+    assert cached == events[-1:]
+    assert (
+        await client.generate_recommendation("AAPL", {"current_price": 189.84})
+    ) == cached[0]["recommendation"]
+    assert calls == [True]
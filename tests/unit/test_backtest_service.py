@@ -0,0 +1,159 @@
+"""Unit tests for backtest service."""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.schemas.backtest import BacktestRequest, BacktestSweepRequest
+from app.services import backtest_service
+from app.services.backtest_service import (
+    BacktestService,
+    expand_grid,
+    simulate,
+    strategy_signals,
+)
+
+
+def _bars(seed=1, periods=600):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, periods)))
+    index = pd.date_range(
+        "2020-01-02", periods=periods, freq="B", tz="America/New_York"
+    )
+    return pd.DataFrame({"Close": close}, index=index)
+
+
+def _loop_equity(close, signal, capital, fee_rate, fee_per_trade):
+    """Reference per-bar simulation."""
+    equity, position = [capital], 0.0
+    for t in range(1, len(close)):
+        cash = equity[-1]
+        target = signal[t - 1]
+        if target != position:
+            cash -= fee_rate * abs(target - position) * cash + fee_per_trade
+            position = target
+        equity.append(cash * (1 + position * (close[t] / close[t - 1] - 1)))
+    return np.array(equity)
+
+
+@pytest.fixture
+def service():
+    """Create a service that never touches the market data provider."""
+    return BacktestService(market_data=object())
+
+
+def test_vectorized_simulation_matches_loop():
+    """Test closed-form equity matches a per-bar loop, fees included."""
+    close = _bars()["Close"].to_numpy()
+    combos = expand_grid("sma_crossover", {"fast": [5, 10], "slow": [20, 60]})
+    signals = strategy_signals("sma_crossover", close, combos)
+
+    result = simulate(close, signals, 10000.0, fee_rate=0.002, fee_per_trade=1.5)
+
+    for i in range(len(combos)):
+        expected = _loop_equity(close, signals[:, i], 10000.0, 0.002, 1.5)
+        np.testing.assert_allclose(result["equity"][:, i], expected, rtol=1e-9)
+    assert (result["turnover"].sum(axis=0) > 0).all()
+
+
+def test_buy_and_hold_tracks_price(service):
+    """Test buy and hold without fees follows the close from the first bar."""
+    bars = _bars()
+    request = BacktestRequest(symbol="aapl", strategy="buy_and_hold")
+
+    result = service.evaluate(bars, request, expand_grid("buy_and_hold", {}))
+
+    close = bars["Close"].to_numpy()
+    np.testing.assert_allclose(result["best"]["equity"], 10000.0 * close / close[0])
+    assert result["results"][0]["total_return"] == pytest.approx(
+        close[-1] / close[0] - 1
+    )
+    assert result["results"][0]["trades"] == 1
+    assert result["symbol"] == "AAPL"
+
+
+def test_parameter_sweep_is_ranked_and_chunked(service, monkeypatch):
+    """Test every valid combination is run, ranked, and chunking is invisible."""
+    bars = _bars(seed=2)
+    request = BacktestRequest(
+        symbol="AAPL",
+        strategy="rsi",
+        params={"window": [7, 14, 21], "lower": [20, 30], "upper": [60, 70, 15]},
+        fee_rate=0.001,
+        limit=100,
+    )
+    combos = expand_grid(request.strategy, request.params)
+
+    whole = service.evaluate(bars, request, combos)
+    monkeypatch.setattr(backtest_service, "CHUNK_SIZE", 4)
+    chunked = service.evaluate(bars, request, combos)
+
+    # upper=15 is below every lower bound, so those combinations are skipped
+    assert whole["total_runs"] == len(combos) == 12
+    # Combinations that never trade have no Sharpe ratio and rank last
+    sharpes = [
+        r["sharpe"] if r["sharpe"] is not None else -np.inf for r in whole["results"]
+    ]
+    assert sharpes == sorted(sharpes, reverse=True)
+    assert chunked["results"] == whole["results"]
+    assert whole["best"]["params"] == whole["results"][0]["params"]
+
+
+def test_invalid_grid_is_rejected():
+    """Test unknown parameters and empty grids raise ValueError."""
+    with pytest.raises(ValueError, match="Unknown parameters"):
+        expand_grid("sma_crossover", {"window": [10]})
+    with pytest.raises(ValueError, match="No valid parameter combinations"):
+        expand_grid("sma_crossover", {"fast": [50], "slow": [20]})
+
+
+class _FakeMarketData:
+    """Market data stub serving random bars, failing for unknown symbols."""
+
+    def __init__(self, bars):
+        self.bars = bars
+
+    async def get_bars(self, symbol, period, interval):
+        if symbol not in self.bars:
+            raise ValueError(f"No historical data found for {symbol}")
+        return self.bars[symbol]
+
+
+@pytest.mark.asyncio
+async def test_sweep_streams_results_from_worker_processes(monkeypatch):
+    """Test a multi-symbol sweep in worker processes matches in-process runs."""
+    bars = {"AAPL": _bars(seed=3), "MSFT": _bars(seed=4, periods=400)}
+    service = BacktestService(market_data=_FakeMarketData(bars))
+    request = BacktestSweepRequest(
+        symbols=["aapl", "msft", "nope"],
+        params={"fast": [5, 10, 20], "slow": [30, 60, 90]},
+        fee_rate=0.001,
+    )
+    monkeypatch.setattr(backtest_service, "CHUNK_SIZE", 4)
+    monkeypatch.setattr(backtest_service.settings, "BACKTEST_MAX_WORKERS", 1)
+
+    with ProcessPoolExecutor(
+        2, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        messages = [m async for m in service.sweep(request, executor=pool)]
+
+    assert messages[0] == {
+        "symbol": "NOPE",
+        "error": "No historical data found for NOPE",
+    }
+    jobs = [m for m in messages if "runs" in m]
+    # 9 combinations per symbol in blocks of at most 4
+    assert len(jobs) == 6 and jobs[-1]["completed"] == jobs[-1]["total"] == 6
+    summary = messages[-1]
+    assert summary["done"] and summary["total_runs"] == 18
+
+    for symbol, frame in bars.items():
+        alone = service.evaluate(
+            frame,
+            BacktestRequest(symbol=symbol, **request.model_dump(exclude={"symbols"})),
+            expand_grid(request.strategy, request.params),
+        )
+        assert summary["best"][symbol] == alone["results"][0]
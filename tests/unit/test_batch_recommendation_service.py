@@ -0,0 +1,182 @@
+"""Unit tests for batch recommendation service."""
+
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import select
+
+from app.integrations.ai_batch import (
+    FAILED,
+    BatchProvider,
+    FakeBatchProvider,
+    OpenAIBatchProvider,
+)
+from app.integrations.ai_client import AIClient
+from app.models.recommendation import Recommendation
+from app.models.stock import Stock
+from app.services.batch_recommendation_service import (
+    BatchRecommendationService,
+    custom_id,
+    symbol_of,
+)
+from app.services.market_data_cache import MarketDataCache
+from app.services.recommendation_service import RecommendationService
+from app.services.technical_analysis_service import TechnicalAnalysisService
+
+
+class _FakeMarketData:
+    """Market data stub serving flat bars, with some symbols missing."""
+
+    def __init__(self, missing=()):
+        self.cache = MarketDataCache(use_redis=False)
+        self.missing = set(missing)
+
+    async def get_bars(self, symbol, period="1mo", interval="1d"):
+        if symbol in self.missing:
+            raise ValueError(f"No historical data found for {symbol}")
+        close = np.linspace(100, 110, 300)
+        return pd.DataFrame(
+            {"Open": close, "High": close, "Low": close, "Close": close, "Volume": 1e6},
+            index=pd.bdate_range("2023-01-02", periods=300),
+        )
+
+    async def get_stock_info(self, symbol):
+        if symbol in self.missing:
+            raise ValueError(f"No data for {symbol}")
+        return {"symbol": symbol, "market_cap": 1e12, "pe_ratio": 25.0}
+
+
+def test_custom_id_round_trip():
+    """Test symbols survive the batch request IDs."""
+    for symbol in ("AAPL", "BRK.B", "^GSPC", "7203.T"):
+        assert custom_id(symbol).replace("_", "").isalnum()
+        assert symbol_of(custom_id(symbol)) == symbol
+
+
+@pytest.mark.asyncio
+async def test_openai_batch_results():
+    """Test output and error files are mapped back to their requests."""
+    output = [
+        {
+            "custom_id": "a",
+            "response": {
+                "status_code": 200,
+                "body": {"choices": [{"message": {"content": "{}"}}]},
+            },
+        },
+        {
+            "custom_id": "b",
+            "response": {
+                "status_code": 429,
+                "body": {"error": {"message": "Rate limited"}},
+            },
+        },
+    ]
+    errors = [{"custom_id": "c", "response": None, "error": {"message": "Expired"}}]
+    files = {"out": output, "err": errors}
+
+    async def retrieve(batch_id):
+        return SimpleNamespace(output_file_id="out", error_file_id="err")
+
+    async def content(file_id):
+        return SimpleNamespace(
+            text="\n".join(json.dumps(line) for line in files[file_id])
+        )
+
+    client = SimpleNamespace(
+        batches=SimpleNamespace(retrieve=retrieve),
+        files=SimpleNamespace(content=content),
+    )
+    results = await OpenAIBatchProvider(client).results("batch")
+    assert results["a"] == "{}"
+    assert str(results["b"]) == "Rate limited"
+    assert str(results["c"]) == "Expired"
+
+
+@pytest.mark.asyncio
+async def test_expired_batch_keeps_finished_answers():
+    """Test an expired OpenAI batch yields the answers it finished."""
+    answer = json.dumps({"action": "buy", "confidence_score": 0.8, "reasoning": "x"})
+    output = [
+        {
+            "custom_id": custom_id("AAPL"),
+            "response": {
+                "status_code": 200,
+                "body": {"choices": [{"message": {"content": answer}}]},
+            },
+        }
+    ]
+
+    async def retrieve(batch_id):
+        return SimpleNamespace(
+            status="expired", output_file_id="out", error_file_id=None
+        )
+
+    async def content(file_id):
+        return SimpleNamespace(text="\n".join(json.dumps(line) for line in output))
+
+    client = SimpleNamespace(
+        batches=SimpleNamespace(retrieve=retrieve),
+        files=SimpleNamespace(content=content),
+    )
+    provider = OpenAIBatchProvider(client)
+    assert await provider.status("batch") == FAILED
+
+    recommendations = SimpleNamespace(
+        ai_client=AIClient(cache=MarketDataCache(use_redis=False))
+    )
+    service = BatchRecommendationService(None, provider, recommendations)
+    responses, failed, unparsed = await service._collect("batch", poll_interval=0)
+    assert responses["AAPL"]["action"] == "buy"
+    assert failed == {} and unparsed == set()
+
+    with pytest.raises(TypeError):
+        BatchProvider()
+
+
+@pytest.mark.asyncio
+async def test_run_batch(test_db):
+    """Test the universe is submitted once, stored, and cached for reruns."""
+    test_db.add_all(Stock(symbol=s) for s in ("AAA", "BBB", "BAD", "GONE"))
+    await test_db.commit()
+
+    def answer(prompt):
+        if "Symbol: BAD" in prompt:
+            return "I cannot tell."
+        return json.dumps(
+            {"action": "buy", "confidence_score": 0.7, "reasoning": "Batch"}
+        )
+
+    provider = FakeBatchProvider(answer, polls=3)
+    market_data = _FakeMarketData(missing={"GONE"})
+    recommendations = RecommendationService(
+        test_db,
+        ai_client=AIClient(cache=MarketDataCache(use_redis=False)),
+        market_data=market_data,
+        technical=TechnicalAnalysisService(market_data=market_data),
+    )
+    service = BatchRecommendationService(test_db, provider, recommendations)
+
+    stats = await service.run(poll_interval=0)
+    assert stats["submitted"] == 3
+    assert stats["loaded"] == 3
+    assert stats["failed"] == {"GONE": "No market data"}
+    assert provider.batches[stats["batch_id"]]["polls"] == 3
+
+    stored = (await test_db.scalars(select(Recommendation))).all()
+    assert {r.symbol: r.action for r in stored} == {
+        "AAA": "buy",
+        "BBB": "buy",
+        "BAD": "hold",
+    }
+    assert all(r.portfolio_id is None and r.expires_at > r.created_at for r in stored)
+
+    # The fallback answer of BAD is not cached, so it is asked again
+    rerun = await service.run(["AAA", "BBB", "BAD"], poll_interval=0)
+    assert rerun["cached"] == 2 and rerun["submitted"] == 1
+
+    resumed = await service.resume(stats["batch_id"], poll_interval=0)
+    assert resumed["loaded"] == 3
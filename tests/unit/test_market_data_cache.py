@@ -0,0 +1,125 @@
+"""Unit tests for market data cache."""
+
+import asyncio
+import json
+
+import pytest
+
+from app.services.market_data_cache import (
+    LOCK_POLL_INTERVAL,
+    MarketDataCache,
+    history_ttl,
+)
+
+
+class BrokenRedis:
+    """Redis stand-in whose pipelines always fail."""
+
+    def pipeline(self, transaction=True):
+        raise ConnectionError("redis down")
+
+
+class LockedRedis:
+    """Redis stand-in where another worker holds the fetch lock.
+
+    That worker stores the value as soon as the lock is tried.
+    """
+
+    def __init__(self, value):
+        self.value = value
+        self.data = {}
+        self.reads = 0
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+    async def set(self, key, value, nx=False, px=None):
+        self.data[key.replace(":lock:", ":", 1)] = json.dumps(self.value)
+        return None
+
+
+class _Pipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def get(self, key):
+        self.ops.append(lambda: self.redis.data.get(key))
+        return self
+
+    def pttl(self, key):
+        self.ops.append(lambda: 60000 if key in self.redis.data else -2)
+        return self
+
+    def exists(self, key):
+        self.ops.append(lambda: 1)
+        return self
+
+    async def execute(self):
+        self.redis.reads += 1
+        return [op() for op in self.ops]
+
+
+@pytest.mark.asyncio
+async def test_lru_evicts_least_recently_used():
+    """Test the local tier is bounded and evicts in LRU order."""
+    cache = MarketDataCache(max_entries=2, use_redis=False)
+
+    await cache.set("a", 1, ttl=60)
+    await cache.set("b", 2, ttl=60)
+    assert await cache.get("a") == 1
+    await cache.set("c", 3, ttl=60)
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == 1
+    assert await cache.get("c") == 3
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_misses():
+    """Test entries past their TTL are not served."""
+    cache = MarketDataCache(use_redis=False)
+
+    await cache.set("quote:AAPL", {"price": 1.0}, ttl=0)
+
+    assert await cache.get("quote:AAPL") is None
+    assert cache.get_stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_errors_fall_back_to_loader():
+    """Test a broken Redis tier degrades to local caching."""
+    cache = MarketDataCache(redis=BrokenRedis())
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        return {"price": 10.0}
+
+    assert await cache.get_or_load("quote:MSFT", 60, loader) == {"price": 10.0}
+    assert await cache.get_or_load("quote:MSFT", 60, loader) == {"price": 10.0}
+
+    assert len(loads) == 1
+    assert cache.get_stats()["redis_errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_lock_waiters_keep_value_locally():
+    """Test a value loaded by another worker is kept for the requested TTL."""
+    redis = LockedRedis({"price": 10.0})
+    cache = MarketDataCache(redis=redis, distributed_lock=True)
+
+    async def loader():
+        raise AssertionError("loaded by the lock holder")
+
+    assert await cache.get_or_load("quote:MSFT", 60, loader) == {"price": 10.0}
+    reads = redis.reads
+    await asyncio.sleep(LOCK_POLL_INTERVAL * 2)
+    assert await cache.get_or_load("quote:MSFT", 60, loader) == {"price": 10.0}
+    assert redis.reads == reads
+    assert cache.get_stats()["local_hits"] == 1
+
+
+def test_history_ttl_by_interval():
+    """Test intraday bars expire sooner than daily bars."""
+    assert history_ttl("5m") < history_ttl("1d")
@@ -0,0 +1,215 @@
+"""Unit tests for market data service."""
+
+import asyncio
+import time
+
+import pandas as pd
+import pytest
+
+from app.core.config import settings
+from app.services.bar_store import BarStore
+from app.services.market_data_cache import MarketDataCache
+from app.services.market_data_service import MarketDataService
+
+
+@pytest.fixture(autouse=True)
+def bar_store_path(tmp_path, monkeypatch):
+    """Keep the bar store of every service under test in a temp directory."""
+    monkeypatch.setattr(settings, "MARKET_DATA_STORE_PATH", str(tmp_path / "bars"))
+
+
+def _bars(closes):
+    """Build a provider-shaped OHLCV frame."""
+    index = pd.date_range("2024-01-02", periods=len(closes), freq="D", tz="UTC")
+    return pd.DataFrame(
+        {
+            "Open": closes,
+            "High": closes,
+            "Low": closes,
+            "Close": closes,
+            "Volume": [1000] * len(closes),
+        },
+        index=index,
+    )
+
+
+@pytest.mark.asyncio
+async def test_provider_calls_do_not_block_event_loop(monkeypatch):
+    """Test blocking provider calls run off the event loop."""
+
+    def slow_history(symbol, **kwargs):
+        time.sleep(0.3)
+        return _bars([100.0, 101.0])
+
+    monkeypatch.setattr(MarketDataService, "_fetch_history", staticmethod(slow_history))
+    service = MarketDataService(cache=MarketDataCache(use_redis=False))
+
+    ticks = 0
+
+    async def heartbeat():
+        nonlocal ticks
+        for _ in range(5):
+            await asyncio.sleep(0.02)
+            ticks += 1
+
+    price, _ = await asyncio.gather(service.get_current_price("aapl"), heartbeat())
+
+    assert price["symbol"] == "AAPL"
+    assert price["price"] == 101.0
+    assert ticks == 5
+
+
+@pytest.mark.asyncio
+async def test_provider_call_timeout(monkeypatch):
+    """Test provider calls are bounded by the service timeout."""
+
+    def hanging_history(symbol, **kwargs):
+        time.sleep(0.5)
+        return _bars([100.0])
+
+    monkeypatch.setattr(
+        MarketDataService, "_fetch_history", staticmethod(hanging_history)
+    )
+    service = MarketDataService(timeout=0.05, cache=MarketDataCache(use_redis=False))
+
+    with pytest.raises(asyncio.TimeoutError):
+        await service.get_current_price("AAPL")
+
+
+@pytest.mark.asyncio
+async def test_batch_quotes_chunks_and_reports_errors(monkeypatch):
+    """Test batch quotes return partial results with per-symbol errors."""
+    calls = []
+
+    def batch_history(symbols, **kwargs):
+        calls.append(list(symbols))
+        frames = {s: _bars([10.0, 11.0]) for s in symbols if s != "BAD"}
+        return pd.concat(frames, axis=1)
+
+    monkeypatch.setattr(settings, "MARKET_DATA_BATCH_SIZE", 2)
+    monkeypatch.setattr(
+        MarketDataService, "_fetch_batch_history", staticmethod(batch_history)
+    )
+    service = MarketDataService(cache=MarketDataCache(use_redis=False))
+
+    result = await service.get_batch_quotes(["aapl", "MSFT", "BAD", "aapl"])
+
+    assert sorted(map(len, calls)) == [1, 2]
+    assert set(result["quotes"]) == {"AAPL", "MSFT"}
+    assert result["quotes"]["AAPL"]["price"] == 11.0
+    assert set(result["errors"]) == {"BAD"}
+    assert result["total_requested"] == 3
+
+
+@pytest.mark.asyncio
+async def test_repeated_quotes_are_served_from_cache(monkeypatch):
+    """Test a cached quote is reused instead of refetched."""
+    calls = []
+
+    def history(symbol, **kwargs):
+        calls.append(symbol)
+        return _bars([100.0, 101.0])
+
+    monkeypatch.setattr(MarketDataService, "_fetch_history", staticmethod(history))
+    service = MarketDataService(cache=MarketDataCache(use_redis=False))
+
+    first = await service.get_current_price("AAPL")
+    second = await service.get_current_price("aapl")
+    batch = await service.get_batch_quotes(["AAPL"])
+
+    assert first == second == batch["quotes"]["AAPL"]
+    assert calls == ["AAPL"]
+    stats = service.cache.get_stats()
+    assert stats["local_hits"] == 2
+    assert stats["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_history_formats_share_the_same_bars(monkeypatch):
+    """Test row, columnar and Arrow history outputs agree."""
+    bars = _bars([100.0, 101.5, 99.25])
+    bars.index = bars.index.tz_convert("America/New_York")
+    monkeypatch.setattr(
+        MarketDataService, "_fetch_history", staticmethod(lambda symbol, **kw: bars)
+    )
+    service = MarketDataService(cache=MarketDataCache(use_redis=False))
+
+    rows = await service.get_historical_data("AAPL", "5d", "1d")
+    columnar = await service.get_historical_data("AAPL", "5d", "1d", format="columnar")
+    table = await service.get_historical_table("AAPL", "5d", "1d")
+
+    assert rows["data"][1] == {
+        "date": bars.index[1].isoformat(),
+        "open": 101.5,
+        "high": 101.5,
+        "low": 101.5,
+        "close": 101.5,
+        "volume": 1000,
+    }
+    assert columnar["data"]["date"] == [ts.isoformat() for ts in bars.index]
+    assert columnar["data"]["close"] == [100.0, 101.5, 99.25]
+    assert table.column("close").to_pylist() == columnar["data"]["close"]
+    assert table.num_rows == rows["total_records"] == 3
+
+
+@pytest.mark.asyncio
+async def test_bar_store_fetches_only_missing_tail(monkeypatch, tmp_path):
+    """Test stored history is reused and only the tail is refetched."""
+    index = pd.date_range(
+        end=pd.Timestamp.now(tz="UTC").normalize(), periods=300, freq="D"
+    )
+    full = _bars([float(i) for i in range(300)])
+    full.index = index
+    calls = []
+
+    def history(symbol, **kwargs):
+        calls.append(kwargs)
+        if "start" in kwargs:
+            tail = full.loc[kwargs["start"] :].copy()
+            tail["Close"] = tail["Close"] + 0.5
+            return tail
+        return full.iloc[:-1]
+
+    monkeypatch.setattr(MarketDataService, "_fetch_history", staticmethod(history))
+    store = BarStore(str(tmp_path / "store"))
+    service = MarketDataService(cache=MarketDataCache(use_redis=False), store=store)
+
+    first = await service.get_bars("AAPL", "6mo", "1d")
+    second = await service.get_bars("AAPL", "3mo", "1d")
+    assert [c.get("period") for c in calls] == ["6mo"]
+    assert second.index[-1] == first.index[-1]
+
+    monkeypatch.setattr(settings, "REDIS_CACHE_TTL", 0)
+    refreshed = await service.get_bars("AAPL", "6mo", "1d")
+
+    assert calls[-1]["start"] == first.index[-1]
+    assert refreshed.index[-1] == full.index[-1]
+    assert refreshed.index.is_unique
+    assert refreshed["Close"].iloc[-1] == 299.5
+    assert refreshed["Close"].iloc[0] == first["Close"].iloc[0]
+
+
+@pytest.mark.asyncio
+async def test_bar_store_serves_stale_bars_when_provider_fails(monkeypatch, tmp_path):
+    """Test stored bars are served while the provider is failing."""
+    bars = _bars([1.0, 2.0, 3.0])
+    bars.index = pd.date_range(
+        end=pd.Timestamp.now(tz="UTC").normalize(), periods=3, freq="D"
+    )
+    monkeypatch.setattr(
+        MarketDataService, "_fetch_history", staticmethod(lambda symbol, **kw: bars)
+    )
+    service = MarketDataService(
+        cache=MarketDataCache(use_redis=False), store=BarStore(str(tmp_path / "store"))
+    )
+    await service.get_bars("MSFT", "1mo", "1d")
+
+    def throttled(symbol, **kwargs):
+        raise RuntimeError("Too Many Requests")
+
+    monkeypatch.setattr(MarketDataService, "_fetch_history", staticmethod(throttled))
+    monkeypatch.setattr(settings, "REDIS_CACHE_TTL", 0)
+
+    stale = await service.get_bars("MSFT", "1mo", "1d")
+
+    assert stale["Close"].tolist() == [1.0, 2.0, 3.0]
@@ -0,0 +1,159 @@
+"""Unit tests for portfolio optimizer."""
+
+from uuid import uuid4
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.models.position import Position
+from app.services.market_data_cache import MarketDataCache
+from app.services.optimizer import (
+    OptimizerService,
+    optimize_weights,
+    project_capped_simplex,
+    risk_parity,
+    solve_quadratic,
+)
+
+
+def _closes(days=300, seed=0):
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0, 0.01, days)
+    returns = {
+        "AAA": market + rng.normal(0, 0.01, days),
+        "BBB": 0.5 * market + rng.normal(0, 0.02, days),
+        "CCC": rng.normal(0.001, 0.005, days),
+    }
+    index = pd.bdate_range("2024-01-01", periods=days)
+    return pd.DataFrame(
+        {s: 100 * np.cumprod(1 + r) for s, r in returns.items()}, index=index
+    )
+
+
+def test_project_capped_simplex():
+    """Test the projection against a bisection on the threshold."""
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        n = int(rng.integers(1, 20))
+        v = rng.normal(0, 1, n)
+        upper = max(rng.uniform(0.05, 1), 1 / n)
+        low, high = v.min() - upper, v.max()
+        for _ in range(100):
+            tau = (low + high) / 2
+            low, high = (
+                (tau, high) if np.clip(v - tau, 0, upper).sum() > 1 else (low, tau)
+            )
+
+        np.testing.assert_allclose(
+            project_capped_simplex(v, upper), np.clip(v - low, 0, upper), atol=1e-9
+        )
+
+    with pytest.raises(ValueError):
+        project_capped_simplex(np.zeros(3), 0.3)
+
+
+def test_solvers():
+    """Test minimum variance and risk parity against their definitions."""
+    rng = np.random.default_rng(2)
+    cov = np.cov(rng.normal(0, 0.1, (300, 10)).T) + 0.01 * np.eye(10)
+
+    weights, _, converged = solve_quadratic(cov, np.zeros(10))
+    inverse = np.linalg.solve(cov, np.ones(10))
+    assert converged
+    np.testing.assert_allclose(weights, inverse / inverse.sum(), atol=1e-6)
+    # Warm-started from its own solution, the solver stops at once
+    assert solve_quadratic(cov, np.zeros(10), start=weights)[1] == 1
+
+    capped, _, _ = solve_quadratic(cov, np.zeros(10), upper=0.12)
+    assert capped.max() <= 0.12 + 1e-9
+    assert capped.sum() == pytest.approx(1)
+
+    weights, _, converged = risk_parity(cov)
+    contributions = weights * (cov @ weights)
+    assert converged
+    np.testing.assert_allclose(contributions, contributions.mean(), rtol=1e-6)
+
+
+def test_optimize_weights_constraints():
+    """Test the weight cap, turnover cap and excluded symbols."""
+    returns = _closes().pct_change().iloc[1:]
+    returns["NEW"] = np.nan
+    current = pd.Series({"AAA": 0.6, "BBB": 0.2, "CCC": 0.0, "NEW": 0.2})
+
+    result = optimize_weights(returns, current, "mean_variance", max_weight=0.5)
+    weights = result["weights"]
+    assert result["excluded"] == {"NEW": "insufficient history"}
+    assert weights["NEW"]["target"] == 0.2
+    assert sum(w["target"] for w in weights.values()) == pytest.approx(1)
+    assert max(w["target"] for w in weights.values()) <= 0.5 + 1e-6
+    assert result["target"]["volatility"] < result["current"]["volatility"]
+
+    capped = optimize_weights(
+        returns, current, "mean_variance", max_weight=0.5, turnover=0.1
+    )
+    assert capped["turnover"] == pytest.approx(0.1)
+    assert sum(
+        abs(w["target"] - w["current"]) for w in capped["weights"].values()
+    ) == pytest.approx(0.1, abs=1e-5)
+
+    with pytest.raises(ValueError):
+        optimize_weights(returns, current, "max_sharpe")
+
+
+class _FakeMarketData:
+    """Market data stub serving fixed bars and counting loads."""
+
+    def __init__(self, closes):
+        self.closes = closes
+        self.cache = MarketDataCache(use_redis=False)
+        self.loads = 0
+
+    async def get_bars(self, symbol, period="1mo", interval="1d"):
+        self.loads += 1
+        if symbol not in self.closes:
+            raise ValueError(f"No historical data found for {symbol}")
+        return self.closes[[symbol]].rename(columns={symbol: "Close"})
+
+
+@pytest.mark.asyncio
+async def test_propose(test_db, create_portfolio):
+    """Test proposals are cached, warm-started and include candidates."""
+    portfolio = await create_portfolio("Optimize")
+    position = Position(
+        portfolio_id=portfolio.id, symbol="AAA", quantity=10, average_cost=100
+    )
+    test_db.add_all(
+        [
+            position,
+            Position(
+                portfolio_id=portfolio.id, symbol="BBB", quantity=10, average_cost=100
+            ),
+        ]
+    )
+    await test_db.commit()
+    market_data = _FakeMarketData(_closes())
+    service = OptimizerService(test_db, market_data)
+
+    proposal = await service.propose(portfolio.id, "min_variance", symbols=["ccc"])
+    weights = proposal["weights"]
+    assert set(weights) == {"AAA", "BBB", "CCC"}
+    assert weights["CCC"]["current"] == 0
+    assert weights["CCC"]["target"] > 0
+    assert sum(w["trade_value"] for w in weights.values()) == pytest.approx(0, abs=0.05)
+    assert "solution" not in proposal
+
+    assert (
+        await service.propose(portfolio.id, "min_variance", symbols=["CCC"]) == proposal
+    )
+    assert market_data.loads == 3
+
+    position.quantity = 20
+    await test_db.commit()
+    moved = await service.propose(portfolio.id, "min_variance", symbols=["CCC"])
+    assert moved["iterations"] == 1
+    assert moved["weights"]["AAA"]["target"] == pytest.approx(
+        weights["AAA"]["target"], abs=1e-6
+    )
+
+    assert await service.propose(uuid4()) is None
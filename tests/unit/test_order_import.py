@@ -0,0 +1,86 @@
+"""Unit tests for bulk order import."""
+
+import io
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import select
+
+from app.models.position import Position
+from app.schemas.order import OrderCreate
+from app.services.order_import import (
+    OrderImporter,
+    idempotency_key,
+    read_csv,
+    read_ndjson,
+)
+
+
+STATEMENT = b"""\xef\xbb\xbfsymbol,side,quantity,price,fees,order_date,notes
+AAPL,buy,10,100,1,2025-01-02T10:00:00,
+AAPL,buy,10,100,1,2025-01-02T10:00:00,"split
+fill"
+AAPL,sell,5,120,,2025-01-03T10:00:00,
+MSFT,hold,1,300,,2025-01-03T10:00:00,
+"""
+
+
+def test_readers_parse_uploads():
+    """Test CSV and NDJSON rows are parsed, with empty cells omitted."""
+    rows = list(read_csv(io.BytesIO(STATEMENT)))
+    assert len(rows) == 4
+    assert rows[0] == {
+        "symbol": "AAPL",
+        "side": "buy",
+        "quantity": "10",
+        "price": "100",
+        "fees": "1",
+        "order_date": "2025-01-02T10:00:00",
+    }
+    assert rows[1]["notes"] == "split\nfill"
+
+    rows = list(read_ndjson(io.BytesIO(b'{"symbol": "AAPL"}\n\n{oops\n[1, 2]\n"x"\n')))
+    assert rows[0] == {"symbol": "AAPL"}
+    assert rows[1]["_error"].startswith("line 3: Invalid JSON")
+    assert rows[2] == {"_error": "line 4: expected a JSON object"}
+    assert rows[3] == {"_error": "line 5: expected a JSON object"}
+
+
+def test_idempotency_key_is_stable_per_occurrence():
+    """Test identical rows get distinct keys that repeat across uploads."""
+    order = OrderCreate(
+        portfolio_id=uuid4(),
+        symbol="aapl",
+        side="buy",
+        quantity=1,
+        price=10,
+        order_date="2025-01-02T10:00:00",
+    )
+    same = order.model_copy(update={"symbol": "AAPL"})
+    assert idempotency_key(order, 1) == idempotency_key(same, 1)
+    assert idempotency_key(order, 1) != idempotency_key(order, 2)
+
+
+@pytest.mark.asyncio
+async def test_import_orders_skips_duplicates(test_db, create_portfolio):
+    """Test re-importing a statement inserts nothing and positions are rebuilt."""
+    portfolio = await create_portfolio("Import")
+    importer = OrderImporter(test_db)
+
+    stats = await importer.import_orders(
+        read_csv(io.BytesIO(STATEMENT)), portfolio_id=portfolio.id
+    )
+    assert (stats["received"], stats["inserted"], stats["invalid"]) == (4, 3, 1)
+    assert stats["errors"][0]["row"] == 4
+
+    stats = await importer.import_orders(
+        read_csv(io.BytesIO(STATEMENT)), portfolio_id=portfolio.id
+    )
+    assert (stats["inserted"], stats["duplicates"]) == (0, 3)
+
+    position = await test_db.scalar(
+        select(Position).where(Position.portfolio_id == portfolio.id)
+    )
+    assert position.quantity == 15
+    assert float(position.average_cost) == pytest.approx(100.1)
+    assert float(position.realized_pnl) == pytest.approx(99.5)
@@ -0,0 +1,65 @@
+"""Unit tests for keyset pagination."""
+
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from app.models.portfolio import Portfolio
+from app.schemas.portfolio import Portfolio as PortfolioSchema
+from app.services.pagination import decode_cursor, encode_cursor, parse_fields
+from app.services.portfolio_service import PortfolioService
+
+
+def test_cursor_round_trip_and_validation():
+    """Cursors decode to the row they were built from; garbage is rejected."""
+    created_at, id = datetime(2025, 1, 2, 3, 4, 5, 678), uuid4()
+    assert decode_cursor(encode_cursor(created_at, id)) == (created_at, id)
+
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+    with pytest.raises(ValueError):
+        parse_fields("name,password", PortfolioSchema)
+    assert parse_fields(" name, id,name", PortfolioSchema) == ["name", "id"]
+
+
+@pytest.mark.asyncio
+async def test_list_portfolios_page(test_db, test_user):
+    """Pages follow (created_at, id) order without gaps or repeats."""
+    user_id = test_user.id
+    start = datetime(2025, 1, 1)
+    # Two portfolios share a timestamp so the id tie-break is exercised
+    for i in range(5):
+        test_db.add(
+            Portfolio(
+                user_id=user_id,
+                name=f"P{i}",
+                type="virtual",
+                created_at=start + timedelta(days=min(i, 3)),
+            )
+        )
+    await test_db.commit()
+    service = PortfolioService(test_db)
+
+    seen, cursor = [], None
+    while True:
+        page = await service.list_portfolios_page(
+            user_id=user_id, limit=2, cursor=cursor
+        )
+        seen.extend(page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    keys = [(p.created_at, p.id) for p in seen]
+    assert len(keys) == 5
+    assert keys == sorted(keys, reverse=True)
+
+    page = await service.list_portfolios_page(
+        user_id=user_id,
+        start_date=start + timedelta(days=1),
+        end_date=start + timedelta(days=3),
+        fields=["name"],
+    )
+    assert page.items == [{"name": "P2"}, {"name": "P1"}]
+    assert page.next_cursor is None
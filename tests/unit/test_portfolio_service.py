@@ -1,17 +1,20 @@
 """Unit tests for portfolio service."""
 
-import pytest
 from uuid import uuid4
-from app.services.portfolio_service import PortfolioService
+
+import pytest
+
+from app.models.position import Position
 from app.schemas.portfolio import PortfolioCreate
+from app.services.portfolio_service import PortfolioService
 
 
 @pytest.mark.asyncio
-async def test_create_portfolio(test_db):
+async def test_create_portfolio(test_db, test_user):
     """Test portfolio creation."""
     service = PortfolioService(test_db)
     portfolio_data = PortfolioCreate(
-        user_id=uuid4(),
+        user_id=test_user.id,
         name="Test Portfolio",
         type="virtual",
         currency="USD",
@@ -36,10 +39,10 @@ async def test_list_portfolios(test_db):
 
 
 @pytest.mark.asyncio
-async def test_calculate_performance(test_db):
+async def test_calculate_performance(test_db, test_user):
     """Test portfolio performance calculation."""
     service = PortfolioService(test_db)
-    user_id = uuid4()
+    user_id = test_user.id
 
     # Create a test portfolio
     portfolio_data = PortfolioCreate(
@@ -56,3 +59,51 @@ async def test_calculate_performance(test_db):
     assert "total_value" in performance
     assert "total_return_percent" in performance
     assert performance["num_positions"] == 0
+
+
+@pytest.mark.asyncio
+async def test_calculate_performance_many(test_db, test_user):
+    """Test bulk performance sums positions per portfolio in SQL."""
+    service = PortfolioService(test_db)
+    user_id = test_user.id
+    first = await service.create_portfolio(
+        PortfolioCreate(user_id=user_id, name="First", type="virtual")
+    )
+    second = await service.create_portfolio(
+        PortfolioCreate(user_id=user_id, name="Second", type="virtual")
+    )
+    test_db.add_all(
+        [
+            Position(
+                portfolio_id=first.id,
+                symbol="AAPL",
+                quantity=10,
+                average_cost=100,
+                market_value=1200,
+                unrealized_pnl=200,
+            ),
+            Position(
+                portfolio_id=first.id,
+                symbol="MSFT",
+                quantity=5,
+                average_cost=200,
+                market_value=900,
+                unrealized_pnl=-100,
+            ),
+        ]
+    )
+    await test_db.commit()
+
+    assert set(await service.list_portfolio_ids(user_id)) == {first.id, second.id}
+    missing = uuid4()
+    performance = await service.calculate_performance_many(
+        [first.id, second.id, missing]
+    )
+
+    assert set(performance) == {first.id, second.id}
+    assert performance[first.id]["total_value"] == 2100.0
+    assert performance[first.id]["total_cost"] == 2000.0
+    assert performance[first.id]["total_return_percent"] == 5.0
+    assert performance[first.id]["num_positions"] == 2
+    assert performance[second.id]["num_positions"] == 0
+    assert performance[second.id]["total_return_percent"] == 0.0
@@ -0,0 +1,163 @@
+"""Unit tests for the position ledger."""
+
+import random
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+from app.models.position import Position
+from app.schemas.order import OrderCreate
+from app.services.position_ledger import PositionLedger, apply_fill, replay_orders
+
+
+def test_apply_fill_average_cost():
+    """Test buys average the cost in and sells realize against it."""
+    state = (Decimal("0"), None, Decimal("0"))
+    state = apply_fill(*state, "buy", Decimal("10"), Decimal("100"), Decimal("5"))
+    assert state == (Decimal("10"), Decimal("100.5000"), Decimal("0"))
+    state = apply_fill(*state, "buy", Decimal("10"), Decimal("120"))
+    assert state[1] == Decimal("110.2500")
+    state = apply_fill(*state, "sell", Decimal("5"), Decimal("130"), Decimal("1"))
+    assert state == (Decimal("15"), Decimal("110.2500"), Decimal("97.75"))
+    state = apply_fill(*state, "sell", Decimal("15"), Decimal("100"))
+    assert state == (Decimal("0"), None, Decimal("-56.00"))
+
+    with pytest.raises(ValueError):
+        apply_fill(*state, "sell", Decimal("1"), Decimal("100"))
+
+
+def test_replay_matches_incremental_fills():
+    """Test the vectorized replay agrees with applying fills one by one."""
+    rng = random.Random(7)
+    rows, expected = [], {}
+    for portfolio_id in range(3):
+        for symbol in ("AAA", "BBB"):
+            state = (Decimal("0"), None, Decimal("0"))
+            for _ in range(150):
+                held = state[0]
+                side = "buy" if held == 0 or rng.random() < 0.55 else "sell"
+                if side == "buy":
+                    quantity = Decimal(rng.randint(1, 50000)) / 10000
+                elif rng.random() < 0.1:
+                    quantity = held
+                else:
+                    quantity = (held * Decimal(rng.random())).quantize(
+                        Decimal("0.0001")
+                    )
+                if quantity == 0:
+                    continue
+                price = Decimal(rng.randint(5000, 20000)) / 100
+                fees = Decimal(rng.randint(0, 300)) / 100
+                state = apply_fill(*state, side, quantity, price, fees)
+                rows.append((portfolio_id, symbol, side, quantity, price, fees))
+            expected[(portfolio_id, symbol)] = state
+
+    orders = pd.DataFrame(
+        rows, columns=["portfolio_id", "symbol", "side", "quantity", "price", "fees"]
+    )
+    ledger = replay_orders(orders)
+
+    assert len(ledger) == len(expected)
+    for row in ledger.itertuples():
+        quantity, average_cost, realized_pnl = expected[(row.portfolio_id, row.symbol)]
+        assert row.quantity == pytest.approx(float(quantity))
+        if average_cost is None:
+            assert pd.isna(row.average_cost)
+        else:
+            assert row.average_cost == pytest.approx(float(average_cost), abs=1e-3)
+        # The incremental path rounds the stored average cost at every fill
+        assert row.realized_pnl == pytest.approx(float(realized_pnl), abs=0.1)
+
+
+@pytest.mark.asyncio
+async def test_record_backdated_fill_rebuilds_position(test_db, create_portfolio):
+    """Test fills update positions in place, and late fills trigger a rebuild."""
+    portfolio = await create_portfolio("Ledger")
+    ledger = PositionLedger(test_db)
+    day = datetime(2025, 3, 3)
+
+    def fill(side, quantity, price, days):
+        return OrderCreate(
+            portfolio_id=portfolio.id,
+            symbol="aapl",
+            side=side,
+            quantity=quantity,
+            price=price,
+            order_date=day + timedelta(days=days),
+        )
+
+    orders = await ledger.record([fill("buy", 10, 100, 0), fill("sell", 4, 130, 2)])
+    position = await test_db.get(Position, orders[0].position_id)
+    assert {order.position_id for order in orders} == {position.id}
+    assert (position.quantity, position.average_cost, position.realized_pnl) == (
+        6,
+        100,
+        120,
+    )
+
+    # Bought before the sale: the sale realized against a different cost
+    await ledger.record([fill("buy", 10, 120, 1)])
+    await test_db.refresh(position)
+    assert position.quantity == 16
+    assert float(position.average_cost) == pytest.approx(110.0)
+    assert float(position.realized_pnl) == pytest.approx(80.0)
+
+
+@pytest.mark.asyncio
+async def test_record_aware_order_date(test_db, create_portfolio):
+    """Test aware order dates are compared and stored as naive UTC."""
+    portfolio = await create_portfolio("Aware")
+    ledger = PositionLedger(test_db)
+    plus_two = timezone(timedelta(hours=2))
+
+    def fill(side, order_date):
+        return OrderCreate(
+            portfolio_id=portfolio.id,
+            symbol="MSFT",
+            side=side,
+            quantity=5,
+            price=300,
+            order_date=order_date,
+        )
+
+    await ledger.record([fill("buy", datetime(2025, 3, 3, 15, 30))])
+    orders = await ledger.record(
+        [fill("sell", datetime(2025, 3, 4, 16, 0, tzinfo=plus_two))]
+    )
+    assert orders[0].order_date == datetime(2025, 3, 4, 14, 0)
+
+    position = await test_db.get(Position, orders[0].position_id)
+    assert position.quantity == 0
+
+
+@pytest.mark.asyncio
+async def test_rebuild_restores_positions(test_db, create_portfolio):
+    """Test a rebuild recomputes positions from the order history."""
+    portfolio = await create_portfolio("Rebuild")
+    ledger = PositionLedger(test_db)
+    orders = await ledger.record(
+        [
+            OrderCreate(
+                portfolio_id=portfolio.id,
+                symbol="NVDA",
+                side=side,
+                quantity=quantity,
+                price=price,
+                order_date=datetime(2025, 3, 3 + day),
+            )
+            for day, (side, quantity, price) in enumerate(
+                [("buy", 10, 100), ("buy", 10, 200), ("sell", 5, 180)]
+            )
+        ]
+    )
+    position = await test_db.get(Position, orders[0].position_id)
+    position.quantity, position.average_cost, position.realized_pnl = 1, 1, 0
+    await test_db.commit()
+
+    assert await ledger.rebuild(portfolio_id=portfolio.id, commit=True) == 1
+    await test_db.refresh(position)
+    assert position.quantity == 15
+    assert float(position.average_cost) == pytest.approx(150.0)
+    assert float(position.realized_pnl) == pytest.approx(150.0)
@@ -0,0 +1,242 @@
+"""Unit tests for recommendation service."""
+
+import asyncio
+import time
+from uuid import uuid4
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.config import settings
+from app.models.position import Position
+from app.services.market_data_cache import MarketDataCache
+from app.services.recommendation_service import (
+    RecommendationService,
+    recommendation_draft,
+)
+from app.services.technical_analysis_service import TechnicalAnalysisService
+
+
+class _FakeMarketData:
+    """Market data stub serving random-walk bars and fixed fundamentals."""
+
+    def __init__(self, missing=()):
+        self.cache = MarketDataCache(use_redis=False)
+        self.missing = set(missing)
+
+    async def get_bars(self, symbol, period="1mo", interval="1d"):
+        if symbol in self.missing:
+            raise ValueError(f"No historical data found for {symbol}")
+        index = pd.bdate_range("2023-01-02", periods=300)
+        close = 100 * np.cumprod(1 + np.random.default_rng(0).normal(0, 0.01, 300))
+        return pd.DataFrame(
+            {"Open": close, "High": close, "Low": close, "Close": close, "Volume": 1e6},
+            index=index,
+        )
+
+    async def get_stock_info(self, symbol):
+        if symbol in self.missing:
+            raise ValueError(f"No data for {symbol}")
+        return {
+            "symbol": symbol,
+            "market_cap": 1e12,
+            "pe_ratio": 25.0,
+            "current_price": None,
+        }
+
+
+class _FakeAIClient:
+    """AI client stub with a fixed latency that tracks concurrent requests."""
+
+    def __init__(self, latency=0.1):
+        self.latency = latency
+        self.in_flight = 0
+        self.peak = 0
+        self.prompts = {}
+
+    def is_available(self, provider):
+        return provider == "openai"
+
+    async def _request(self, analysis):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        self.prompts.update(analysis)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return {symbol: self._response(symbol) for symbol in analysis}
+
+    @staticmethod
+    def _response(symbol):
+        if symbol == "BAD":
+            return {"action": "maybe", "reasoning": "Unclear"}
+        return {
+            "action": "BUY",
+            "confidence_score": 0.8,
+            "target_price": 120.0,
+            "time_horizon": "Medium-Term",
+            "reasoning": f"{symbol} looks strong",
+        }
+
+    async def generate_recommendation(self, symbol, analysis_data, provider="openai"):
+        return (await self._request({symbol: analysis_data}))[symbol]
+
+    async def generate_recommendations(self, analysis, provider="openai"):
+        return await self._request(analysis)
+
+    async def stream_recommendation(self, symbol, analysis_data, provider="openai"):
+        self.prompts[symbol] = analysis_data
+        response = self._response(symbol)
+        for word in response["reasoning"].split():
+            await asyncio.sleep(self.latency)
+            yield {"token": word + " "}
+        yield {"recommendation": response}
+
+
+def test_draft_normalizes_ai_response():
+    """Test AI responses are normalized before validation."""
+    draft = recommendation_draft(
+        {
+            "action": " Sell ",
+            "reasoning": "Overvalued",
+            "stop_loss": "",
+            "time_horizon": None,
+        }
+    )
+    assert draft.action == "sell"
+    assert draft.stop_loss is None
+
+    with pytest.raises(ValueError):
+        recommendation_draft(
+            {"action": "sell", "confidence_score": 1.5, "reasoning": "Sure"}
+        )
+
+
+@pytest.mark.asyncio
+async def test_generate_for_portfolio(test_db, create_portfolio):
+    """Test position batches are fanned out concurrently and stored at once."""
+    portfolio = await create_portfolio("Generate")
+    symbols = [f"S{i:02d}" for i in range(40)] + ["BAD", "GONE"]
+    test_db.add_all(
+        Position(portfolio_id=portfolio.id, symbol=s, quantity=1, average_cost=100)
+        for s in symbols
+    )
+    await test_db.commit()
+    market_data = _FakeMarketData(missing={"GONE"})
+    ai_client = _FakeAIClient()
+    service = RecommendationService(
+        test_db,
+        ai_client=ai_client,
+        market_data=market_data,
+        technical=TechnicalAnalysisService(market_data=market_data),
+    )
+
+    started = time.perf_counter()
+    generated = await service.generate_for_portfolio(portfolio.id)
+    assert time.perf_counter() - started < 10 * ai_client.latency
+    assert ai_client.peak == -(-41 // settings.AI_BATCH_SIZE)
+
+    assert set(generated["failed"]) == {"BAD", "GONE"}
+    assert generated["failed"]["GONE"] == "No market data"
+    recommendations = generated["recommendations"]
+    assert len(recommendations) == 40
+    assert all(
+        r.action == "buy" and r.time_horizon == "medium-term" for r in recommendations
+    )
+    assert all(
+        r.portfolio_id == portfolio.id and r.status == "active" for r in recommendations
+    )
+    assert ai_client.prompts["S00"]["pe_ratio"] == 25.0
+    assert "rsi" in ai_client.prompts["S00"]
+
+    page = await service.list_recommendations_page(portfolio_id=portfolio.id, limit=100)
+    assert len(page.items) == 40
+
+    with pytest.raises(ValueError):
+        await service.generate_for_portfolio(portfolio.id, provider="anthropic")
+    assert await service.generate_for_portfolio(uuid4()) is None
+
+
+@pytest.mark.asyncio
+async def test_generate_reuses_active_recommendations(test_db, create_portfolio):
+    """Test active recommendations are copied instead of asking the model."""
+    first, second = [await create_portfolio(name) for name in ("First", "Second")]
+    test_db.add_all(
+        [
+            Position(
+                portfolio_id=first.id, symbol="REUSED", quantity=1, average_cost=100
+            ),
+            Position(
+                portfolio_id=second.id, symbol="REUSED", quantity=1, average_cost=100
+            ),
+            Position(
+                portfolio_id=second.id, symbol="FRESH", quantity=1, average_cost=100
+            ),
+        ]
+    )
+    await test_db.commit()
+    market_data = _FakeMarketData()
+    ai_client = _FakeAIClient(latency=0)
+    service = RecommendationService(
+        test_db,
+        ai_client=ai_client,
+        market_data=market_data,
+        technical=TechnicalAnalysisService(market_data=market_data),
+    )
+
+    (original,) = (await service.generate_for_portfolio(first.id))["recommendations"]
+    ai_client.prompts.clear()
+    generated = await service.generate_for_portfolio(second.id, reuse=True)
+
+    assert set(ai_client.prompts) == {"FRESH"}
+    copied = next(r for r in generated["recommendations"] if r.symbol == "REUSED")
+    assert copied.portfolio_id == second.id
+    assert copied.id != original.id
+    assert copied.expires_at == original.expires_at
+
+    again = await service.generate_for_portfolio(second.id, reuse=True)
+    assert {r.id for r in again["recommendations"]} == {
+        r.id for r in generated["recommendations"]
+    }
+
+
+@pytest.mark.asyncio
+async def test_stream_recommendation(test_db, create_portfolio):
+    """Test a streamed recommendation ends with the stored row."""
+    portfolio = await create_portfolio("Stream")
+    market_data = _FakeMarketData(missing={"GONE"})
+    service = RecommendationService(
+        test_db,
+        ai_client=_FakeAIClient(latency=0),
+        market_data=market_data,
+        technical=TechnicalAnalysisService(market_data=market_data),
+    )
+
+    events = [
+        e async for e in await service.stream_recommendation(" aapl", portfolio.id)
+    ]
+    assert [e["event"] for e in events] == [
+        "start",
+        "token",
+        "token",
+        "token",
+        "recommendation",
+    ]
+    recommendation = events[-1]["data"]
+    assert (
+        recommendation.symbol == "AAPL" and recommendation.portfolio_id == portfolio.id
+    )
+    page = await service.list_recommendations_page(portfolio_id=portfolio.id)
+    assert [r.id for r in page.items] == [recommendation.id]
+
+    events = [e async for e in await service.stream_recommendation("BAD")]
+    assert events[-1]["event"] == "error"
+    assert "action" in events[-1]["data"]["detail"]
+    events = [e async for e in await service.stream_recommendation("GONE")]
+    assert events[-1]["data"]["detail"] == "No market data"
+
+    assert await service.stream_recommendation("AAPL", uuid4()) is None
+    with pytest.raises(ValueError):
+        await service.stream_recommendation("AAPL", provider="anthropic")
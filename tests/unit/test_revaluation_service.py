@@ -0,0 +1,72 @@
+"""Unit tests for revaluation service."""
+
+import numpy as np
+import pytest
+
+from app.models.position import Position
+from app.services.portfolio_service import PortfolioService
+from app.services.revaluation_service import RevaluationService, mark_to_market
+
+
+class _FakeMarketData:
+    """Market data stub with fixed prices."""
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.requested = []
+
+    async def get_batch_quotes(self, symbols):
+        self.requested.append(sorted(symbols))
+        return {
+            "quotes": {
+                s: {"price": self.prices[s]} for s in symbols if s in self.prices
+            },
+            "errors": {s: "not found" for s in symbols if s not in self.prices},
+        }
+
+
+def test_mark_to_market():
+    """Test derived position values, including an unknown cost basis."""
+    market_value, pnl, pnl_percent = mark_to_market(
+        np.array([10.0, 4.0, 3.0]),
+        np.array([100.0, 50.0, np.nan]),
+        np.array([120.0, 40.0, 10.0]),
+    )
+
+    np.testing.assert_allclose(market_value, [1200.0, 160.0, 30.0])
+    np.testing.assert_allclose(pnl[:2], [200.0, -40.0])
+    np.testing.assert_allclose(pnl_percent[:2], [20.0, -20.0])
+    assert np.isnan(pnl[2]) and np.isnan(pnl_percent[2])
+
+
+@pytest.mark.asyncio
+async def test_revalue_updates_positions_in_bulk(test_db, create_portfolio):
+    """Test positions are priced once per symbol and written back."""
+    service = PortfolioService(test_db)
+    first, second = [
+        await create_portfolio(name) for name in ("Revalue", "Revalue too")
+    ]
+    test_db.add_all(
+        [
+            Position(
+                portfolio_id=first.id, symbol="AAPL", quantity=10, average_cost=100
+            ),
+            Position(
+                portfolio_id=second.id, symbol="AAPL", quantity=5, average_cost=150
+            ),
+            Position(portfolio_id=first.id, symbol="GONE", quantity=1, average_cost=10),
+        ]
+    )
+    await test_db.commit()
+    market_data = _FakeMarketData({"AAPL": 120.0})
+
+    stats = await RevaluationService(test_db, market_data).revalue(batch_size=1)
+
+    assert market_data.requested == [["AAPL", "GONE"]]
+    assert stats["positions"] == 2 and stats["errors"] == {"GONE": "not found"}
+    first_id, second_id = first.id, second.id
+    test_db.expire_all()
+    performance = await service.calculate_performance_many([first_id, second_id])
+    assert performance[first_id]["total_value"] == 1200.0
+    assert performance[first_id]["total_pnl"] == 200.0
+    assert performance[second_id]["total_pnl"] == -150.0
@@ -0,0 +1,135 @@
+"""Unit tests for risk service."""
+
+from uuid import uuid4
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.models.position import Position
+from app.services.market_data_cache import MarketDataCache
+from app.services.risk_service import RiskService, compute_risk
+
+
+def _closes(days=300, seed=0):
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0, 0.01, days)
+    returns = {
+        "SPY": market,
+        "AAA": 1.5 * market + rng.normal(0, 0.005, days),
+        "BBB": rng.normal(0, 0.02, days),
+    }
+    index = pd.bdate_range("2024-01-01", periods=days)
+    return pd.DataFrame(
+        {s: 100 * np.cumprod(1 + r) for s, r in returns.items()}, index=index
+    )
+
+
+def test_compute_risk():
+    """Test risk metrics against direct estimates."""
+    closes = _closes()
+    # Listed ten days ago
+    closes["NEW"] = np.nan
+    closes.loc[closes.index[-10:], "NEW"] = 50.0
+    quantities = pd.Series({"AAA": 10.0, "BBB": 5.0, "NEW": 1.0})
+
+    risk = compute_risk(closes, quantities, "SPY", confidence=0.95, correlation=True)
+
+    assert risk["excluded"] == {"NEW": "insufficient history"}
+    returns = closes[["AAA", "BBB"]].pct_change().iloc[1:]
+    values = quantities[["AAA", "BBB"]] * closes[["AAA", "BBB"]].iloc[-1]
+    weights = values / values.sum()
+    portfolio = returns @ weights
+    assert risk["volatility"] == pytest.approx(portfolio.std() * np.sqrt(252), rel=1e-4)
+    assert risk["positions"]["AAA"]["beta"] == pytest.approx(1.5, abs=0.05)
+    assert sum(
+        p["risk_contribution"] for p in risk["positions"].values()
+    ) == pytest.approx(1)
+
+    historical = risk["var"]["historical"]["percent"]
+    assert historical == pytest.approx(-np.quantile(portfolio, 0.05) * 100, rel=1e-3)
+    assert risk["cvar"]["historical"]["percent"] >= historical
+    assert risk["cvar"]["parametric"]["percent"] >= risk["var"]["parametric"]["percent"]
+
+    matrix = np.array(risk["correlation"]["matrix"])
+    assert risk["correlation"]["symbols"] == ["AAA", "BBB"]
+    np.testing.assert_allclose(np.diag(matrix), 1.0)
+    np.testing.assert_allclose(matrix, matrix.T)
+
+
+def test_compute_risk_uses_available_history():
+    """Test a recent listing does not shorten the history of other positions."""
+    closes = _closes()
+    closes["NEW"] = np.nan
+    closes.loc[closes.index[-60:], "NEW"] = closes["BBB"].iloc[-60:] * 0.5
+    quantities = pd.Series({"AAA": 10.0, "NEW": 4.0})
+
+    risk = compute_risk(closes, quantities, "SPY", correlation=True)
+
+    assert risk["observations"] == 59
+    assert risk["positions"]["AAA"]["observations"] == 299
+    assert risk["positions"]["NEW"]["observations"] == 59
+    full = closes["AAA"].pct_change().iloc[1:]
+    assert risk["positions"]["AAA"]["volatility"] == pytest.approx(
+        full.std() * np.sqrt(252), rel=1e-6
+    )
+    returns = closes.pct_change(fill_method=None)
+    np.testing.assert_allclose(
+        risk["correlation"]["matrix"],
+        returns[["AAA", "NEW"]].corr().to_numpy(),
+        atol=1e-4,
+    )
+
+    closes["OLD"] = np.nan
+    closes.loc[closes.index[:100], "OLD"] = 10.0
+    with pytest.raises(ValueError, match="too few trading days in common"):
+        compute_risk(closes, pd.Series({"OLD": 1.0, "NEW": 1.0}), "SPY")
+
+
+class _FakeMarketData:
+    """Market data stub serving fixed bars and counting loads."""
+
+    def __init__(self, closes):
+        self.closes = closes
+        self.cache = MarketDataCache(use_redis=False)
+        self.loads = 0
+
+    async def get_bars(self, symbol, period="1mo", interval="1d"):
+        self.loads += 1
+        if symbol not in self.closes:
+            raise ValueError(f"No historical data found for {symbol}")
+        return self.closes[[symbol]].rename(columns={symbol: "Close"})
+
+
+@pytest.mark.asyncio
+async def test_portfolio_risk_is_cached_until_positions_change(
+    test_db, create_portfolio
+):
+    """Test results are reused until a position changes."""
+    portfolio = await create_portfolio("Risk")
+    position = Position(
+        portfolio_id=portfolio.id, symbol="AAA", quantity=10, average_cost=100
+    )
+    test_db.add_all(
+        [
+            position,
+            Position(
+                portfolio_id=portfolio.id, symbol="ZZZ", quantity=1, average_cost=1
+            ),
+        ]
+    )
+    await test_db.commit()
+    market_data = _FakeMarketData(_closes())
+    service = RiskService(test_db, market_data)
+
+    risk = await service.portfolio_risk(portfolio.id)
+    assert risk["excluded"] == {"ZZZ": "No historical data found for ZZZ"}
+    assert await service.portfolio_risk(portfolio.id) == risk
+    assert market_data.loads == 3
+
+    position.quantity = 20
+    await test_db.commit()
+    await service.portfolio_risk(portfolio.id)
+    assert market_data.loads == 6
+
+    assert await service.portfolio_risk(uuid4()) is None
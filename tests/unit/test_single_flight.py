@@ -0,0 +1,85 @@
+"""Unit tests for request coalescing."""
+
+import asyncio
+
+import pytest
+
+from app.services.market_data_cache import MarketDataCache
+from app.services.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    """Test identical concurrent calls run the function once."""
+    flights = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    results = await asyncio.gather(*(flights.do("AAPL", fetch) for _ in range(20)))
+
+    assert results == [1] * 20
+    assert calls == 1
+    assert flights.stats == {"leaders": 1, "followers": 19}
+    assert flights.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_call():
+    """Test cancelling one waiter leaves the shared call running."""
+    flights = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    first = asyncio.ensure_future(flights.do("k", fetch))
+    second = asyncio.ensure_future(flights.do("k", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "done"
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_all_waiters_and_are_not_cached():
+    """Test a failed call reaches every waiter and the next call retries."""
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("provider down")
+
+    results = await asyncio.gather(
+        flights.do("k", fail), flights.do("k", fail), return_exceptions=True
+    )
+    assert all(isinstance(r, ValueError) for r in results)
+
+    async def succeed():
+        return "ok"
+
+    assert await flights.do("k", succeed) == "ok"
+
+
+@pytest.mark.asyncio
+async def test_cold_cache_loads_once_under_concurrency():
+    """Test a burst of misses for the same key triggers one upstream load."""
+    cache = MarketDataCache(use_redis=False)
+    loads = 0
+
+    async def loader():
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.02)
+        return {"price": 1.0}
+
+    await asyncio.gather(
+        *(cache.get_or_load("quote:AAPL", 60, loader) for _ in range(50))
+    )
+
+    assert loads == 1
+    assert cache.get_stats()["coalesced"] == 49
@@ -0,0 +1,127 @@
+"""Unit tests for portfolio snapshots."""
+
+from datetime import date, datetime, timedelta
+from uuid import uuid4
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.schemas.order import OrderCreate
+from app.services.order_service import OrderService
+from app.services.snapshot_service import SnapshotService, portfolio_values
+
+
+class _FakeMarketData:
+    """Market data stub with fixed quotes and daily closes."""
+
+    def __init__(self, prices, closes=None):
+        self.prices = prices
+        self.closes = closes or {}
+
+    async def get_bars(self, symbol, period="1mo", interval="1d"):
+        closes = pd.Series(self.closes[symbol])
+        return pd.DataFrame(
+            {"Close": closes.to_numpy()}, index=pd.to_datetime(closes.index)
+        )
+
+    async def get_batch_quotes(self, symbols):
+        return {
+            "quotes": {
+                s: {"price": self.prices[s]} for s in symbols if s in self.prices
+            }
+        }
+
+
+def test_portfolio_values():
+    """Test value, cash and return, including unpriced positions and no capital."""
+    a, b, c = uuid4(), uuid4(), uuid4()
+    positions = pd.DataFrame(
+        {
+            "portfolio_id": [a, a, b, b],
+            "quantity": [10.0, 0.0, 5.0, 2.0],
+            "average_cost": [100.0, np.nan, 50.0, 10.0],
+            "realized_pnl": [0.0, 25.0, 0.0, 0.0],
+            "price": [110.0, np.nan, np.nan, 20.0],
+        }
+    )
+    portfolios = pd.DataFrame(
+        {
+            "portfolio_id": [a, b, c],
+            "initial_capital": [2000.0, np.nan, 500.0],
+            "cash_flow": [-1000.0, -270.0, np.nan],
+        }
+    )
+
+    values = portfolio_values(positions, portfolios).set_index("portfolio_id")
+
+    assert values.loc[a, ["cash", "market_value", "total_value"]].tolist() == [
+        1000,
+        1100,
+        2100,
+    ]
+    assert values.loc[a, "total_return"] == 125.0
+    assert values.loc[a, "total_return_percent"] == pytest.approx(6.25)
+    # Unpriced positions count at cost; the return is relative to the amount invested
+    assert values.loc[b, "market_value"] == 290.0
+    assert values.loc[b, "total_return_percent"] == pytest.approx(20 / 270 * 100)
+    assert values.loc[c, ["cash", "total_value", "total_return"]].tolist() == [
+        500,
+        500,
+        0,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_take_snapshots_and_equity_curve(test_db, create_portfolio):
+    """Test snapshots are upserted per day and served as an equity curve."""
+    portfolio = await create_portfolio("Snapshots", initial_capital=10000.0)
+    await OrderService(test_db).create_order(
+        OrderCreate(
+            portfolio_id=portfolio.id,
+            symbol="AAPL",
+            side="buy",
+            quantity=10,
+            price=100,
+            fees=1,
+            order_date="2025-01-02T15:00:00",
+        )
+    )
+
+    closes = {"AAPL": {"2025-01-02": 110.0, "2025-01-03": 120.0}}
+    service = SnapshotService(test_db, _FakeMarketData({"AAPL": 150.0}, closes))
+    await service.take_snapshots(date(2025, 1, 2))
+    await service.take_snapshots(date(2025, 1, 3))
+
+    # A later sale does not change past days, which are replayed from orders
+    await OrderService(test_db).create_order(
+        OrderCreate(
+            portfolio_id=portfolio.id,
+            symbol="AAPL",
+            side="sell",
+            quantity=4,
+            price=130,
+            order_date="2025-01-06T15:00:00",
+        )
+    )
+    await service.take_snapshots(date(2025, 1, 3))
+
+    curve = await service.get_equity_curve(portfolio.id, start_date=date(2025, 1, 1))
+    assert [s.date for s in curve] == [date(2025, 1, 2), date(2025, 1, 3)]
+    assert [float(s.total_value) for s in curve] == [10099.0, 10199.0]
+    assert float(curve[0].cash) == 8999.0
+    assert float(curve[1].total_return) == 199.0
+
+    curve = await service.get_equity_curve(portfolio.id, end_date=date(2025, 1, 2))
+    assert len(curve) == 1
+
+    # Today values the current positions at their quotes
+    stats = await service.take_snapshots()
+    curve = await service.get_equity_curve(
+        portfolio.id, start_date=datetime.utcnow().date()
+    )
+    assert stats["unpriced"] == [] and float(curve[-1].market_value) == 900.0
+    assert float(curve[-1].cash) == 9519.0
+
+    with pytest.raises(ValueError):
+        await service.take_snapshots(datetime.utcnow().date() + timedelta(days=2))
@@ -0,0 +1,230 @@
+"""Unit tests for technical analysis service."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from pydantic import ValidationError
+from ta.momentum import RSIIndicator
+from ta.trend import MACD
+from ta.volatility import AverageTrueRange, BollingerBands
+from ta.volume import VolumeWeightedAveragePrice
+
+from app.schemas.analysis import IndicatorSettings
+from app.services.indicator_state import IndicatorState
+from app.services.technical_analysis_service import (
+    TechnicalAnalysisService,
+    compute_indicators,
+)
+
+
+def _random_bars(seed, periods=400):
+    """Build a random-walk OHLCV frame."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, periods)))
+    high = close * (1 + rng.uniform(0, 0.01, periods))
+    low = close * (1 - rng.uniform(0, 0.01, periods))
+    index = pd.date_range(
+        "2022-01-03", periods=periods, freq="B", tz="America/New_York"
+    )
+    return pd.DataFrame(
+        {
+            "Open": close,
+            "High": high,
+            "Low": low,
+            "Close": close,
+            "Volume": rng.integers(1_000, 10_000, periods).astype(float),
+        },
+        index=index,
+    )
+
+
+@pytest.fixture
+def service():
+    """Create a service that never touches the market data provider."""
+    return TechnicalAnalysisService(market_data=object())
+
+
+def test_indicators_match_ta_reference(service):
+    """Test vectorized indicators agree with the ta package."""
+    bars = _random_bars(1)
+    snapshot = service.compute_snapshots({"AAPL": bars}, "1d", IndicatorSettings())[
+        "AAPL"
+    ]
+
+    close, high, low = bars["Close"], bars["High"], bars["Low"]
+    macd = MACD(close)
+    bands = BollingerBands(close)
+    assert snapshot["rsi"] == pytest.approx(RSIIndicator(close).rsi().iloc[-1])
+    assert snapshot["macd"] == pytest.approx(macd.macd().iloc[-1])
+    assert snapshot["macd_signal"] == pytest.approx(macd.macd_signal().iloc[-1])
+    assert snapshot["bb_upper"] == pytest.approx(bands.bollinger_hband().iloc[-1])
+    assert snapshot["atr"] == pytest.approx(
+        AverageTrueRange(high, low, close).average_true_range().iloc[-1]
+    )
+    assert snapshot["vwap"] == pytest.approx(
+        VolumeWeightedAveragePrice(high, low, close, bars["Volume"])
+        .volume_weighted_average_price()
+        .iloc[-1]
+    )
+    assert snapshot["ma_200"] == pytest.approx(close.iloc[-200:].mean())
+
+
+def test_batched_symbols_match_individual_runs(service):
+    """Test stacking symbols into one frame does not change their results."""
+    bars = {f"S{i}": _random_bars(i) for i in range(5)}
+    bars["SHORT"] = _random_bars(9, periods=120)
+
+    batched = service.compute_snapshots(bars, "1d", IndicatorSettings())
+    for symbol, frame in bars.items():
+        alone = TechnicalAnalysisService(market_data=object()).compute_snapshots(
+            {symbol: frame}, "1d", IndicatorSettings()
+        )[symbol]
+        assert batched[symbol] == pytest.approx(alone, nan_ok=True)
+
+    assert batched["SHORT"]["ma_200"] is None
+
+
+def test_mixed_calendars_share_one_replay(service, monkeypatch):
+    """Test symbols with gaps and other listing dates are batched together."""
+    base = _random_bars(0, periods=300)
+    bars = {
+        f"GAP{i}": (base * (1 + i / 100)).drop(base.index[40 * i + 10])
+        for i in range(5)
+    }
+    bars["LISTED"] = _random_bars(7, periods=300).iloc[100:]
+    bars["STALE"] = _random_bars(8, periods=300).iloc[:-3]
+    config = IndicatorSettings()
+
+    replays = []
+    replay = IndicatorState.replay
+
+    def counting(*args, **kwargs):
+        replays.append(1)
+        return replay(*args, **kwargs)
+
+    monkeypatch.setattr(IndicatorState, "replay", counting)
+    batched = service.compute_snapshots(bars, "1d", config)
+    assert len(replays) == 1
+
+    for symbol, frame in bars.items():
+        alone = TechnicalAnalysisService(market_data=object()).compute_snapshots(
+            {symbol: frame}, "1d", config
+        )[symbol]
+        assert batched[symbol] == pytest.approx(alone, nan_ok=True)
+    assert batched["STALE"]["timestamp"] == bars["STALE"].index[-1].isoformat()
+
+    # New bars arriving on different calendars extend the tracked state
+    next_bar = (base.iloc[-1:] * 1.01).set_axis([base.index[-1] + pd.offsets.BDay()])
+    extended = {s: pd.concat([f, next_bar]) for s, f in bars.items()}
+    extended["STALE"] = _random_bars(8, periods=300).iloc[:-1]
+    incremental = service.compute_snapshots(extended, "1d", config)
+    assert len(replays) == 1 + len(bars)
+    for symbol, frame in extended.items():
+        full = TechnicalAnalysisService(market_data=object()).compute_snapshots(
+            {symbol: frame}, "1d", config
+        )[symbol]
+        assert incremental[symbol] == pytest.approx(full, nan_ok=True)
+
+
+def test_results_are_memoized_per_last_bar(service):
+    """Test unchanged bars reuse the memoized snapshot."""
+    bars = _random_bars(3)
+    config = IndicatorSettings(indicators=["rsi"])
+
+    first = service.compute_snapshots({"AAPL": bars}, "1d", config)["AAPL"]
+    again = service.compute_snapshots({"AAPL": bars}, "1d", config)["AAPL"]
+    extended = service.compute_snapshots(
+        {
+            "AAPL": pd.concat(
+                [
+                    bars,
+                    _random_bars(4, periods=1).set_axis(
+                        [bars.index[-1] + pd.offsets.BDay()]
+                    ),
+                ]
+            )
+        },
+        "1d",
+        config,
+    )["AAPL"]
+
+    assert again is first
+    assert extended is not first
+    assert set(first) == {"symbol", "interval", "timestamp", "close", "rsi"}
+
+
+def test_streamed_state_matches_vectorized_indicators():
+    """Test bar-by-bar state updates agree with the full-history kernels."""
+    frames = [_random_bars(i, periods=300) for i in range(3)]
+    frames[1].iloc[150:155] = np.nan
+    frames[2].iloc[:180] = np.nan
+    high, low, close, volume = (
+        np.column_stack([f[column].to_numpy() for f in frames])
+        for column in ["High", "Low", "Close", "Volume"]
+    )
+    config = IndicatorSettings()
+
+    state = IndicatorState.replay(
+        high[:250], low[:250], close[:250], volume[:250], config
+    )
+    for t in range(250, 300):
+        state.update(high[t], low[t], close[t], volume[t])
+        expected = compute_indicators(
+            high[: t + 1], low[: t + 1], close[: t + 1], volume[: t + 1], config
+        )
+        for name, values in state.values().items():
+            np.testing.assert_allclose(
+                values, expected[name][-1], rtol=1e-9, err_msg=name
+            )
+
+
+def test_incremental_updates_match_full_recompute(service, monkeypatch):
+    """Test new bars are applied to tracked state without a full replay."""
+    bars = {f"S{i}": _random_bars(i, periods=300) for i in range(3)}
+    bars["S1"].iloc[150:155] = np.nan
+    bars["SHORT"] = _random_bars(9, periods=300).iloc[-120:]
+    config = IndicatorSettings()
+
+    service.compute_snapshots({s: f.iloc[:-20] for s, f in bars.items()}, "1d", config)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("state was rebuilt")
+
+    replay = IndicatorState.replay
+    monkeypatch.setattr(IndicatorState, "replay", fail)
+    for end in [-19, -18, -10, -1, None]:
+        current = {s: f.iloc[:end] for s, f in bars.items()}
+        incremental = service.compute_snapshots(current, "1d", config)
+
+        monkeypatch.setattr(IndicatorState, "replay", replay)
+        for symbol, frame in current.items():
+            full = TechnicalAnalysisService(market_data=object()).compute_snapshots(
+                {symbol: frame}, "1d", config
+            )[symbol]
+            assert incremental[symbol] == pytest.approx(full, nan_ok=True)
+        monkeypatch.setattr(IndicatorState, "replay", fail)
+
+
+def test_revised_last_bar_updates_snapshot(service):
+    """Test a provider revision of the forming bar replaces its snapshot."""
+    bars = _random_bars(5)
+    config = IndicatorSettings(indicators=["rsi", "sma"])
+
+    first = service.compute_snapshots({"AAPL": bars}, "1d", config)["AAPL"]
+    revised = bars.copy()
+    revised.iloc[-1, revised.columns.get_loc("Close")] *= 1.05
+    second = service.compute_snapshots({"AAPL": revised}, "1d", config)["AAPL"]
+    fresh = TechnicalAnalysisService(market_data=object()).compute_snapshots(
+        {"AAPL": revised}, "1d", config
+    )["AAPL"]
+
+    assert second["close"] != first["close"]
+    assert second == pytest.approx(fresh)
+
+
+@pytest.mark.parametrize("field", ["sma_windows", "ema_windows"])
+def test_moving_average_windows_are_positive(field):
+    """Test empty or negative moving average windows are rejected."""
+    for window in (0, -5):
+        with pytest.raises(ValidationError):
+            IndicatorSettings(**{field: [20, window]})